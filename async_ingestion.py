@@ -0,0 +1,177 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+import aiohttp
+import data_ingestion as di
+import instrumentation
+from http_cache import ResponseCache, get_response_cache
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Allow `rate` requests per second on average, with bursts of up to `capacity`"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Response:
+    """Minimal stand-in for requests.Response so the data_ingestion parsers work unchanged"""
+    def __init__(self, url, status_code, content, headers):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+class AsyncFetcher:
+    """
+    Concurrent HTTP client for the scrapers.
+
+    One aiohttp session keeps keep-alive connections pooled across requests.
+    A semaphore bounds requests in flight, each host gets its own token
+    bucket, and retries back off exponentially with full jitter. Responses
+    go through the http_cache response cache (cache=False bypasses it).
+    """
+    def __init__(self, concurrency=20, rate_per_host=2.0, burst=None, max_retries=3,
+                 backoff_base=0.5, backoff_cap=10.0, timeout=15, cache=None):
+        self.cache = get_response_cache() if cache is None else cache
+        self.concurrency = concurrency
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self._buckets = {}
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+        return self._buckets[host]
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def fetch(self, url):
+        """GET url, returning a Response, or None once retries are exhausted"""
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            instrumentation.count('http_cache_hits')
+            return Response(url, entry['status'], entry['content'], entry['headers'])
+        headers = {"User-Agent": di.get_random_agent(), **ResponseCache.conditional_headers(entry)}
+
+        for attempt in range(self.max_retries):
+            await self._bucket(url).acquire()
+            try:
+                async with self._semaphore:
+                    instrumentation.count('http_requests')
+                    async with self._session.get(url, headers=headers) as resp:
+                        content = await resp.read()
+                        instrumentation.count('http_bytes', len(content))
+                        if resp.status == 304 and entry:
+                            instrumentation.count('http_not_modified')
+                            self.cache.touch(url)
+                            return Response(url, entry['status'], entry['content'], entry['headers'])
+                        if resp.status < 400:
+                            if self.cache:
+                                self.cache.store(url, resp.status, resp.headers, content)
+                            return Response(url, resp.status, content, dict(resp.headers))
+                        error = f"HTTP {resp.status}"
+                        if resp.status not in RETRY_STATUSES:
+                            print(f"Giving up on {url}: {error}")
+                            instrumentation.count('http_failures')
+                            return None
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                error = e
+            print(f"Retry {attempt+1}/{self.max_retries} for {url}: {error}")
+            instrumentation.count('http_retries')
+            if attempt + 1 < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt))
+        instrumentation.count('http_failures')
+        return None
+
+# ================== Per-source fetchers ==================
+# URL templates and parsers are looked up on data_ingestion at call time,
+# so they stay shared with the synchronous fetchers.
+_SIMPLE_SOURCES = {
+    'motilaloswal': ('MOTILAL_OSWAL_URL', 'parse_motilal_oswal_research'),
+    'trendlyne': ('TRENDLYNE_URL', 'parse_trendlyne_insights'),
+    'icicidirect': ('ICICI_DIRECT_URL', 'parse_icici_direct_analysis'),
+    'iifl': ('IIFL_URL', 'parse_iifl_news'),
+}
+
+async def _fetch_moneycontrol(fetcher, ticker, statement_type='income', **kwargs):
+    sc_id = fetcher.cache.get_sc_id(ticker) if fetcher.cache else None
+    if not sc_id:
+        url = di.MONEYCONTROL_SUGGEST_URL.format(ticker=ticker)
+        sc_id = di.parse_moneycontrol_sc_id(await fetcher.fetch(url))
+        if not sc_id:
+            return None
+        if fetcher.cache:
+            fetcher.cache.set_sc_id(ticker, sc_id)
+    url = di.MONEYCONTROL_FINANCIALS_URL.format(sc_id=sc_id, statement_type=statement_type)
+    return di.parse_moneycontrol_financials(await fetcher.fetch(url))
+
+async def fetch_source(fetcher, source, ticker, **kwargs):
+    """Fetch and parse one ticker from one source"""
+    if source == 'moneycontrol':
+        return await _fetch_moneycontrol(fetcher, ticker, **kwargs)
+    if source in _SIMPLE_SOURCES:
+        url_name, parser_name = _SIMPLE_SOURCES[source]
+        if source == 'iifl':
+            ticker = ticker.lower()
+        response = await fetcher.fetch(getattr(di, url_name).format(ticker=ticker))
+        return getattr(di, parser_name)(response)
+    # yfinance/bloomberg have no raw HTTP layer to pool; run them off the event loop
+    return await asyncio.to_thread(di.load_data, source, ticker=ticker, **kwargs)
+
+async def load_data_many_async(source, tickers, fetcher=None, **kwargs):
+    """Fetch `tickers` from `source` concurrently; returns {ticker: DataFrame or None}"""
+    if fetcher is None:
+        async with AsyncFetcher() as fetcher:
+            return await load_data_many_async(source, tickers, fetcher, **kwargs)
+
+    async def one(ticker):
+        try:
+            return await fetch_source(fetcher, source, ticker, **kwargs)
+        except Exception as e:
+            print(f"Error fetching {ticker} from {source}: {e}")
+            return None
+
+    results = await asyncio.gather(*(one(t) for t in tickers))
+    return dict(zip(tickers, results))
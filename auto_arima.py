@@ -0,0 +1,247 @@
+import time
+import warnings
+from multiprocessing import Pool, TimeoutError
+import pandas as pd
+import numpy as np
+import instrumentation
+from intervals import forecast_frame, normal_intervals
+from model_cache import ModelCache, fingerprint
+
+# Season length by pandas frequency code (after dropping multiples and anchors)
+SEASON_LENGTHS = {'h': 24, 'H': 24, 'D': 7, 'B': 5, 'W': 52, 'M': 12, 'Q': 4}
+MAX_SEASON_LENGTH = 24  # longer seasons (e.g. weekly data) are searched without seasonal terms
+SEASONAL_STRENGTH_THRESHOLD = 0.64
+
+_differencing_cache = ModelCache(max_items=4096)  # (series, season length, alpha) -> (d, D)
+_aic_cache = ModelCache(max_items=65536)  # (differenced series, candidate) -> AIC
+
+def infer_season_length(index):
+    """Season length implied by a DatetimeIndex's frequency (1 when unknown)"""
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 3:
+        return 1
+    freq = index.freqstr or pd.infer_freq(index)
+    if freq is None:
+        return 1
+    code = freq.split('-')[0].lstrip('0123456789')
+    if len(code) > 1 and code[-1] in 'ES':  # MS/ME, QS/QE, ...
+        code = code[:-1]
+    return SEASON_LENGTHS.get(code, 1)
+
+# ===== Differencing Tests =====
+def seasonal_strength(y, m):
+    """STL seasonal strength, max(0, 1 - var(remainder) / var(season + remainder))"""
+    from statsmodels.tsa.seasonal import STL
+    fit = STL(y, period=m, robust=True).fit()
+    detrended = fit.seasonal + fit.resid
+    return max(0.0, 1 - np.var(fit.resid) / np.var(detrended)) if np.var(detrended) > 0 else 0.0
+
+def _kpss_nonstationary(y, alpha):
+    from statsmodels.tsa.stattools import kpss
+    if np.ptp(y) == 0:
+        return False
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # p-values outside the lookup table are clipped
+        return kpss(y, regression='c', nlags='auto')[1] < alpha
+
+def difference(y, d=0, D=0, m=1):
+    """Apply D seasonal (lag m) and then d first differences"""
+    w = np.asarray(y, dtype=float)
+    for _ in range(D):
+        w = w[m:] - w[:-m]
+    for _ in range(d):
+        w = np.diff(w)
+    return w
+
+def differencing_orders(y, m=1, alpha=0.05, max_d=2, max_D=1):
+    """
+    (d, D) for a series, computed once and cached by its content.
+
+    D: one seasonal difference when the STL seasonal strength exceeds 0.64;
+    d: first differences until a KPSS test no longer rejects stationarity.
+    """
+    y = np.asarray(y, dtype=float)
+    key = f"{fingerprint(pd.Series(y))}|{m}|{alpha}|{max_d}|{max_D}"
+    orders = _differencing_cache.get(key)
+    if orders is None:
+        D = 0
+        if m > 1 and max_D > 0 and len(y) >= 2 * m + 1 and seasonal_strength(y, m) > SEASONAL_STRENGTH_THRESHOLD:
+            D = 1
+        w, d = difference(y, 0, D, m), 0
+        while d < max_d and len(w) > 3 and _kpss_nonstationary(w, alpha):
+            w, d = np.diff(w), d + 1
+        orders = (d, D)
+        _differencing_cache.put(key, orders)
+    return orders
+
+# ===== Candidate Fits =====
+# A candidate is (p, q, P, Q, constant). Every candidate of a search shares
+# d and D, so each is fitted as an ARMA model on the series differenced once
+# up front, and their AICs are directly comparable.
+
+def _arma_aic(w, candidate, m):
+    from statsmodels.tsa.arima.model import ARIMA
+    p, q, P, Q, constant = candidate
+    seasonal = (P, 0, Q, m) if m > 1 else (0, 0, 0, 0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # convergence and start-parameter warnings
+            fit = ARIMA(w, order=(p, 0, q), seasonal_order=seasonal, trend='c' if constant else 'n').fit()
+        return float(fit.aic) if np.isfinite(fit.aic) else np.inf
+    except (np.linalg.LinAlgError, ValueError):
+        return np.inf
+
+_search_data = {}
+
+def _init_search_worker(w, m):
+    # Each worker receives the differenced series once instead of once per candidate
+    _search_data.update(w=w, m=m)
+
+def _score_candidate(candidate):
+    return _arma_aic(_search_data['w'], candidate, _search_data['m'])
+
+def _neighbours(candidate, m, allow_constant, limits):
+    """Stepwise moves: p, q, P, Q and the (p, q) and (P, Q) pairs by +/-1, and the constant toggled"""
+    p, q, P, Q, constant = candidate
+    moves = [(dp, dq, 0, 0) for dp, dq in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1))]
+    if m > 1:
+        moves += [(0, 0, dP, dQ) for dP, dQ in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1))]
+    max_p, max_q, max_P, max_Q, max_order = limits
+    found = [(p + dp, q + dq, P + dP, Q + dQ, constant) for dp, dq, dP, dQ in moves]
+    if allow_constant:
+        found.append((p, q, P, Q, not constant))
+    return [c for c in found
+            if 0 <= c[0] <= max_p and 0 <= c[1] <= max_q and 0 <= c[2] <= max_P and 0 <= c[3] <= max_Q
+            and sum(c[:4]) <= max_order]
+
+def search_orders(y, m=1, d=None, D=None, max_p=5, max_q=5, max_P=2, max_Q=2, max_order=5,
+                  tol=0.0, time_budget=None, n_jobs=1, max_steps=50):
+    """
+    Stepwise (Hyndman-Khandakar) search for a seasonal ARIMA order by AIC.
+
+    d and D come from differencing_orders() unless given. The search starts
+    from four standard models, then repeatedly scores every untried
+    neighbour of the best model so far and moves to the best of them; it
+    stops as soon as no neighbour lowers the AIC by more than tol.
+
+    Parameters:
+    m: season length (1 = non-seasonal)
+    time_budget: seconds for the search; when it runs out the best model so
+                 far is returned (candidates still fitting are abandoned).
+                 At least one candidate is always fitted.
+    n_jobs: processes scoring a neighbourhood in parallel (1 = in-process)
+
+    Candidate AICs are memoized by the differenced series, so a repeated
+    search over the same data (a refit, evaluate_models) skips the fits.
+    Returns {'order', 'seasonal_order', 'constant', 'aic', 'fits', 'steps', 'stopped'}.
+    """
+    y = np.asarray(y, dtype=float)
+    if m > 1 and len(y) < 2 * m + 1:
+        m = 1
+    if d is None or D is None:
+        auto_d, auto_D = differencing_orders(y, m)
+        d = auto_d if d is None else d
+        D = auto_D if D is None else D
+    if m == 1:
+        D = 0
+    w = difference(y, d, D, m)
+    if len(w) < 10:
+        raise ValueError("Series is too short for an ARIMA search")
+    allow_constant = d + D <= 1
+    limits = (max_p, max_q, max_P if m > 1 else 0, max_Q if m > 1 else 0, max_order)
+    prefix = f"{fingerprint(pd.Series(w))}|{m}"
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    aics = {}
+    fits = 0
+    pool = Pool(n_jobs, initializer=_init_search_worker, initargs=(w, m)) if n_jobs > 1 else None
+
+    def evaluate(candidates):
+        """Score candidates (memoized); False once the time budget ran out"""
+        nonlocal fits
+        todo = []
+        for candidate in candidates:
+            cached = _aic_cache.get(f"{prefix}|{candidate}")
+            if cached is None:
+                todo.append(candidate)
+            else:
+                aics[candidate] = cached
+                instrumentation.count('arima_candidate_cache_hits')
+        jobs = {c: pool.apply_async(_score_candidate, (c,)) for c in todo} if pool is not None else None
+        for candidate in todo:
+            # The budget only applies once there is some model to return
+            remaining = None if deadline is None or not aics else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if jobs is None:
+                aic = _arma_aic(w, candidate, m)
+            else:
+                try:
+                    aic = jobs[candidate].get(timeout=remaining)
+                except TimeoutError:
+                    return False
+            aics[candidate] = aic
+            fits += 1
+            instrumentation.count('arima_candidates')
+            _aic_cache.put(f"{prefix}|{candidate}", aic)
+        return True
+
+    try:
+        if m > 1:
+            start = [(2, 2, 1, 1), (0, 0, 0, 0), (1, 0, 1, 0), (0, 1, 0, 1)]
+        else:
+            start = [(2, 2, 0, 0), (0, 0, 0, 0), (1, 0, 0, 0), (0, 1, 0, 0)]
+        start = [(p, q, P, Q, allow_constant) for p, q, P, Q in start
+                 if p <= max_p and q <= max_q and P <= limits[2] and Q <= limits[3] and p + q + P + Q <= max_order]
+        steps = 0
+        stopped = 'converged' if evaluate(start) else 'time_budget'
+        while stopped == 'converged':
+            if steps == max_steps:
+                stopped = 'max_steps'
+                break
+            best = min(aics, key=aics.get)
+            candidates = [c for c in _neighbours(best, m, allow_constant, limits) if c not in aics]
+            if not candidates:
+                break
+            steps += 1
+            if not evaluate(candidates):
+                stopped = 'time_budget'
+            elif aics[min(aics, key=aics.get)] >= aics[best] - tol:
+                break  # no neighbour improves on the best model
+    finally:
+        if pool is not None:
+            pool.terminate()  # abandon fits still running past the budget
+
+    p, q, P, Q, constant = min(aics, key=aics.get)
+    return {'order': (p, d, q), 'seasonal_order': (P, D, Q, m) if m > 1 else (0, 0, 0, 0),
+            'constant': bool(constant), 'aic': aics[(p, q, P, Q, constant)],
+            'fits': fits, 'steps': steps, 'stopped': stopped}
+
+# ===== Model =====
+def run_auto_arima(df, target_col='target', horizon=30, quantiles=None, season_length=None,
+                   time_budget=None, n_jobs=1, **search_params):
+    """
+    ARIMA with its (p,d,q)(P,D,Q,m) order chosen by search_orders().
+
+    season_length defaults to the one implied by the date index frequency.
+    time_budget bounds the search only; the chosen model is always refitted
+    on the undifferenced series for the forecast. For a batch of series use
+    forecast_many(panel, 'auto_arima', time_budget=...), which runs the
+    per-series searches in parallel.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+    y = df[target_col].to_numpy(dtype=float)
+    m = infer_season_length(df.index) if season_length is None else season_length
+    if m > MAX_SEASON_LENGTH:
+        m = 1
+    chosen = search_orders(y, m, time_budget=time_budget, n_jobs=n_jobs, **search_params)
+    d, D = chosen['order'][1], chosen['seasonal_order'][1]
+    # With d + D = 1 the differenced model's constant is a drift in levels
+    trend = ('c' if d + D == 0 else 't') if chosen['constant'] else 'n'
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results = ARIMA(y, order=chosen['order'], seasonal_order=chosen['seasonal_order'], trend=trend).fit()
+    prediction = results.get_forecast(horizon)
+    point = np.asarray(prediction.predicted_mean, dtype=float)
+    bands = None
+    if quantiles is not None:
+        bands = normal_intervals(point, np.sqrt(np.asarray(prediction.var_pred_mean)), quantiles)
+    return forecast_frame(df.index, point, quantiles, bands)
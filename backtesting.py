@@ -0,0 +1,162 @@
+from multiprocessing import Pool
+import os
+import pandas as pd
+import numpy as np
+import instrumentation
+from incremental import IncrementalModel, INCREMENTAL_MODELS
+from model_registry import REGISTRY
+from utils import error_terms
+
+# Every registered model forecasts future periods out of sample, so each fold
+# simply fits REGISTRY[model] on its training window.
+
+# ===== Splits =====
+def rolling_origin_splits(n_obs, horizon, n_folds=5, step=None, window='expanding', train_size=None):
+    """
+    Rolling-origin (cutoff) splits ending at the last observation.
+
+    Returns a list of (train_start, cutoff) positions: fold i trains on
+    [train_start, cutoff) and is tested on [cutoff, cutoff + horizon).
+    Cutoffs are `step` rows apart (default: horizon). 'expanding' windows
+    always start at 0, 'sliding' windows keep train_size rows.
+    """
+    if window not in ('expanding', 'sliding'):
+        raise ValueError(f"Unknown window type: {window}")
+    step = step or horizon
+    train_size = train_size or max(2 * horizon, n_obs - horizon - step * (n_folds - 1))
+    cutoffs = n_obs - horizon - step * np.arange(n_folds)[::-1]
+    cutoffs = cutoffs[cutoffs >= train_size]
+    if len(cutoffs) == 0:
+        raise ValueError("Not enough observations for the requested folds")
+    return [(0 if window == 'expanding' else int(c) - train_size, int(c)) for c in cutoffs]
+
+def _prepare_series(df, target_col):
+    """Date-indexed target in original units (no normalisation, so MAPE is meaningful)"""
+    if 'date' in df.columns:
+        df = df.set_index(pd.to_datetime(df['date']))
+    series = df[target_col].astype(float)
+    series.index = pd.DatetimeIndex(series.index, name='date')
+    series = series.sort_index().interpolate(method='time').bfill()
+    return series.to_frame(target_col)
+
+# ===== Workers =====
+_backtest_data = {}
+
+def _init_backtest_worker(data, target_col, horizon):
+    _backtest_data.update(data=data, target_col=target_col, horizon=horizon)
+
+def _run_fold(task):
+    """Refit model_name on one fold; returns (model, fold, forecast values)"""
+    model_name, fold, (start, cutoff), kwargs = task
+    data, target_col, horizon = (_backtest_data[k] for k in ('data', 'target_col', 'horizon'))
+    try:
+        output = REGISTRY[model_name](data.iloc[start:cutoff], target_col, horizon=horizon, **kwargs)
+        values = output['forecast'].to_numpy(dtype=float)
+    except Exception as e:
+        print(f"Backtest error with {model_name} on fold {fold}: {e}")
+        values = np.full(horizon, np.nan)
+    return [(model_name, fold, values)]
+
+def _run_incremental(task):
+    """Fit once at the first cutoff, then update() through later folds"""
+    model_name, splits, kwargs = task
+    data, target_col, horizon = (_backtest_data[k] for k in ('data', 'target_col', 'horizon'))
+    results = []
+    model = None
+    for fold, (start, cutoff) in enumerate(splits):
+        try:
+            if model is None:
+                model = IncrementalModel(model_name, target_col, **kwargs).fit(data.iloc[start:cutoff])
+            else:
+                model.update(data.iloc[splits[fold - 1][1]:cutoff])
+            values = model.forecast(horizon).to_numpy()
+        except Exception as e:
+            print(f"Backtest error with {model_name} on fold {fold}: {e}")
+            values = np.full(horizon, np.nan)
+        results.append((model_name, fold, values))
+    return results
+
+# ===== Backtest =====
+@instrumentation.traced('backtest')
+def backtest(df, models=("moving_average", "exponential_smoothing", "arima"), target_col='target',
+             horizon=30, n_folds=5, step=None, window='expanding', train_size=None,
+             incremental=False, n_jobs=None, model_kwargs=None):
+    """
+    Rolling-origin cross-validation of several models.
+
+    Every (model, fold) pair is refit in parallel. With incremental=True and an
+    expanding window, ARIMA / exponential smoothing are fitted once and then
+    updated fold to fold with IncrementalModel instead of refit; a sliding
+    window drops old rows, which an update cannot, so incremental=True with
+    window='sliding' raises ValueError.
+    model_kwargs maps model name to extra keyword arguments.
+
+    Returns a tidy DataFrame with one row per model x fold x horizon step:
+    model, fold, cutoff, horizon, date, actual, forecast.
+    Use score_backtest() to turn it into metrics.
+    """
+    unknown = [m for m in models if m not in REGISTRY or m == "qualitative"]
+    if unknown:
+        raise ValueError(f"Backtesting not supported for: {unknown}")
+    if incremental and window != 'expanding':
+        raise ValueError("incremental=True needs an expanding window")
+    model_kwargs = model_kwargs or {}
+
+    data = _prepare_series(df, target_col)
+    splits = rolling_origin_splits(len(data), horizon, n_folds, step, window, train_size)
+
+    tasks = []
+    for model_name in models:
+        kwargs = model_kwargs.get(model_name, {})
+        if incremental and window == 'expanding' and model_name in INCREMENTAL_MODELS:
+            tasks.append((_run_incremental, (model_name, splits, kwargs)))
+        else:
+            tasks.extend((_run_fold, (model_name, fold, split, kwargs))
+                         for fold, split in enumerate(splits))
+
+    n_jobs = n_jobs or min(len(tasks), os.cpu_count() or 1)
+    initargs = (data, target_col, horizon)
+    if n_jobs == 1:
+        _init_backtest_worker(*initargs)
+        outputs = [fn(task) for fn, task in tasks]
+    else:
+        with Pool(n_jobs, initializer=_init_backtest_worker, initargs=initargs) as pool:
+            jobs = [pool.apply_async(fn, (task,)) for fn, task in tasks]
+            outputs = [job.get() for job in jobs]
+
+    # Stack every forecast into one (model, fold, horizon) array
+    model_index = {m: i for i, m in enumerate(models)}
+    predicted = np.full((len(models), len(splits), horizon), np.nan)
+    for output in outputs:
+        for model_name, fold, values in output:
+            predicted[model_index[model_name], fold, :len(values)] = values[:horizon]
+
+    target = data[target_col].to_numpy()
+    positions = np.array([cutoff for _, cutoff in splits])[:, None] + np.arange(horizon)
+    actual = target[positions]
+
+    n_models, n_splits = len(models), len(splits)
+    return pd.DataFrame({
+        'model': np.repeat(list(models), n_splits * horizon),
+        'fold': np.tile(np.repeat(np.arange(n_splits), horizon), n_models),
+        'cutoff': np.tile(np.repeat(data.index[positions[:, 0]], horizon), n_models),
+        'horizon': np.tile(np.arange(1, horizon + 1), n_models * n_splits),
+        'date': np.tile(data.index[positions.ravel()], n_models),
+        'actual': np.tile(actual.ravel(), n_models),
+        'forecast': predicted.ravel(),
+    })
+
+def score_backtest(results, by=('model',)):
+    """
+    MAE, RMSE, MAPE and sMAPE for a backtest() frame, grouped by `by`
+    (e.g. ('model',), ('model', 'horizon') or ('model', 'fold')).
+    Error terms for every row are computed in a single vectorized pass.
+    """
+    terms = pd.DataFrame(error_terms(results['actual'], results['forecast']), index=results.index)
+    grouped = terms.groupby([results[col] for col in by], sort=False).mean()
+    return pd.DataFrame({
+        'MAE': grouped['abs_error'],
+        'RMSE': np.sqrt(grouped['squared_error']),
+        'MAPE': 100 * grouped['ape'],
+        'sMAPE': 100 * grouped['sape'],
+    })
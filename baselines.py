@@ -0,0 +1,140 @@
+import numpy as np
+from intervals import bootstrap_intervals, check_quantiles, forecast_frame
+
+# ===== Panel Baselines =====
+# Every function takes a 2-D array Y of shape (n_series, n_time) with no gaps
+# and returns an (n_series, horizon) array of out-of-sample forecasts.
+
+def naive(Y, horizon=30):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    return np.repeat(Y[:, -1:], horizon, axis=1)
+
+def moving_average(Y, horizon=30, window=3):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    return np.repeat(Y[:, -window:].mean(axis=1, keepdims=True), horizon, axis=1)
+
+def seasonal_naive(Y, horizon=30, season_length=12):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    if Y.shape[1] < season_length:
+        raise ValueError("Series is shorter than one season")
+    last_season = Y[:, -season_length:]
+    return last_season[:, np.arange(horizon) % season_length]
+
+def drift(Y, horizon=30):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    slope = (Y[:, -1] - Y[:, 0]) / max(Y.shape[1] - 1, 1)
+    return Y[:, -1:] + slope[:, None] * np.arange(1, horizon + 1)
+
+def simple_exp_smoothing(Y, horizon=30, alpha=0.3):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    n_time = Y.shape[1]
+    # The final level is a fixed weighted sum of the history, so the whole
+    # panel reduces to one matrix-vector product instead of a time loop
+    decay = (1 - alpha) ** np.arange(n_time - 1, -1, -1)
+    weights = alpha * decay
+    weights[0] = decay[0]  # level initialised at the first observation
+    level = Y @ weights
+    return np.repeat(level[:, None], horizon, axis=1)
+
+def holt(Y, horizon=30, alpha=0.3, beta=0.1):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    if Y.shape[1] < 2:
+        return naive(Y, horizon)
+    level = Y[:, 0].copy()
+    trend = Y[:, 1] - Y[:, 0]
+    # Loop over time only; each step updates every series at once
+    for t in range(1, Y.shape[1]):
+        previous = level
+        level = alpha * Y[:, t] + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+    return level[:, None] + trend[:, None] * np.arange(1, horizon + 1)
+
+BASELINES = {
+    "naive": naive,
+    "moving_average": moving_average,
+    "seasonal_naive": seasonal_naive,
+    "drift": drift,
+    "simple_exp_smoothing": simple_exp_smoothing,
+    "holt": holt,
+}
+
+# ===== Residuals for Intervals =====
+# In-sample one-step-ahead errors of each baseline, shape (n_series, n_resid),
+# plus the innovation weights c_j that carry them into h-step errors.
+
+def _level_trend_errors(Y, alpha, beta=None):
+    """One-step errors of SES (beta=None) or Holt, looping over time for all series"""
+    level = Y[:, 0].copy()
+    trend = Y[:, 1] - Y[:, 0] if beta is not None else np.zeros(len(Y))
+    errors = np.empty((Y.shape[0], Y.shape[1] - 1))
+    for t in range(1, Y.shape[1]):
+        errors[:, t - 1] = Y[:, t] - (level + trend)
+        previous = level
+        level = alpha * Y[:, t] + (1 - alpha) * (level + trend)
+        if beta is not None:
+            trend = beta * (level - previous) + (1 - beta) * trend
+    return errors
+
+def _moving_average_errors(Y, window=3):
+    sums = np.cumsum(np.pad(Y, ((0, 0), (1, 0))), axis=1)
+    means = (sums[:, window:-1] - sums[:, :-window - 1]) / window  # mean of the previous window
+    return Y[:, window:] - means
+
+def _drift_errors(Y):
+    steps = np.diff(Y, axis=1)
+    return steps - steps.mean(axis=1, keepdims=True)
+
+RESIDUALS = {
+    "naive": (lambda Y: np.diff(Y, axis=1), lambda h: 1.0),
+    # Treated like SES with the alpha whose average age matches the window
+    "moving_average": (_moving_average_errors, lambda h, window=3: 2 / (window + 1)),
+    "seasonal_naive": (lambda Y, season_length=12: Y[:, season_length:] - Y[:, :-season_length],
+                       lambda h, season_length=12: (np.arange(1, h) % season_length == 0).astype(float)),
+    "drift": (_drift_errors, lambda h: 1.0),
+    "simple_exp_smoothing": (lambda Y, alpha=0.3: _level_trend_errors(Y, alpha),
+                             lambda h, alpha=0.3: alpha),
+    "holt": (lambda Y, alpha=0.3, beta=0.1: _level_trend_errors(Y, alpha, beta),
+             lambda h, alpha=0.3, beta=0.1: alpha * (1 + beta * np.arange(1, h))),
+}
+
+def forecast_panel(Y, model_type, horizon=30, quantiles=None, **params):
+    """
+    Forecast every row of Y with a baseline in one vectorized call.
+
+    With quantiles, returns (point, bands) where bands has shape
+    (len(quantiles), n_series, horizon), bootstrapped from each series' own
+    one-step residuals for the whole panel at once.
+    """
+    if model_type not in BASELINES:
+        raise ValueError(f"Unknown baseline: {model_type}")
+    point = BASELINES[model_type](Y, horizon, **params)
+    if quantiles is None:
+        return point
+    errors, psi = RESIDUALS[model_type]
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    residuals = errors(Y, **params) if Y.shape[1] > 1 else np.zeros((len(Y), 1))
+    return point, bootstrap_intervals(point, residuals, check_quantiles(quantiles), psi(horizon, **params))
+
+def to_panel(frames, target_col='target'):
+    """
+    Stack date-indexed frames that share the same dates into a 2-D array.
+
+    Returns (series_ids, dates, Y), or None when the dates differ so the
+    caller can fall back to per-series forecasting.
+    """
+    ids = list(frames)
+    if not ids:
+        return None
+    dates = frames[ids[0]].index
+    if not all(frames[i].index.equals(dates) for i in ids):
+        return None
+    Y = np.vstack([frames[i][target_col].to_numpy(dtype=float) for i in ids])
+    return ids, dates, Y
+
+def run_baseline(df, target_col='target', model_type='naive', horizon=30, quantiles=None, **params):
+    """Single-series entry point used by the forecast() model table"""
+    Y = df[target_col].to_numpy(dtype=float)
+    if quantiles is None:
+        return forecast_frame(df.index, forecast_panel(Y, model_type, horizon, **params)[0])
+    point, bands = forecast_panel(Y, model_type, horizon, quantiles, **params)
+    return forecast_frame(df.index, point[0], quantiles, bands[:, 0])
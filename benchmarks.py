@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import pandas as pd
+import numpy as np
+
+# ===== Synthetic Data =====
+def synthetic_panel(n_series=10, n_periods=120, freq='D', trend=0.05, season_length=7,
+                    season_amplitude=1.0, noise=0.5, level=100.0, missing=0.0, seed=0, long=False):
+    """
+    Panel of trending, seasonal, noisy series for benchmarks and tests.
+
+    Parameters:
+    freq: pandas frequency of the shared date index
+    trend: mean slope per period (each series gets its own slope around it)
+    season_length, season_amplitude: period and size of a sine seasonality
+                                     with a random phase per series
+    noise: standard deviation of the Gaussian noise
+    missing: fraction of values set to NaN at random
+    long: return (id, date, value) rows instead of one column per series
+
+    Returns a frame indexed by date with columns s0, s1, ... (or the long form).
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_periods)
+    slopes = trend * rng.uniform(0.5, 1.5, (n_series, 1))
+    phases = rng.uniform(0, 2 * np.pi, (n_series, 1))
+    levels = level * rng.uniform(0.5, 1.5, (n_series, 1))
+    Y = levels + slopes * t + season_amplitude * np.sin(2 * np.pi * t / season_length + phases)
+    Y += rng.normal(0, noise, Y.shape)
+    if missing:
+        Y[rng.random(Y.shape) < missing] = np.nan
+
+    dates = pd.date_range('2020-01-01', periods=n_periods, freq=freq, name='date')
+    wide = pd.DataFrame(Y.T, index=dates, columns=[f"s{i}" for i in range(n_series)])
+    if not long:
+        return wide
+    return (wide.rename_axis(columns='id').stack(future_stack=True).rename('value')
+                .reset_index()[['id', 'date', 'value']])
+
+def synthetic_frame(n_periods=120, n_columns=3, **kwargs):
+    """Single-frame model input: a 'target' column plus n_columns - 1 related columns"""
+    frame = synthetic_panel(n_columns, n_periods, **kwargs)
+    return frame.rename(columns={'s0': 'target'})
+
+# ===== Benchmark Cases =====
+# rows: data-handling cases; model_rows: history per model fit; series: panel size
+SCALES = {
+    'small': {'rows': 10_000, 'model_rows': 120, 'series': 10},
+    'medium': {'rows': 200_000, 'model_rows': 500, 'series': 100},
+    'large': {'rows': 2_000_000, 'model_rows': 2000, 'series': 1000},
+}
+
+def _frame_case(n_columns, missing=0.0):
+    return lambda scale, workdir: (synthetic_frame(scale['model_rows'], n_columns, missing=missing),)
+
+def _model_case(path, **params):
+    def run(df):
+        from model_registry import _resolve
+        return _resolve(path)(df, 'target', horizon=30, **params)
+    return run
+
+def _clean_case(scale, workdir):
+    return (synthetic_frame(scale['rows'] // 10, 10, missing=0.05),)
+
+def _ingest_case(scale, workdir):
+    path = os.path.join(workdir, f"panel_{scale['rows']}.csv")
+    if not os.path.exists(path):
+        n_series = scale['series']
+        panel = synthetic_panel(n_series, scale['rows'] // n_series, long=True)
+        panel.rename(columns={'value': 'revenue'}).to_csv(path, index=False)
+    return (path,)
+
+def _panel_case(scale, workdir):
+    return (synthetic_panel(scale['series'], scale['model_rows'], long=True),)
+
+def _run_clean_data(df):
+    from data_cleaning import clean_data
+    return clean_data(df)
+
+def _run_auto_select(df):
+    from forecasting_engine import auto_select_model
+    return auto_select_model(df)
+
+def _run_evaluate(df):
+    from forecasting_engine import evaluate_models
+    return evaluate_models(df, horizon=30)
+
+def _run_ingest(path):
+    from data_ingestion import load_file_streaming
+    return load_file_streaming(path, id_col='id')
+
+def _run_forecast_many(panel):
+    from forecasting_engine import forecast_many
+    return list(forecast_many(panel, model_type='holt', id_col='id', horizon=30))
+
+def _prophet_panel_case(scale, workdir):
+    # Prophet fits take ~0.1 s each, so a slice of the panel is enough
+    return (synthetic_panel(min(scale['series'], 20), scale['model_rows'], long=True),)
+
+def _run_prophet_many(panel):
+    from forecasting_engine import forecast_many
+    return list(forecast_many(panel, model_type='prophet', id_col='id', horizon=30, profile='fast'))
+
+# name -> (setup(scale, workdir) returning the call's arguments, function to time)
+BENCHMARKS = {
+    'clean_data': (_clean_case, _run_clean_data),
+    'auto_select_model': (_frame_case(3), _run_auto_select),
+    'run_moving_average': (_frame_case(1), _model_case("ml_models:run_moving_average")),
+    'run_exponential_smoothing': (_frame_case(1), _model_case("ml_models:run_exponential_smoothing")),
+    'run_linear_regression': (_frame_case(3), _model_case("ml_models:run_linear_regression")),
+    'run_arima': (_frame_case(1), _model_case("ml_models:run_arima")),
+    'run_auto_arima': (_frame_case(1), _model_case("auto_arima:run_auto_arima", time_budget=30)),
+    'run_prophet': (_frame_case(1), _model_case("ml_models:run_prophet")),
+    'run_prophet_fast': (_frame_case(1), _model_case("ml_models:run_prophet", profile='fast')),
+    'evaluate_models': (_frame_case(1), _run_evaluate),
+    'forecast_many': (_panel_case, _run_forecast_many),
+    'prophet_many': (_prophet_panel_case, _run_prophet_many),
+    'ingest_csv': (_ingest_case, _run_ingest),
+}
+
+# ===== Measurement =====
+def measure(fn, args=(), repeat=3, memory=True):
+    """
+    Time fn(*args): one untimed warm-up call (imports, caches), then `repeat`
+    timed calls, then one call under tracemalloc for the peak allocation.
+    """
+    fn(*args)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    result = {'seconds': float(np.median(times)), 'min_seconds': float(min(times)), 'repeat': repeat}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(*args)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+@contextmanager
+def _cold_caches():
+    """Swap the forecast, profile and auto_arima search caches for ones that keep nothing, so every call refits"""
+    import auto_arima
+    import forecasting_engine
+    import profiling
+    from model_cache import ModelCache
+    saved = (forecasting_engine.default_cache, profiling._profile_cache,
+             auto_arima._aic_cache, auto_arima._differencing_cache)
+    forecasting_engine.default_cache = profiling._profile_cache = ModelCache(max_items=0)
+    auto_arima._aic_cache = auto_arima._differencing_cache = ModelCache(max_items=0)
+    try:
+        yield
+    finally:
+        (forecasting_engine.default_cache, profiling._profile_cache,
+         auto_arima._aic_cache, auto_arima._differencing_cache) = saved
+
+def _environment():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__}
+    return {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'platform': platform.platform(), 'cpus': os.cpu_count(), 'versions': versions}
+
+def run_benchmarks(cases=None, scales=('small',), repeat=3, memory=True, verbose=False):
+    """
+    Run benchmark cases at each scale. Model and profile caches are
+    bypassed, so repeated calls measure real fits rather than cache hits.
+
+    cases: names from BENCHMARKS (default: all)
+    scales: names from SCALES, or dicts with the same keys for custom sizes
+    Returns {'environment': ..., 'results': {"<case>[<scale>]": measurement}};
+    a case that fails records its error instead of timings.
+    """
+    cases = list(BENCHMARKS) if cases is None else list(cases)
+    unknown = set(cases) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {sorted(unknown)}")
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, _cold_caches():
+        for scale in scales:
+            label = scale if isinstance(scale, str) else 'custom'
+            sizes = SCALES[scale] if isinstance(scale, str) else scale
+            for case in cases:
+                setup, fn = BENCHMARKS[case]
+                key = f"{case}[{label}]"
+                try:
+                    results[key] = {**measure(fn, setup(sizes, workdir), repeat, memory), 'sizes': dict(sizes)}
+                except Exception as e:
+                    results[key] = {'error': f"{type(e).__name__}: {e}", 'sizes': dict(sizes)}
+                if verbose:
+                    print(f"{key:40s} {_describe(results[key])}")
+    return {'environment': _environment(), 'results': results}
+
+def _describe(result):
+    if 'error' in result:
+        return f"ERROR {result['error']}"
+    memory = f"  peak {result['peak_mb']:.1f} MB" if 'peak_mb' in result else ""
+    return f"{result['seconds'] * 1000:10.1f} ms{memory}"
+
+# ===== Speed against Accuracy =====
+def prophet_tradeoff(n_series=10, n_periods=800, holdout=30, profiles=None, seed=0):
+    """
+    Fit time and holdout accuracy of each Prophet profile, cold and warm-started.
+
+    Every series is fit on all but the last holdout + 30 periods, then refit
+    on all but the last holdout periods, once from scratch ("cold") and once
+    from the first fit's parameters ("warm"), the way a daily refit would.
+    Returns a DataFrame indexed by (profile, start) with the median refit
+    seconds and the mean holdout MAE and RMSE.
+    """
+    from ml_models import PROPHET_PROFILES, run_prophet
+    from utils import calculate_metrics
+    profiles = list(PROPHET_PROFILES) if profiles is None else list(profiles)
+    panel = synthetic_panel(n_series, n_periods, noise=1.0, season_amplitude=2.0, seed=seed)
+    rows = []
+    for profile in profiles:
+        runs = {'cold': ([], []), 'warm': ([], [])}
+        for name in panel.columns:
+            frame = panel[[name]].rename(columns={name: 'target'})
+            actual = frame['target'].to_numpy()[-holdout:]
+            key = f"prophet_tradeoff:{seed}:{name}"
+            run_prophet(frame.iloc[:-holdout - 30], horizon=holdout, profile=profile, warm_start=key)
+            for start, warm_start in (('cold', None), ('warm', key)):
+                begin = time.perf_counter()
+                result = run_prophet(frame.iloc[:-holdout], horizon=holdout, profile=profile,
+                                     warm_start=warm_start)
+                runs[start][0].append(time.perf_counter() - begin)
+                runs[start][1].append(calculate_metrics(actual, result['forecast'].to_numpy()))
+        for start, (seconds, scores) in runs.items():
+            rows.append({'profile': profile, 'start': start, 'seconds': float(np.median(seconds)),
+                         'MAE': float(np.mean([s['MAE'] for s in scores])),
+                         'RMSE': float(np.mean([s['RMSE'] for s in scores]))})
+    return pd.DataFrame(rows).set_index(['profile', 'start'])
+
+# ===== Results =====
+def save_results(run, path):
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare_results(baseline, current, threshold=0.2, min_seconds=0.001):
+    """
+    Compare two runs case by case.
+
+    Times are compared on the fastest repeat, which is far less sensitive to
+    machine load than the median. A case regresses when that time (or the
+    peak memory) grew by more than `threshold` (0.2 = 20%) and, for time, by
+    more than min_seconds, so timer noise on tiny cases is not flagged.
+    Returns a DataFrame indexed by case.
+    """
+    rows = {}
+    for key, new in current['results'].items():
+        old = baseline['results'].get(key)
+        if old is None or 'error' in old or 'error' in new:
+            continue
+        before, after = old['min_seconds'], new['min_seconds']
+        time_ratio = after / max(before, 1e-12)
+        slower = time_ratio > 1 + threshold and after - before > min_seconds
+        row = {'baseline_s': before, 'current_s': after, 'time_ratio': time_ratio,
+               'memory_ratio': np.nan, 'regression': slower}
+        if 'peak_mb' in old and 'peak_mb' in new:
+            row['memory_ratio'] = new['peak_mb'] / max(old['peak_mb'], 1e-12)
+            row['regression'] = slower or row['memory_ratio'] > 1 + threshold
+        rows[key] = row
+    columns = ['baseline_s', 'current_s', 'time_ratio', 'memory_ratio', 'regression']
+    return pd.DataFrame.from_dict(rows, orient='index', columns=columns)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time and memory-profile the forecasting pipeline")
+    parser.add_argument('--cases', nargs='*', default=None, help=f"default: all of {', '.join(BENCHMARKS)}")
+    parser.add_argument('--scales', nargs='*', default=['small'], choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="relative slowdown flagged as a regression")
+    parser.add_argument('--prophet-tradeoff', action='store_true',
+                        help="also print fit time against holdout accuracy per Prophet profile")
+    args = parser.parse_args()
+
+    if args.prophet_tradeoff:
+        print(prophet_tradeoff().to_string())
+
+    run = run_benchmarks(args.cases, args.scales, args.repeat, not args.no_memory, verbose=True)
+    save_results(run, args.output)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        comparison = compare_results(load_results(args.baseline), run, args.threshold)
+        print(comparison.to_string())
+        if comparison['regression'].any():
+            print(f"Regressions: {', '.join(comparison.index[comparison['regression']])}")
+            sys.exit(1)
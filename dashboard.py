@@ -1,26 +1,61 @@
 import streamlit as st
-import pandas as pd
 from forecasting_engine import forecast
+from model_cache import fingerprint
+from profiling import profile_frame
+from result_store import ForecastResultStore
+from data_ingestion import load_file_streaming
+from scenarios import ScenarioEngine, scenario_frames
 
 def main():
     st.title("Financial Forecasting Dashboard")
     
     uploaded_file = st.file_uploader("Upload financial data (CSV/Excel)")
     if uploaded_file:
-        df = pd.read_csv(uploaded_file)
+        try:
+            df = load_file_streaming(uploaded_file)
+        except ValueError as e:
+            st.error(f"Invalid data file: {e}")
+            return
         st.write("Data Preview:", df.head())
+        st.write("Series Profile:", profile_frame(df))
         
+        store = ForecastResultStore()
+        run_id = f"dashboard-{fingerprint(df)}"
         if st.button("Run Forecast"):
-            forecast_results = forecast(df)
-            st.line_chart(forecast_results)
-            st.download_button("Download Forecast", forecast_results.to_csv(), "forecast_results.csv")
-    
+            forecast_results, model_used = forecast(df)
+            store.write({'target': forecast_results}, run_id, model=model_used)
+        if run_id in store:
+            # Reruns (a scenario slider move) and later sessions read the saved run back instead of refitting
+            forecast_results = store.read_frame(run_id, 'target')
+            st.write(f"Model: {store.info(run_id)['models'][0]}")
+            st.line_chart(forecast_results.set_index('date'))
+            # The CSV is only built when clicked, streamed from the stored run
+            st.download_button("Download Forecast", lambda: store.csv_file(run_id), "forecast_results.csv",
+                               mime="text/csv")
+            show_scenarios(forecast_results)
+
+@st.cache_resource
+def scenario_engine(horizon, n_paths=10000, seed=0):
+    """Shock paths drawn once per horizon; slider moves only rescale them"""
+    return ScenarioEngine(horizon=horizon, n_paths=n_paths, seed=seed)
+
+def show_scenarios(forecast_results):
+    """Optimistic/base/pessimistic bands from simulated shock paths around the forecast"""
     st.sidebar.header("Scenario Analysis")
     scenarios = {
         'Optimistic': st.sidebar.slider("Optimistic", 0.5, 2.0, 1.2),
         'Base': st.sidebar.slider("Base", 0.5, 2.0, 1.0),
         'Pessimistic': st.sidebar.slider("Pessimistic", 0.5, 2.0, 0.8)
     }
+    try:
+        engine = scenario_engine(len(forecast_results)).with_multipliers(
+            scenarios['Optimistic'], scenarios['Base'], scenarios['Pessimistic'])
+    except ValueError as e:
+        st.sidebar.error(str(e))
+        return
+    bands = scenario_frames({'forecast': forecast_results[['date', 'forecast']]}, engine)['forecast']
+    st.write("Scenario Bands (10th / 50th / 90th percentile):")
+    st.line_chart(bands.set_index('date'))
 
 if __name__ == "__main__":
     main()
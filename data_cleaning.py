@@ -1,16 +1,111 @@
 import pandas as pd
+import numpy as np
+import instrumentation
 
-def clean_data(df: pd.DataFrame):
-    # Handle missing values
-    df = df.interpolate(method='time').fillna(method='bfill')
-    
-    # Convert date column to datetime
+class Scaler:
+    """
+    Per-column z-score parameters (mean, sample std) kept after cleaning.
+
+    transform/inverse_transform map between original and normalised units,
+    and partial_fit folds new rows into the running mean/variance without
+    rescanning the history.
+    """
+    def __init__(self):
+        self.count = {}
+        self.mean = {}
+        self.m2 = {}  # sum of squared deviations from the mean
+
+    def std(self, column):
+        n = self.count[column]
+        std = np.sqrt(self.m2[column] / (n - 1)) if n > 1 else 0.0
+        return std if std > 0 else 1.0  # constant columns are only centred
+
+    def _fit_column(self, column, values):
+        self.count[column] = len(values)
+        self.mean[column] = float(values.mean()) if len(values) else 0.0
+        self.m2[column] = float(((values - self.mean[column]) ** 2).sum())
+
+    def partial_fit(self, df):
+        """Update the statistics with new rows (Chan et al. parallel variance)"""
+        for column in self.mean:
+            if column not in df:
+                continue
+            values = df[column].to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            n_new = len(values)
+            if n_new == 0:
+                continue
+            mean_new = values.mean()
+            m2_new = ((values - mean_new) ** 2).sum()
+            n_old, mean_old = self.count[column], self.mean[column]
+            total = n_old + n_new
+            delta = mean_new - mean_old
+            self.mean[column] = mean_old + delta * n_new / total
+            self.m2[column] += m2_new + delta**2 * n_old * n_new / total
+            self.count[column] = total
+        return self
+
+    def transform(self, values, column):
+        return (values - self.mean[column]) / self.std(column)
+
+    def inverse_transform(self, values, column):
+        """Map model output for `column` back to original units"""
+        if isinstance(values, pd.DataFrame):
+            values = values.copy()
+            if 'forecast' in values.columns:
+                # forecast_frame output: the point and quantile columns are all in target units
+                for col in values.select_dtypes(include=['number']).columns:
+                    values[col] = self.inverse_transform(values[col], column)
+            else:
+                for col in values.columns.intersection(list(self.mean)):
+                    values[col] = self.inverse_transform(values[col], col)
+            return values
+        return values * self.std(column) + self.mean[column]
+
+# ===== Cleaning Steps =====
+def _fill_missing(values, positions):
+    """Time-weighted interpolation; leading/trailing gaps take the nearest value"""
+    missing = np.isnan(values)
+    if missing.any() and not missing.all():
+        values[missing] = np.interp(positions[missing], positions[~missing], values[~missing])
+    return values
+
+@instrumentation.traced('clean')
+def clean_data(df: pd.DataFrame, scaler=None, return_scaler=False):
+    """
+    Index by date, fill gaps and z-score every numeric column.
+
+    Numeric columns are copied once into a float block and each column is
+    then filled and normalised in place in a single pass. Pass a fitted
+    Scaler to reuse its parameters (e.g. for new rows); otherwise one is
+    fitted here. return_scaler=True returns (cleaned, scaler) so forecasts
+    can be mapped back with scaler.inverse_transform.
+    """
+    # Convert date column first so interpolation can weight by time
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-    
-    # Normalize numerical columns
+        index = pd.DatetimeIndex(pd.to_datetime(df['date']), name='date')
+        df = df.drop(columns='date')
+    else:
+        index = df.index
+
     numeric_cols = df.select_dtypes(include=['number']).columns
-    df[numeric_cols] = (df[numeric_cols] - df[numeric_cols].mean()) / df[numeric_cols].std()
-    
-    return df
+    other_cols = df.columns.difference(numeric_cols, sort=False)
+    block = df[numeric_cols].to_numpy(dtype=float, copy=True)
+    instrumentation.count('rows_cleaned', len(block))
+    positions = index.asi8.astype(float) if isinstance(index, pd.DatetimeIndex) else np.arange(len(index), dtype=float)
+
+    fit = scaler is None
+    scaler = Scaler() if fit else scaler
+    for i, column in enumerate(numeric_cols):
+        values = _fill_missing(block[:, i], positions)
+        if fit:
+            scaler._fit_column(column, values)
+        values -= scaler.mean[column]
+        values /= scaler.std(column)
+
+    cleaned = pd.DataFrame(block, index=index, columns=numeric_cols)
+    for column in other_cols:
+        cleaned[column] = df[column].to_numpy()
+    cleaned = cleaned[[c for c in df.columns]]
+
+    return (cleaned, scaler) if return_scaler else cleaned
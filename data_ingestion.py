@@ -1,11 +1,19 @@
 import pandas as pd
+from pandas.api.types import union_categoricals
 import requests
 from bs4 import BeautifulSoup
 import json
 import time
 import random
 import yfinance as yf
+from requests.structures import CaseInsensitiveDict
+from http_cache import ResponseCache, get_response_cache
+import instrumentation
 import os
+import hashlib
+from itertools import islice
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # User-Agent rotation
@@ -18,24 +26,80 @@ USER_AGENTS = [
 def get_random_agent():
     return random.choice(USER_AGENTS)
 
-def safe_request(url, max_retries=3):
+def _cached_response(entry):
+    """Rebuild a requests.Response from an http_cache entry"""
+    response = requests.Response()
+    response.url = entry['url']
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = entry['content']
+    return response
+
+@instrumentation.traced('http_request')
+def safe_request(url, max_retries=3, cache=None):
+    """
+    GET url with retries, through the persistent response cache.
+
+    Fresh cache entries are returned without a request; stale ones are
+    revalidated with ETag/Last-Modified. Pass cache=False to bypass it.
+    """
+    cache = get_response_cache() if cache is None else cache
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.is_fresh(entry):
+        instrumentation.count('http_cache_hits')
+        return _cached_response(entry)
+
     for _ in range(max_retries):
         try:
+            headers = {"User-Agent": get_random_agent(), **ResponseCache.conditional_headers(entry)}
+            instrumentation.count('http_requests')
             response = requests.get(
                 url,
-                headers={"User-Agent": get_random_agent()},
+                headers=headers,
                 timeout=15
             )
+            instrumentation.count('http_bytes', len(response.content))
+            if response.status_code == 304 and entry:
+                instrumentation.count('http_not_modified')
+                cache.touch(url)
+                return _cached_response(entry)
             response.raise_for_status()
+            if cache:
+                cache.store(url, response.status_code, response.headers, response.content)
             return response
         except Exception as e:
             print(f"Retry {_+1}/{max_retries} for {url}: {e}")
+            instrumentation.count('http_retries')
             time.sleep(2 + random.random()*3)
+    instrumentation.count('http_failures')
     return None
 
 # ================== File Data Loading ==================
-def load_file_data(file_path):
-    """Auto-detect and load data file with validation"""
+def _file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def _file_store_key(file_path):
+    """Store ticker for a file: its name plus a short hash of the full path"""
+    path = os.path.abspath(file_path)
+    digest = hashlib.sha1(path.encode()).hexdigest()[:8]
+    return f"{os.path.splitext(os.path.basename(path))[0]}-{digest}"
+
+def load_file_data(file_path, store=None):
+    """
+    Auto-detect and load data file with validation.
+
+    With a TimeSeriesStore, the file is parsed and validated only the first
+    time (or after it changes); later loads read the stored Parquet copy.
+    """
+    if store is not None:
+        key = _file_store_key(file_path)
+        if store.manifest().get(key) == _file_fingerprint(file_path):
+            stored = store.read('file', key)
+            if stored is not None:
+                return stored.drop(columns=['ticker', 'year'])
+
     # Detect file type
     ext = os.path.splitext(file_path)[1].lower()
     
@@ -51,22 +115,32 @@ def load_file_data(file_path):
     
     # Validate structure
     validate_data_structure(df)
+
+    if store is not None:
+        store.write(df, 'file', key, mode='overwrite')
+        store.record_ingest(key, _file_fingerprint(file_path))
     
     return df
 
-def validate_data_structure(df):
-    """Ensure data has required columns"""
-    required_columns = {'date', 'revenue', 'sales', 'expenses', 
-                       'profit', 'cashflow', 'demand'}
-    found_columns = set(df.columns)
+METRIC_COLUMNS = {'revenue', 'sales', 'expenses', 'profit', 'cashflow', 'demand'}
+
+def validate_columns(columns):
+    """Check column names for a date column and at least one financial metric"""
+    found_columns = set(columns)
     
     # Check for date column
     if 'date' not in found_columns:
         raise ValueError("Data must contain 'date' column")
     
     # Check for at least one financial metric
-    if len(found_columns.intersection(required_columns)) < 1:
+    if len(found_columns.intersection(METRIC_COLUMNS)) < 1:
         raise ValueError("Data must contain at least one financial metric column")
+
+    return True
+
+def validate_data_structure(df):
+    """Ensure data has required columns"""
+    validate_columns(df.columns)
     
     # Convert date column
     if 'date' in df.columns:
@@ -74,10 +148,167 @@ def validate_data_structure(df):
     
     return True
 
+# ================== Streaming File Loading ==================
+def _file_ext(source):
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    return os.path.splitext(str(name))[1].lower()
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+def read_header(source):
+    """Column names of a CSV / JSON Lines / Excel file, without parsing the body"""
+    ext = _file_ext(source)
+    _rewind(source)
+    if ext == '.csv':
+        columns = list(pd.read_csv(source, nrows=0).columns)
+    elif ext in ('.json', '.jsonl'):
+        columns = list(pd.read_json(source, lines=ext == '.jsonl', nrows=1 if ext == '.jsonl' else None).columns)
+    elif ext in ('.xlsx', '.xls'):
+        columns = list(pd.read_excel(source, nrows=0).columns)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+    _rewind(source)
+    return columns
+
+def _infer_dtypes(sample, id_col, float_dtype):
+    """Numeric columns -> float_dtype, id column -> category, from a sample of rows"""
+    dtypes = {c: float_dtype for c in sample.select_dtypes(include=['number']).columns}
+    if id_col:
+        dtypes[id_col] = 'category'
+    dtypes.pop('date', None)
+    return dtypes
+
+def _iter_excel_rows(source, columns, chunksize):
+    import openpyxl
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    header = [str(c) for c in next(rows)]
+    keep = [header.index(c) for c in columns]
+    while True:
+        block = list(islice(rows, chunksize))
+        if not block:
+            break
+        yield pd.DataFrame([[row[i] for i in keep] for row in block], columns=columns)
+    workbook.close()
+
+def _downcast(chunk, dtypes):
+    chunk['date'] = pd.to_datetime(chunk['date'])
+    for col, dtype in dtypes.items():
+        if col in chunk.columns and dtype != 'category':
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype(dtype)
+        elif col in chunk.columns:
+            chunk[col] = chunk[col].astype('category')
+    return chunk
+
+def iter_file_chunks(source, chunksize=100_000, usecols=None, id_col=None, float_dtype='float32'):
+    """
+    Yield a large file as parsed chunks.
+
+    The header is validated before the body is read. Numeric columns are
+    downcast to float_dtype, id_col becomes categorical and dates are parsed
+    once, in the chunk that carries them. CSV, JSON Lines (.jsonl) and
+    Excel stream; a plain .json document has to be parsed whole first.
+    """
+    header = read_header(source)
+    validate_columns(header)
+    missing = set(usecols or []) - set(header)
+    if missing:
+        raise ValueError(f"Columns not found in file: {sorted(missing)}")
+    columns = [c for c in header if usecols is None or c in usecols or c in ('date', id_col)]
+    ext = _file_ext(source)
+
+    dtypes = None
+    if ext == '.csv':
+        # Parse straight into the narrow dtypes instead of float64 first
+        dtypes = _infer_dtypes(pd.read_csv(source, nrows=1000, usecols=columns), id_col, float_dtype)
+        _rewind(source)
+        chunks = pd.read_csv(source, chunksize=chunksize, usecols=columns, dtype=dtypes,
+                             parse_dates=['date'])
+    elif ext == '.jsonl':
+        chunks = pd.read_json(source, lines=True, chunksize=chunksize)
+    elif ext == '.xlsx':
+        chunks = _iter_excel_rows(source, columns, chunksize)
+    else:
+        full = pd.read_excel(source) if ext == '.xls' else pd.read_json(source)
+        full = full[columns]
+        chunks = (full.iloc[i:i + chunksize] for i in range(0, len(full), chunksize))
+
+    for chunk in chunks:
+        chunk = chunk[columns]
+        if dtypes is None:
+            dtypes = _infer_dtypes(chunk, id_col, float_dtype)
+        instrumentation.count('rows_ingested', len(chunk))
+        yield _downcast(chunk, dtypes)
+
+_PARTIAL_AGGS = {'sum': 'sum', 'mean': 'sum', 'min': 'min', 'max': 'max', 'last': 'last', 'first': 'first'}
+
+@instrumentation.traced('ingest')
+def load_file_streaming(source, chunksize=100_000, usecols=None, id_col=None,
+                        freq=None, agg='sum', float_dtype='float32'):
+    """
+    Load a large CSV/JSON Lines/Excel upload chunk by chunk.
+
+    Parameters:
+    source: file path or file-like object with a .name (e.g. a Streamlit upload)
+    usecols: metric columns to keep (date and id_col are always kept)
+    id_col: optional series identifier column, stored as categorical
+    freq: pandas frequency (e.g. 'D', 'W', 'MS'); when set, each chunk is
+          aggregated to it as it is read, so the raw rows are never all in memory
+    agg: 'sum', 'mean', 'min', 'max', 'first' or 'last' (used with freq)
+    """
+    if agg not in _PARTIAL_AGGS:
+        raise ValueError(f"Unsupported aggregation: {agg}")
+    chunks = iter_file_chunks(source, chunksize, usecols, id_col, float_dtype)
+
+    if freq is None:
+        parts = list(chunks)
+        if not parts:
+            return pd.DataFrame(columns=read_header(source))
+        if id_col:
+            union = union_categoricals([p[id_col] for p in parts])
+            for p in parts:
+                p[id_col] = pd.Categorical(p[id_col], categories=union.categories)
+        return pd.concat(parts, ignore_index=True)
+
+    keys = [id_col, 'date'] if id_col else ['date']
+    running = None
+    for chunk in chunks:
+        grouper = [chunk[id_col].astype(str)] if id_col else []
+        grouper.append(pd.Grouper(key='date', freq=freq))
+        grouped = chunk.groupby(grouper, observed=True)
+        values = chunk.columns.difference(keys)
+        partial = grouped[values].agg(_PARTIAL_AGGS[agg])
+        if agg == 'mean':
+            partial = partial.join(grouped[values].count().add_suffix('__count'))
+        partial = partial.reset_index()
+        if running is not None:
+            # Fold this chunk into the running aggregate so memory stays bounded
+            combined = pd.concat([running, partial], ignore_index=True).groupby(keys, sort=False)
+            how = {c: 'sum' if agg == 'mean' else _PARTIAL_AGGS[agg] for c in partial.columns if c not in keys}
+            partial = combined.agg(how).reset_index()
+        running = partial
+
+    if running is None:
+        return pd.DataFrame(columns=keys)
+    if agg == 'mean':
+        count_cols = [c for c in running.columns if c.endswith('__count')]
+        for col in count_cols:
+            value_col = col[:-len('__count')]
+            running[value_col] = running[value_col] / running[col].where(running[col] > 0)
+        running = running.drop(columns=count_cols)
+    if id_col:
+        running[id_col] = running[id_col].astype('category')
+    float_cols = running.columns.difference(keys)
+    running[float_cols] = running[float_cols].astype(float_dtype)
+    return running.sort_values(keys, ignore_index=True)
+
 # ================== MoneyControl ================== 
-def get_moneycontrol_sc_id(ticker: str):
-    url = f"https://www.moneycontrol.com/mc/mccommon/suggestions?query={ticker}&type=1&format=json"
-    response = safe_request(url)
+MONEYCONTROL_SUGGEST_URL = "https://www.moneycontrol.com/mc/mccommon/suggestions?query={ticker}&type=1&format=json"
+MONEYCONTROL_FINANCIALS_URL = "https://www.moneycontrol.com/mc/widget/getdetailedfinancial?classic=true&scId={sc_id}&type={statement_type}"
+
+def parse_moneycontrol_sc_id(response):
     if response:
         try:
             suggestions = response.json()
@@ -87,13 +318,7 @@ def get_moneycontrol_sc_id(ticker: str):
             pass
     return None
 
-def fetch_moneycontrol_financials(ticker: str, statement_type: str = 'income'):
-    sc_id = get_moneycontrol_sc_id(ticker)
-    if not sc_id:
-        return None
-        
-    url = f"https://www.moneycontrol.com/mc/widget/getdetailedfinancial?classic=true&scId={sc_id}&type={statement_type}"
-    response = safe_request(url)
+def parse_moneycontrol_financials(response):
     if response:
         try:
             data = response.json()
@@ -102,10 +327,30 @@ def fetch_moneycontrol_financials(ticker: str, statement_type: str = 'income'):
             pass
     return None
 
+def get_moneycontrol_sc_id(ticker: str, cache=None):
+    """Look up MoneyControl's sc_id for a ticker, memoised durably in the response cache"""
+    cache = get_response_cache() if cache is None else cache
+    sc_id = cache.get_sc_id(ticker) if cache else None
+    if sc_id:
+        return sc_id
+    url = MONEYCONTROL_SUGGEST_URL.format(ticker=ticker)
+    sc_id = parse_moneycontrol_sc_id(safe_request(url, cache=cache))
+    if sc_id and cache:
+        cache.set_sc_id(ticker, sc_id)
+    return sc_id
+
+def fetch_moneycontrol_financials(ticker: str, statement_type: str = 'income'):
+    sc_id = get_moneycontrol_sc_id(ticker)
+    if not sc_id:
+        return None
+        
+    url = MONEYCONTROL_FINANCIALS_URL.format(sc_id=sc_id, statement_type=statement_type)
+    return parse_moneycontrol_financials(safe_request(url))
+
 # ================== Motilal Oswal ==================
-def fetch_motilal_oswal_research(ticker: str):
-    url = f"https://www.motilaloswal.com/api/research/reports?symbol={ticker}"
-    response = safe_request(url)
+MOTILAL_OSWAL_URL = "https://www.motilaloswal.com/api/research/reports?symbol={ticker}"
+
+def parse_motilal_oswal_research(response):
     if response:
         try:
             reports = response.json()['data']
@@ -114,10 +359,13 @@ def fetch_motilal_oswal_research(ticker: str):
             pass
     return None
 
+def fetch_motilal_oswal_research(ticker: str):
+    return parse_motilal_oswal_research(safe_request(MOTILAL_OSWAL_URL.format(ticker=ticker)))
+
 # ================== Trendlyne ==================
-def fetch_trendlyne_insights(ticker: str):
-    url = f"https://trendlyne.com/equity/{ticker}/"
-    response = safe_request(url)
+TRENDLYNE_URL = "https://trendlyne.com/equity/{ticker}/"
+
+def parse_trendlyne_insights(response):
     if response:
         try:
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -135,10 +383,13 @@ def fetch_trendlyne_insights(ticker: str):
             pass
     return None
 
+def fetch_trendlyne_insights(ticker: str):
+    return parse_trendlyne_insights(safe_request(TRENDLYNE_URL.format(ticker=ticker)))
+
 # ================== ICICI Direct ==================
-def fetch_icici_direct_analysis(ticker: str):
-    url = f"https://www.icicidirect.com/equity/{ticker}"
-    response = safe_request(url)
+ICICI_DIRECT_URL = "https://www.icicidirect.com/equity/{ticker}"
+
+def parse_icici_direct_analysis(response):
     if response:
         try:
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -152,10 +403,13 @@ def fetch_icici_direct_analysis(ticker: str):
             pass
     return None
 
+def fetch_icici_direct_analysis(ticker: str):
+    return parse_icici_direct_analysis(safe_request(ICICI_DIRECT_URL.format(ticker=ticker)))
+
 # ================== Corporate Finance Institute ==================
-def fetch_cfi_resources(topic: str):
-    url = f"https://corporatefinanceinstitute.com/resources/search/?q={topic}"
-    response = safe_request(url)
+CFI_URL = "https://corporatefinanceinstitute.com/resources/search/?q={topic}"
+
+def parse_cfi_resources(response):
     if response:
         try:
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -173,10 +427,13 @@ def fetch_cfi_resources(topic: str):
             pass
     return None
 
+def fetch_cfi_resources(topic: str):
+    return parse_cfi_resources(safe_request(CFI_URL.format(topic=topic)))
+
 # ================== IIFL (India Infoline Limited) ==================
-def fetch_iifl_news(ticker: str):
-    url = f"https://www.indiainfoline.com/company/{ticker.lower()}/news-and-research/378"
-    response = safe_request(url)
+IIFL_URL = "https://www.indiainfoline.com/company/{ticker}/news-and-research/378"
+
+def parse_iifl_news(response):
     if response:
         try:
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -195,13 +452,17 @@ def fetch_iifl_news(ticker: str):
             print(f"IIFL parsing error: {e}")
     return None
 
+def fetch_iifl_news(ticker: str):
+    return parse_iifl_news(safe_request(IIFL_URL.format(ticker=ticker.lower())))
+
 # ================== Bloomberg (Placeholder) ==================
 def fetch_bloomberg_data(ticker: str, data_type: str = 'quote'):
     print(f"Fetching {data_type} for {ticker} from Bloomberg...")
     return pd.DataFrame()
 
 # ================== Unified Data Loader ==================
-def load_data(source: str, **kwargs):
+@instrumentation.traced('load_data')
+def load_data(source: str, store=None, **kwargs):
     """
     Unified data loader with support for:
     - Web sources: moneycontrol, motilaloswal, trendlyne, icicidirect, cfi, iifl, bloomberg, yahoo
@@ -209,15 +470,22 @@ def load_data(source: str, **kwargs):
     
     Parameters:
     source: Data source identifier
+    store: optional TimeSeriesStore. Files are served from it once ingested;
+           web results are written to it (partitioned by source/ticker/year)
     **kwargs: Source-specific parameters:
         For files: file_path
         For web: ticker, data_type, period, etc.
     """
     # File-based sources
     if source in ['csv', 'excel', 'json']:
-        return load_file_data(kwargs['file_path'])
+        return load_file_data(kwargs['file_path'], store=store)
     
-    # Web-based sources
+    df = _load_web_data(source, **kwargs)
+    if store is not None and isinstance(df, pd.DataFrame) and len(df):
+        store.write(df, source, kwargs.get('ticker') or kwargs.get('topic', ''))
+    return df
+
+def _load_web_data(source: str, **kwargs):
     ticker = kwargs.get('ticker', '')
     data_type = kwargs.get('data_type', 'financials')
     
@@ -250,11 +518,42 @@ def load_data(source: str, **kwargs):
         stock = yf.Ticker(ticker)
         if data_type == 'history':
             return stock.history(period=kwargs.get('period', '1y'))
+        elif data_type == 'stream':
+            # Generator of new (timestamp, price) bars for streaming.OnlineForecaster.run
+            from streaming import yahoo_bars
+            return yahoo_bars(ticker, kwargs.get('interval', '1m'), kwargs.get('column', 'Close'),
+                              poll_seconds=kwargs.get('poll_seconds', 60))
         elif data_type == 'financials':
             return stock.income_stmt
     
     raise ValueError(f"Unsupported source: {source}")
 
+def load_data_many(source: str, tickers, concurrency=20, rate_per_host=2.0, cache=None, **kwargs):
+    """
+    Load many tickers from one web source concurrently.
+
+    Requests share pooled keep-alive connections, at most `concurrency` are in
+    flight, and each host is held to `rate_per_host` requests per second.
+    Responses go through the same response cache as safe_request
+    (cache=False bypasses it).
+    Returns {ticker: DataFrame or None}. See async_ingestion for details.
+    """
+    if source in ['csv', 'excel', 'json']:
+        raise ValueError("load_data_many only supports web sources")
+    from async_ingestion import AsyncFetcher, load_data_many_async
+
+    async def run():
+        async with AsyncFetcher(concurrency, rate_per_host, cache=cache) as fetcher:
+            return await load_data_many_async(source, list(tickers), fetcher, **kwargs)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())
+    # Already inside an event loop (e.g. Jupyter): run on a separate thread
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(asyncio.run, run()).result()
+
 # ================== Sample Data Generator ==================
 def generate_sample_data():
     """Create sample financial data template"""
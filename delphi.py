@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+
+class DelphiRound:
+    """
+    Expert submissions for one metric in one round.
+
+    Values and confidence weights live in growable NumPy arrays with one slot
+    per expert. The confidence-weighted mean and variance are kept as
+    running statistics (weighted Welford), so a submission or a revised
+    submission is an O(1) update. Robust aggregates (median, trimmed mean)
+    are computed from the arrays on request.
+    """
+    def __init__(self, capacity=64):
+        self.values = np.empty(capacity)
+        self.weights = np.empty(capacity)
+        self.slots = {}  # expert -> position in the arrays
+        self.weight = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _add(self, value, weight):
+        if weight <= 0:
+            return
+        self.weight += weight
+        delta = value - self.mean
+        self.mean += weight / self.weight * delta
+        self.m2 += weight * delta * (value - self.mean)
+
+    def _remove(self, value, weight):
+        if weight <= 0:
+            return
+        remaining = self.weight - weight
+        if remaining <= 1e-12 * weight:
+            self.weight, self.mean, self.m2 = 0.0, 0.0, 0.0
+            return
+        delta = value - self.mean
+        previous_mean = self.mean - weight / remaining * delta
+        self.m2 = max(self.m2 - weight * (value - previous_mean) * delta, 0.0)
+        self.mean, self.weight = previous_mean, remaining
+
+    def submit(self, expert, value, confidence=1.0):
+        """Record (or revise) one expert's forecast; returns the weighted mean"""
+        value, confidence = float(value), float(confidence)
+        if not np.isfinite(value):
+            raise ValueError(f"Forecast from {expert} is not a number")
+        if not confidence >= 0:
+            raise ValueError(f"Confidence from {expert} must be non-negative")
+        slot = self.slots.get(expert)
+        if slot is None:
+            slot = len(self.slots)
+            if slot == len(self.values):
+                self.values = np.resize(self.values, 2 * slot)
+                self.weights = np.resize(self.weights, 2 * slot)
+            self.slots[expert] = slot
+        else:
+            self._remove(self.values[slot], self.weights[slot])
+        self.values[slot], self.weights[slot] = value, confidence
+        self._add(value, confidence)
+        return self.mean
+
+    @property
+    def std(self):
+        """Confidence-weighted standard deviation"""
+        return float(np.sqrt(self.m2 / self.weight)) if self.weight > 0 else np.nan
+
+    def median(self):
+        return float(np.median(self.values[:len(self)])) if len(self) else np.nan
+
+    def trimmed_mean(self, proportion=0.1):
+        """Mean after dropping `proportion` of the submissions from each end"""
+        n = len(self)
+        if not n:
+            return np.nan
+        cut = int(proportion * n)
+        ordered = np.sort(self.values[:n])
+        return float(ordered[cut:n - cut].mean())
+
+    def iqr(self):
+        if not len(self):
+            return np.nan
+        q1, q3 = np.percentile(self.values[:len(self)], [25, 75])
+        return float(q3 - q1)
+
+    def stats(self, proportion=0.1):
+        """Consensus statistics for the round"""
+        mean = float(self.mean) if self.weight > 0 else np.nan
+        return {'experts': len(self), 'weighted_mean': mean, 'std': self.std,
+                'cv': self.std / abs(mean) if mean else np.nan,
+                'median': self.median(), 'trimmed_mean': self.trimmed_mean(proportion), 'iqr': self.iqr()}
+
+class DelphiStore:
+    """
+    Headless store of Delphi submissions across metrics and rounds.
+
+    Each (metric, round) is a DelphiRound. Rounds are numbered from 1; a
+    submission without a round number goes to the metric's current round,
+    and next_round() opens the next one. UIs (the Streamlit sidebar, a
+    service endpoint, a CSV import) are clients that call submit().
+    """
+    def __init__(self):
+        self._rounds = {}
+        self._current = {}
+
+    def __repr__(self):
+        return f"DelphiStore({len(self.metrics)} metrics, {len(self._rounds)} rounds)"
+
+    @property
+    def metrics(self):
+        return list(self._current)
+
+    def current_round(self, metric='forecast'):
+        return self._current.get(metric, 1)
+
+    def next_round(self, metric=None):
+        """Open the next round for one metric (or every metric); returns nothing"""
+        for name in ([metric] if metric is not None else self.metrics):
+            self._current[name] = self.current_round(name) + 1
+
+    def round(self, metric='forecast', round_num=None):
+        round_num = self.current_round(metric) if round_num is None else round_num
+        if (metric, round_num) not in self._rounds:
+            raise KeyError(f"No submissions for {metric} round {round_num}")
+        return self._rounds[(metric, round_num)]
+
+    def rounds(self, metric='forecast'):
+        return sorted(r for m, r in self._rounds if m == metric)
+
+    def submit(self, expert, value, confidence=1.0, metric='forecast', round_num=None):
+        """Record one forecast; returns the round's running weighted mean"""
+        self._current.setdefault(metric, 1)
+        round_num = self.current_round(metric) if pd.isna(round_num) else int(round_num)
+        data = self._rounds.get((metric, round_num))
+        if data is None:
+            data = self._rounds[(metric, round_num)] = DelphiRound()
+        return data.submit(expert, value, confidence)
+
+    def submit_many(self, frame):
+        """
+        Bulk import from a frame with expert and value columns, plus optional
+        metric, round and confidence columns.
+        """
+        missing = {'expert', 'value'} - set(frame.columns)
+        if missing:
+            raise ValueError(f"Missing columns: {sorted(missing)}")
+        n = len(frame)
+        columns = [frame['expert'].to_numpy(), frame['value'].to_numpy(dtype=float),
+                   frame['confidence'].to_numpy(dtype=float) if 'confidence' in frame else np.ones(n),
+                   frame['metric'].to_numpy() if 'metric' in frame else np.full(n, 'forecast', dtype=object),
+                   frame['round'].to_numpy() if 'round' in frame else np.full(n, None, dtype=object)]
+        for expert, value, confidence, metric, round_num in zip(*columns):
+            self.submit(expert, value, confidence, metric, round_num)
+
+    def converged(self, metric='forecast', tol=0.05):
+        """
+        True once the median moved by less than tol (relative) between the
+        last two rounds and the spread (IQR) did not widen.
+        """
+        rounds = self.rounds(metric)
+        if len(rounds) < 2:
+            return False
+        before, after = self._rounds[(metric, rounds[-2])], self._rounds[(metric, rounds[-1])]
+        shift = abs(after.median() - before.median()) / max(abs(before.median()), 1e-12)
+        return bool(shift < tol and after.iqr() <= before.iqr() * (1 + tol))
+
+    def summary(self, proportion=0.1):
+        """One row of consensus statistics per metric and round"""
+        keys = sorted(self._rounds, key=lambda key: (str(key[0]), key[1]))
+        rows = [{'metric': metric, 'round': round_num, **self._rounds[(metric, round_num)].stats(proportion)}
+                for metric, round_num in keys]
+        return pd.DataFrame(rows)
@@ -0,0 +1,291 @@
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, unquote, urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+import numpy as np
+import instrumentation
+from forecasting_engine import MODELS, forecast, forecast_many
+from baselines import BASELINES
+from intervals import check_quantiles
+from model_cache import default_cache, fingerprint
+from result_store import ForecastResultStore
+
+class LatencyTracker:
+    """Rolling window of request latencies, summarised as p50/p99 per model"""
+    def __init__(self, window=10000):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_type, seconds):
+        with self._lock:
+            for key in (model_type, "all"):
+                self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def summary(self):
+        with self._lock:
+            samples = {key: np.array(values) for key, values in self._samples.items()}
+        return {key: {"count": len(values),
+                      "p50_ms": float(np.percentile(values, 50) * 1000),
+                      "p99_ms": float(np.percentile(values, 99) * 1000)}
+                for key, values in samples.items()}
+
+class ForecastService:
+    """
+    In-process forecasting server state: a warm model cache plus a micro-batcher.
+
+    Requests are queued per (model_type, target_col, params). A dispatcher
+    thread waits up to max_wait seconds for concurrent requests to join a
+    group, then runs each group as one batch: vectorizable baselines are
+    forecast in a single forecast_many() panel call; for other models each
+    distinct series is fitted once (in parallel) against the shared cache, so
+    repeated series are served without refitting.
+    """
+    def __init__(self, cache=None, max_batch=64, max_wait=0.005, n_workers=4):
+        self.cache = default_cache if cache is None else cache
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.latency = LatencyTracker()
+        self.batches = 0
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=n_workers)
+        self._stopped = False
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def warm_up(self, model_types=("arima", "exponential_smoothing", "prophet", "linear_regression")):
+        """Fit each model once on synthetic data so imports and first-fit costs are paid up front"""
+        t = np.arange(120)
+        df = pd.DataFrame({'target': 10 + 0.1 * t + np.sin(t * 2 * np.pi / 12)},
+                          index=pd.date_range('2020-01-01', periods=120, name='date'))
+        for model_type in model_types:
+            try:
+                forecast(df, model_type, cache=False)
+            except Exception as e:
+                print(f"Warm-up failed for {model_type}: {e}")
+
+    def submit(self, df, model_type="auto", target_col='target', **params):
+        """Queue one forecast; returns a Future resolving to (forecast, model_type)"""
+        if model_type != "auto" and model_type not in MODELS:
+            raise ValueError(f"Unknown model type: {model_type}")
+        future = Future()
+        key = (model_type, target_col, repr(sorted(params.items())))
+        with self._cond:
+            group = self._pending.setdefault(key, (params, []))[1]
+            group.append((df, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    # ----- batching -----
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped and not self._pending:
+                    return
+                # Give concurrent requests a moment to join unless a group is already full
+                if all(len(items) < self.max_batch for _, items in self._pending.values()):
+                    self._cond.wait(timeout=self.max_wait)
+                taken = []
+                for key, (params, items) in list(self._pending.items()):
+                    taken.append((key, params, items[:self.max_batch]))
+                    if len(items) > self.max_batch:
+                        del items[:self.max_batch]
+                    else:
+                        del self._pending[key]
+            for (model_type, target_col, _), params, items in taken:
+                self.batches += 1
+                self._executor.submit(self._run_batch, model_type, target_col, params, items)
+
+    def _run_batch(self, model_type, target_col, params, items):
+        # Only baselines are batched: each series' forecast depends on that series alone. A panel
+        # model such as global_gbm would train on every client's data in the batch window.
+        if model_type in BASELINES and set(params) <= {'horizon', 'quantiles'}:
+            # One vectorized call when the series share dates, per-series otherwise
+            frames = {i: df for i, (df, _, _) in enumerate(items)}
+            try:
+                for i, output, used_model, error in forecast_many(frames, model_type, target_col, n_jobs=1,
+                                                                  **params):
+                    df, future, submitted = items[i]
+                    if error:
+                        future.set_exception(RuntimeError(error))
+                    else:
+                        future.set_result((output, used_model))
+                    self.latency.record(used_model, time.perf_counter() - submitted)
+            except Exception as e:
+                # Fail whatever the batch left unanswered instead of leaving callers to time out
+                for df, future, submitted in items:
+                    if not future.done():
+                        future.set_exception(e)
+                        self.latency.record(model_type, time.perf_counter() - submitted)
+            return
+
+        # Identical series are fitted once; distinct ones run in parallel
+        groups = {}
+        for item in items:
+            groups.setdefault(fingerprint(item[0]), []).append(item)
+        for group in groups.values():
+            try:
+                self._executor.submit(self._run_group, model_type, target_col, params, group)
+            except RuntimeError:  # executor shutting down; finish the work here
+                self._run_group(model_type, target_col, params, group)
+
+    def _run_group(self, model_type, target_col, params, items):
+        for df, future, submitted in items:
+            try:
+                output, used_model = forecast(df, model_type, target_col, cache=self.cache, **params)
+                future.set_result((output, used_model))
+            except Exception as e:
+                used_model = model_type
+                future.set_exception(e)
+            self.latency.record(used_model, time.perf_counter() - submitted)
+
+# ===== JSON Conversion =====
+def frame_from_payload(payload, target_col='target'):
+    """Build a date-indexed frame from {"data": records or columns}"""
+    if 'data' not in payload:
+        raise ValueError("Request body needs a 'data' field")
+    df = pd.DataFrame(payload['data'])
+    if target_col not in df.columns:
+        raise ValueError(f"Missing target column: {target_col}")
+    if 'date' in df.columns:
+        df = df.set_index(pd.DatetimeIndex(pd.to_datetime(df.pop('date')), name='date'))
+    return df
+
+def _json_values(values):
+    return [None if np.isnan(v) else float(v) for v in np.asarray(values, dtype=float)]
+
+def output_to_payload(output, model_type):
+    """JSON-ready {"model_type", "dates", "forecast", "quantiles"} for a forecast() frame"""
+    return {"model_type": model_type,
+            "dates": output['date'].astype(str).tolist(),
+            "forecast": _json_values(output['forecast']),
+            "quantiles": {col: _json_values(output[col]) for col in output.columns
+                          if col not in ('date', 'forecast')}}
+
+# ===== HTTP Server =====
+def make_handler(service, timeout=60, results=None):
+    """results: optional ForecastResultStore served at GET /results/<run_id>.csv"""
+    class ForecastHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type='application/json'):
+            content = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {"status": "ok"})
+            elif self.path == '/stats':
+                self._send(200, {"latency": service.latency.summary(), "batches": service.batches,
+                                 "cache": service.cache.stats})
+            elif self.path == '/metrics':
+                # Prometheus text format; empty until instrumentation.enable() is called
+                metrics = instrumentation.current()
+                self._send(200, metrics.prometheus() if metrics else "",
+                           'text/plain; version=0.0.4; charset=utf-8')
+            elif results is not None and self.path.startswith('/results/'):
+                self._send_results()
+            else:
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+
+        def _send_results(self):
+            """Stream a stored run as CSV, one row group at a time (?series=a,b&models=...&max_step=n)"""
+            url = urlsplit(self.path)
+            run_id = unquote(url.path[len('/results/'):]).removesuffix('.csv')
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            filters = {k: query[k].split(',') for k in ('series', 'models', 'columns') if k in query}
+            if 'max_step' in query:
+                try:
+                    filters['max_step'] = int(query['max_step'])
+                except ValueError:
+                    self._send(400, {"error": f"max_step must be an integer, got {query['max_step']!r}"})
+                    return
+            if run_id not in results:
+                self._send(404, {"error": f"No stored run {run_id}"})
+                return
+            # No Content-Length: the HTTP/1.0 response ends when the connection closes
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('Content-Disposition', f'attachment; filename="{run_id}.csv"')
+            self.end_headers()
+            for chunk in results.iter_csv(run_id, **filters):
+                self.wfile.write(chunk)
+
+        def do_POST(self):
+            if self.path != '/forecast':
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if not isinstance(payload, dict):
+                    raise ValueError("Request body must be a JSON object")
+                target_col = payload.get('target_col', 'target')
+                df = frame_from_payload(payload, target_col)
+                params = payload.get('params', {})
+                params['horizon'] = int(payload.get('horizon', 30))
+                if payload.get('quantiles') is not None:
+                    params['quantiles'] = tuple(payload['quantiles'])
+                    check_quantiles(params['quantiles'])
+                future = service.submit(df, payload.get('model_type', 'auto'), target_col, **params)
+            except (ValueError, TypeError, KeyError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            try:
+                output, model_type = future.result(timeout=timeout)
+                self._send(200, output_to_payload(output, model_type))
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    return ForecastHandler
+
+def serve(host='127.0.0.1', port=8000, warm=(), results_dir=None, **service_kwargs):
+    """Run the service until interrupted; returns nothing"""
+    service = ForecastService(**service_kwargs)
+    if warm:
+        service.warm_up(warm)
+    results = ForecastResultStore(results_dir) if results_dir else None
+    server = ThreadingHTTPServer((host, port), make_handler(service, results=results))
+    print(f"Forecast service listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON forecasting service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--warm', default='arima,exponential_smoothing,prophet,linear_regression',
+                        help="comma-separated models to fit once at startup ('' to skip)")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--instrument', action='store_true', help="collect stage timers for GET /metrics")
+    parser.add_argument('--results-dir', help="ForecastResultStore root to serve at GET /results/<run_id>.csv")
+    args = parser.parse_args()
+    if args.instrument and instrumentation.current() is None:
+        instrumentation.enable()
+    serve(args.host, args.port, [m for m in args.warm.split(',') if m], args.results_dir,
+          max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
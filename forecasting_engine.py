@@ -1,105 +1,434 @@
-from ml_models import (
-    run_linear_regression,
-    run_arima,
-    run_prophet,
-    run_moving_average,
-    run_exponential_smoothing,
-    scenario_based_forecast  # ✅ now it works
-)
-
+from baselines import to_panel
+from intervals import quantile_columns
 from data_cleaning import clean_data
-from utils import calculate_metrics
+from model_cache import default_cache, fingerprint, make_key, warm_starts
+from model_registry import REGISTRY
+from profiling import profile_series, select_models
+from utils import calculate_metrics, future_index
+import instrumentation
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, Queue
+from queue import Empty
+import os
+import time
 import pandas as pd
 import numpy as np
 
 def detect_seasonality(df, target_col='target'):
-    from statsmodels.tsa.stattools import acf
-    result = acf(df[target_col], nlags=40, fft=True)
-    peaks = np.where(result > 0.5)[0]
-    return len(peaks) > 2
+    return bool(profile_series(df[target_col])['has_seasonality'])
 
 def detect_trend(df, target_col='target'):
-    from sklearn.linear_model import LinearRegression
-    X = np.arange(len(df)).reshape(-1, 1)
-    y = df[target_col].values
-    model = LinearRegression().fit(X, y)
-    return abs(model.coef_[0]) > 0.01
+    return bool(profile_series(df[target_col])['has_trend'])
 
 def auto_select_model(df, target_col='target'):
-    n = len(df)
-
-    if n == 0:
+    """Pick a model from the (cached) profile of target_col; see profiling.select_models"""
+    if len(df) == 0:
         return "qualitative"
-    if n < 30:
-        return "moving_average"
-
-    has_seasonality = detect_seasonality(df, target_col)
-    has_trend = detect_trend(df, target_col)
-    multivariate = len(df.columns) > 2
-
-    if has_seasonality and has_trend:
-        return "prophet"
-    elif has_seasonality:
-        return "exponential_smoothing"
-    elif has_trend and n > 365:
-        return "arima"
-    elif multivariate:
-        return "lstm" if n > 100 else "linear_regression"
-    else:
-        return "prophet" if n > 100 else "exponential_smoothing"
+    profile = pd.DataFrame([profile_series(df[target_col])])
+    profile['length'] = len(df)
+    return select_models(profile, multivariate=len(df.columns) > 2).iloc[0]
+
+# Model libraries are imported on first use; see model_registry for
+# capabilities and for registering third-party models
+MODELS = REGISTRY
 
-def forecast(df, model_type="auto", target_col='target'):
-    df = clean_data(df)
+def forecast(df, model_type="auto", target_col='target', cache=None, horizon=30, quantiles=None,
+             **model_kwargs):
+    """
+    Clean df, pick a model (when model_type="auto") and forecast target_col.
+
+    Returns (forecast_df, model_type). forecast_df holds the next `horizon`
+    periods: date, forecast and one q<level> column per requested quantile,
+    e.g. quantiles=(0.1, 0.9) adds q0.1 and q0.9.
+
+    Fitted output is cached by data fingerprint, model type and hyperparameters
+    (model_kwargs, e.g. order=(2,1,1) for ARIMA). Pass a ModelCache as cache to
+    use a dedicated cache, or cache=False to always refit.
+
+    Models run on the normalised data; the output is mapped back to the
+    original units of target_col with the scaler fitted during cleaning.
+    """
+    df, scaler = clean_data(df, return_scaler=True)
     
     if model_type == "auto":
         model_type = auto_select_model(df, target_col)
 
-    models = {
-        "linear_regression": run_linear_regression,
-        "arima": run_arima,
-        "prophet": run_prophet,
-        "moving_average": run_moving_average,
-        "exponential_smoothing": run_exponential_smoothing,
-        "lstm": lambda df, col: df.tail(30)   ,
-        "qualitative": lambda x, y: scenario_based_forecast({})  # Placeholder
-    }
-
-    if model_type not in models:
+    if model_type not in MODELS:
         raise ValueError(f"Unknown model type: {model_type}")
-    
-    forecast_df = models[model_type](df, target_col)
-    return forecast_df, model_type
 
-def evaluate_models(df, target_col='target', horizon=30):
+    instrumentation.count('forecasts', model=model_type)
+    fits = []
+
+    def fit():
+        fits.append(model_type)
+        with instrumentation.stage('fit', model=model_type):
+            return MODELS[model_type](df, target_col, horizon=horizon, quantiles=quantiles, **model_kwargs)
+
+    if cache is False:
+        forecast_df = fit()
+    else:
+        # Keyed on the normalised data, so series that differ only in scale share a fit
+        cache = default_cache if cache is None else cache
+        params = {**model_kwargs, 'horizon': horizon,
+                  'quantiles': None if quantiles is None else tuple(sorted(quantiles))}
+        key = make_key(fingerprint(df), model_type, target_col, params)
+        forecast_df = cache.get_or_fit(key, fit)
+        instrumentation.count('model_cache_misses' if fits else 'model_cache_hits', model=model_type)
+
+    if model_type == "qualitative":
+        # Scenario placeholder values are not derived from the data
+        return forecast_df.copy(), model_type
+    # inverse_transform returns a new object, so callers can't mutate the cached entry
+    return scaler.inverse_transform(forecast_df, target_col), model_type
+
+@instrumentation.traced('evaluate_models')
+def evaluate_models(df, target_col='target', horizon=30, tournament=False, **tournament_kwargs):
+    """
+    Score every candidate model on the last `horizon` rows.
+
+    tournament=True runs the parallel, early-stopping run_tournament() instead
+    of fitting each model in turn; tournament_kwargs are passed through to it.
+    """
+    if tournament:
+        return run_tournament(df, target_col, horizon, **tournament_kwargs)
+
     results = {}
     train = df.iloc[:-horizon]
     test = df.iloc[-horizon:][target_col]
 
     for model_name in ["linear_regression", "arima", "prophet",
-                       "moving_average", "exponential_smoothing", "lstm"]:
+                       "moving_average", "exponential_smoothing", "global_gbm"]:
         try:
-            forecast_df, _ = forecast(train, model_name, target_col)
-            if isinstance(forecast_df, pd.DataFrame):
-                pred = forecast_df['forecast']
-            elif isinstance(forecast_df, pd.Series):
-                pred = forecast_df
-            else:
-                pred = pd.Series(forecast_df)
-
-            results[model_name] = calculate_metrics(test, pred[:horizon])
+            forecast_df, _ = forecast(train, model_name, target_col, horizon=horizon)
+            results[model_name] = calculate_metrics(test.to_numpy(), forecast_df['forecast'].to_numpy())
         except Exception as e:
             print(f"Error with {model_name}: {e}")
             results[model_name] = {"MAE": None, "RMSE": None}
 
     return pd.DataFrame(results).T
 
-def run_forecasting_model(df, target_col='target'):
-    forecast_df, model_name = forecast(df, model_type="auto", target_col=target_col)
+# ===== Model Tournament =====
+CHEAP_MODELS = ["moving_average", "exponential_smoothing", "linear_regression"]
+EXPENSIVE_MODELS = ["arima", "prophet", "global_gbm"]
 
-    if isinstance(forecast_df, pd.DataFrame) and 'forecast' in forecast_df.columns:
-        predictions = forecast_df['forecast']
-    else:
-        predictions = forecast_df
+_tournament_data = {}
+
+def _init_tournament_worker(train, test, target_col, scaler, started=None):
+    # Each worker receives the cleaned data once instead of once per task
+    _tournament_data.update(train=train, test=test, target_col=target_col, scaler=scaler, started=started)
+
+def _score_candidate(model_name, screen_size=None):
+    """Fit one model on the shared training data and score it on the holdout"""
+    train, test = _tournament_data['train'], _tournament_data['test']
+    target_col = _tournament_data['target_col']
+    if screen_size:
+        train = train.iloc[-screen_size:]
+    if _tournament_data.get('started') is not None:
+        _tournament_data['started'].put((model_name, time.time()))  # the job's budget starts now
+
+    start = time.perf_counter()
+    try:
+        output = MODELS[model_name](train, target_col, horizon=len(test))
+        output = _tournament_data['scaler'].inverse_transform(output, target_col)
+        pred = output['forecast'].to_numpy(dtype=float)
+        actual = test.to_numpy(dtype=float)
+        valid = ~np.isnan(pred) & ~np.isnan(actual)
+        metrics = calculate_metrics(actual[valid], pred[valid])
+        status = "ok"
+    except Exception as e:
+        metrics = {"MAE": None, "RMSE": None}
+        status = f"error: {type(e).__name__}: {e}"
+    return {**metrics, "status": status, "seconds": time.perf_counter() - start}
+
+class _TournamentPool:
+    """Worker pool for run_tournament, replaced whenever fits overrun their budget"""
+    def __init__(self, n_jobs, initargs):
+        self.n_jobs = n_jobs
+        self.initargs = initargs
+        self._start()
+
+    def _start(self):
+        self.started = Queue()  # (model, time) from each worker as it picks up a job
+        self.pool = Pool(self.n_jobs, initializer=_init_tournament_worker,
+                         initargs=(*self.initargs, self.started))
+
+    def submit(self, candidates, screen_size=None):
+        return {name: self.pool.apply_async(_score_candidate, (name, screen_size)) for name in candidates}
+
+    def started_jobs(self):
+        """(model, start time) of the jobs picked up since the last call"""
+        found = []
+        while True:
+            try:
+                found.append(self.started.get_nowait())
+            except Empty:
+                return found
+
+    def restart(self):
+        """Kill every worker, including abandoned fits still running, and start fresh ones"""
+        self.pool.terminate()
+        self._start()
+
+    def close(self):
+        self.pool.terminate()
+
+def _run_stage(workers, candidates, time_budget, screen_size=None):
+    """
+    Run candidates in the pool, giving each at most time_budget seconds from
+    when a worker picks it up. A fit past its budget is abandoned and its
+    worker killed: at once if jobs are queued behind it (unfinished jobs are
+    resubmitted), otherwise when the stage ends, so no later stage shares
+    the pool with abandoned fits.
+    """
+    workers.started_jobs()  # discard start times of earlier stages
+    jobs = workers.submit(candidates, screen_size)
+    deadlines = {}
+    results = {}
+    abandoned = False
+    while jobs:
+        for name, started in workers.started_jobs():
+            if name in jobs:
+                deadlines.setdefault(name, started + time_budget)
+        now = time.time()
+        for name in list(jobs):
+            if jobs[name].ready():
+                results[name] = jobs.pop(name).get()
+            elif name in deadlines and now >= deadlines[name]:
+                jobs.pop(name)
+                results[name] = {"MAE": None, "RMSE": None, "status": "timeout", "seconds": time_budget}
+                abandoned = True
+        if abandoned and any(name not in deadlines for name in jobs):
+            workers.restart()
+            abandoned = False
+            deadlines = {}
+            jobs = workers.submit(list(jobs), screen_size)
+        elif jobs:
+            time.sleep(0.01)
+    if abandoned:
+        workers.restart()
+    return results
 
-    metrics = calculate_metrics(df[target_col], predictions[:len(df)])
+@instrumentation.traced('tournament')
+def run_tournament(df, target_col='target', horizon=30, candidates=None, n_jobs=None,
+                   time_budget=120, screen_size=120, prune_margin=0.1):
+    """
+    Parallel model selection with early stopping.
+
+    The training rows are cleaned once and shipped to each worker once. Cheap baselines
+    are scored first; each expensive model is then screened by fitting it on
+    only the last screen_size training rows, and dropped if its MAE is more
+    than prune_margin worse than the best baseline. Survivors get a full fit.
+    Every fit is limited to time_budget seconds from when a worker starts
+    it; workers still running past their budget are killed and replaced.
+
+    The scaler is fitted on the training rows only and predictions are
+    scored in original units against the raw holdout. Returns a DataFrame indexed
+    by model with MAE, RMSE, status and seconds columns.
+    """
+    candidates = candidates or CHEAP_MODELS + EXPENSIVE_MODELS
+    cheap = [m for m in candidates if m in CHEAP_MODELS]
+    expensive = [m for m in candidates if m not in CHEAP_MODELS]
+
+    train, scaler = clean_data(df.iloc[:-horizon], return_scaler=True)
+    test = df[target_col].iloc[-horizon:]
+
+    n_jobs = n_jobs or min(len(candidates), os.cpu_count() or 1)
+    pool = _TournamentPool(n_jobs, (train, test, target_col, scaler))
+    try:
+        results = _run_stage(pool, cheap, time_budget)
+        scores = [r["MAE"] for r in results.values() if r["MAE"] is not None]
+        best_baseline = min(scores) if scores else None
+
+        survivors = expensive
+        if best_baseline is not None and expensive and len(train) > 2 * screen_size:
+            screened = _run_stage(pool, expensive, time_budget, screen_size)
+            survivors = []
+            for name, result in screened.items():
+                if result["MAE"] is not None and result["MAE"] <= best_baseline * (1 + prune_margin):
+                    survivors.append(name)
+                else:
+                    result["status"] = "pruned" if result["status"] == "ok" else result["status"]
+                    results[name] = result
+
+        results.update(_run_stage(pool, survivors, time_budget))
+    finally:
+        pool.close()
+
+    return pd.DataFrame(results).T.loc[candidates]
+
+def run_forecasting_model(df, target_col='target', horizon=30):
+    """Forecast with the auto-selected model, scored by refitting it with the last horizon rows held out"""
+    forecast_df, model_name = forecast(df, model_type="auto", target_col=target_col, horizon=horizon)
+
+    holdout, _ = forecast(df.iloc[:-horizon], model_name, target_col, horizon=horizon)
+    metrics = calculate_metrics(df[target_col].iloc[-horizon:].to_numpy(), holdout['forecast'].to_numpy())
     return forecast_df, model_name, metrics
+
+# ===== Batch Forecasting =====
+def _iter_series(data, target_col, id_col, date_col, value_col):
+    """Yield (series_id, frame) pairs from a dict of frames or a long-format frame"""
+    if isinstance(data, dict):
+        yield from data.items()
+        return
+
+    missing = {id_col, date_col, value_col} - set(data.columns)
+    if missing:
+        raise ValueError(f"Long-format data is missing columns: {sorted(missing)}")
+
+    dates = pd.to_datetime(data[date_col])  # parse once, not per group
+    for series_id, rows in data.groupby(id_col, sort=False, observed=True).indices.items():
+        index = pd.DatetimeIndex(dates.iloc[rows], name='date')
+        frame = pd.DataFrame({target_col: data[value_col].to_numpy()[rows]}, index=index)
+        yield series_id, frame.sort_index()
+
+def _count_series(data, id_col):
+    if isinstance(data, dict):
+        return len(data)
+    return data[id_col].nunique()
+
+def _forecast_chunk(chunk, model_type, target_col, horizon=30, quantiles=None, model_kwargs=None,
+                    warm_start=False):
+    """Forecast a chunk of series, capturing failures per series"""
+    results = []
+    for series_id, frame in chunk:
+        try:
+            params = dict(model_kwargs or {}, **({'warm_start': series_id} if warm_start else {}))
+            forecast_df, model_name = forecast(frame, model_type, target_col,
+                                               horizon=horizon, quantiles=quantiles, **params)
+            results.append((series_id, forecast_df, model_name, None))
+        except Exception as e:
+            # Exceptions may not survive pickling back to the parent, so send text
+            results.append((series_id, None, model_type, f"{type(e).__name__}: {e}"))
+    return results
+
+def _forecast_chunk_warm(chunk, inits, model_type, *args):
+    """_forecast_chunk in a worker process, carrying warm-start parameters there and back"""
+    for key, params in inits.items():
+        warm_starts.put(key, params)
+    results = _forecast_chunk(chunk, model_type, *args, warm_start=True)
+    fitted = {(model_type, series_id): warm_starts.get((model_type, series_id)) for series_id, _ in chunk}
+    return results, fitted
+
+def _forecast_whole_panel(data, model_type, target_col, id_col, date_col, value_col,
+                          horizon=30, quantiles=None, **model_kwargs):
+    """
+    Fast path for models with a panel form (baselines, the global model):
+    stack every series into one array and forecast the whole panel at once.
+    Returns None (use the pool) when the series don't share dates or have gaps,
+    or when the panel call fails, so one bad series only fails its own forecast.
+    """
+    try:
+        if isinstance(data, dict):
+            panel = to_panel(data, target_col)
+        else:
+            # One pivot instead of a groupby that builds a frame per series
+            wide = data.pivot(index=id_col, columns=date_col, values=value_col)
+            wide = wide.loc[data[id_col].unique()]  # keep input order
+            dates = pd.DatetimeIndex(pd.to_datetime(wide.columns), name='date')
+            panel = list(wide.index), dates, wide.to_numpy(dtype=float)
+    except (KeyError, ValueError):  # missing columns, duplicate dates, ...
+        return None
+    if panel is None or not isinstance(panel[1], pd.DatetimeIndex) or np.isnan(panel[2]).any():
+        return None
+    ids, dates, Y = panel
+    # Panel models are affine-equivariant (the global model scales each series
+    # itself), so forecasting the raw panel matches forecast()'s
+    # normalise -> fit -> inverse-transform round trip
+    panel_fn = MODELS[model_type].load_panel()
+    index = future_index(dates, horizon)
+    try:
+        with instrumentation.stage('fit', model=model_type):
+            if quantiles is None:
+                predictions = panel_fn(Y, horizon, dates=dates, **model_kwargs)
+            else:
+                # Intervals for the whole panel come from one bootstrap call
+                predictions, bands = panel_fn(Y, horizon, quantiles, dates=dates, **model_kwargs)
+    except Exception as e:
+        print(f"Panel {model_type} forecast failed, forecasting series one by one: {e}")
+        return None
+    instrumentation.count('forecasts', len(ids), model=model_type)
+    if quantiles is None:
+        return [(series_id, pd.DataFrame({'date': index, 'forecast': values}, copy=False), model_type, None)
+                for series_id, values in zip(ids, predictions)]
+
+    columns = quantile_columns(quantiles)
+    return [(series_id,
+             pd.DataFrame({'date': index, 'forecast': predictions[i], **dict(zip(columns, bands[:, i]))},
+                          copy=False),
+             model_type, None)
+            for i, series_id in enumerate(ids)]
+
+def forecast_many(data, model_type="auto", target_col='target', n_jobs=None,
+                  chunk_size=None, id_col='series_id', date_col='date', value_col='value',
+                  horizon=30, quantiles=None, warm_start=False, **model_kwargs):
+    """
+    Forecast many series at once over a process pool.
+
+    Parameters:
+    data: dict of {series_id: DataFrame} or a long-format DataFrame
+          with id_col, date_col and value_col columns
+    model_type: model name passed to forecast() for every series
+    n_jobs: number of worker processes (None = all CPUs, 1 = run in-process)
+    chunk_size: series per task; larger chunks amortise pickling overhead
+                (None = sized from the number of series and workers)
+    horizon, quantiles, model_kwargs: passed to forecast() for every series,
+          e.g. forecast_many(data, 'prophet', profile='fast')
+    warm_start: for models taking a warm_start key (Prophet), fit each series
+                starting from the parameters of its previous fit, kept in
+                model_cache.warm_starts of this process and shipped to and
+                from the workers with each chunk
+
+    Yields (series_id, forecast, model_type, error) tuples in input order.
+    error is None on success, otherwise a short description of the failure.
+    """
+    if model_type in MODELS and MODELS[model_type].panel is not None and not warm_start:
+        panel = _forecast_whole_panel(data, model_type, target_col, id_col, date_col, value_col,
+                                      horizon, quantiles, **model_kwargs)
+        if panel is not None:
+            yield from panel
+            return
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if chunk_size is None:
+        # Aim for ~4 tasks per worker so stragglers don't leave workers idle
+        chunk_size = max(1, min(64, _count_series(data, id_col) // (n_jobs * 4)))
+
+    series = _iter_series(data, target_col, id_col, date_col, value_col)
+    chunks = iter(lambda: list(islice(series, chunk_size)), [])
+
+    if n_jobs == 1:
+        for chunk in chunks:
+            yield from _forecast_chunk(chunk, model_type, target_col, horizon, quantiles,
+                                       model_kwargs, warm_start)
+        return
+
+    def submit(executor, chunk):
+        args = (model_type, target_col, horizon, quantiles, model_kwargs)
+        if not warm_start:
+            return executor.submit(_forecast_chunk, chunk, *args)
+        inits = {(model_type, series_id): warm_starts.get((model_type, series_id)) for series_id, _ in chunk}
+        inits = {key: params for key, params in inits.items() if params is not None}
+        return executor.submit(_forecast_chunk_warm, chunk, inits, *args)
+
+    def collect(future):
+        if not warm_start:
+            return future.result()
+        results, fitted = future.result()
+        for key, params in fitted.items():
+            if params is not None:
+                warm_starts.put(key, params)
+        return results
+
+    # Keep a bounded window of chunks in flight so memory stays flat
+    # however many series are queued, and results stream back in order
+    max_pending = 2 * n_jobs
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(submit(executor, chunk))
+            if len(pending) >= max_pending:
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
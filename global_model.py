@@ -0,0 +1,169 @@
+import pandas as pd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from intervals import check_quantiles, forecast_frame
+from utils import future_index
+
+DEFAULT_LAGS = (1, 2, 3, 7, 14, 28)
+DEFAULT_WINDOWS = (7, 28)
+MAX_SIM_ROWS = 200_000  # series x paths simulated per block
+
+# ===== Feature Builder =====
+def calendar_features(dates):
+    """(n_dates, 3) month, day of week and day of month (empty without dates)"""
+    if not isinstance(dates, pd.DatetimeIndex):
+        return np.empty((len(dates), 0))
+    return np.column_stack([dates.month, dates.dayofweek, dates.day]).astype(float)
+
+def lag_features(Y, lags=DEFAULT_LAGS, windows=DEFAULT_WINDOWS, index=None):
+    """
+    Lag and rolling-window features for every series of a panel at once.
+
+    Row t of the result predicts Y[:, t] from Y[:, :t], for
+    t = lookback .. n_time (the last row is the next, unseen step).
+    Lags are read from a strided sliding-window view of Y, and rolling
+    means/stds come from cumulative sums, so no shifted copies of the
+    panel are made. index=(series, position) gathers only those rows.
+
+    Returns (n_series, n_rows, n_features), or (len(index[0]), n_features).
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    lookback = max(max(lags), max(windows))
+    n_time = Y.shape[1]
+    if n_time < lookback:
+        raise ValueError(f"Series need at least {lookback} observations for these lags")
+
+    windows_view = sliding_window_view(Y, lookback, axis=1)  # (n_series, n_rows, lookback), no copy
+    sums = np.cumsum(np.pad(Y, ((0, 0), (1, 0))), axis=1)
+    squares = np.cumsum(np.pad(Y**2, ((0, 0), (1, 0))), axis=1)
+    end = np.arange(lookback, n_time + 1)  # sums[:, end] covers Y[:, :end]
+
+    def take(values):
+        return values if index is None else values[index]
+
+    features = [take(windows_view[..., lookback - lag]) for lag in lags]
+    for w in windows:
+        total = take(sums[:, end] - sums[:, end - w])
+        mean = total / w
+        var = take(squares[:, end] - squares[:, end - w]) / w - mean**2
+        features += [mean, np.sqrt(np.maximum(var, 0))]
+    return np.stack(features, axis=-1)
+
+# ===== Global Model =====
+class GlobalModel:
+    """
+    One gradient-boosted model trained across every series of a panel.
+
+    Each series is z-scored, lag/rolling/calendar features are built for all
+    series at once, and a HistGradientBoostingRegressor learns the next value.
+    Forecasts are recursive: each step predicts every series in one call and
+    feeds the prediction back as the newest lag.
+    """
+    def __init__(self, lags=DEFAULT_LAGS, windows=DEFAULT_WINDOWS, calendar=True,
+                 max_rows=1_000_000, seed=0, **gbm_params):
+        self.lags = tuple(lags)
+        self.windows = tuple(windows)
+        self.lookback = max(max(self.lags), max(self.windows))
+        self.calendar = calendar
+        self.max_rows = max_rows
+        self.seed = seed
+        self.gbm_params = {"max_iter": 200, **gbm_params}
+        self.model = None
+        self.residuals = None
+
+    def _scale(self, Y):
+        mean = np.nanmean(Y, axis=1, keepdims=True)
+        std = np.nanstd(Y, axis=1, keepdims=True)
+        return mean, np.where(std > 0, std, 1.0)
+
+    def _design(self, Yn, dates, index):
+        """Training rows at (series, position) pairs, position counted from the first full lookback"""
+        X = lag_features(Yn, self.lags, self.windows, index)
+        if not self.calendar or dates is None:
+            return X
+        calendar = calendar_features(dates)[self.lookback:][index[1]]
+        return np.concatenate([X, calendar], axis=-1)
+
+    def fit(self, Y, dates=None):
+        """Fit on a (n_series, n_time) panel; dates is the shared DatetimeIndex"""
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        Y = np.atleast_2d(np.asarray(Y, dtype=float))
+        mean, std = self._scale(Y)
+        Yn = (Y - mean) / std
+        n_series, n_time = Y.shape
+        n_rows = n_time - self.lookback  # training rows per series (the next step has no target)
+        if n_rows < 1:
+            raise ValueError(f"Series need more than {self.lookback} observations")
+
+        series, position = np.divmod(np.arange(n_series * n_rows), n_rows)
+        if len(series) > self.max_rows:
+            pick = np.random.default_rng(self.seed).choice(len(series), self.max_rows, replace=False)
+            series, position = series[pick], position[pick]
+        X = self._design(Yn, dates, (series, position))
+        y = Yn[series, position + self.lookback]
+        keep = ~np.isnan(y) & ~np.isnan(X).any(axis=1)
+
+        self.model = HistGradientBoostingRegressor(random_state=self.seed, **self.gbm_params)
+        self.model.fit(X[keep], y[keep])
+        self.residuals = y[keep] - self.model.predict(X[keep])
+        return self
+
+    def _recurse(self, history, future_calendar, horizon, noise=None):
+        """Roll the model forward `horizon` steps for every row of history (normalised)"""
+        buffer = np.concatenate([history[:, -self.lookback:], np.empty((len(history), horizon))], axis=1)
+        for step in range(horizon):
+            X = lag_features(buffer[:, step:step + self.lookback], self.lags, self.windows)[:, 0]
+            if future_calendar is not None:
+                X = np.concatenate([X, np.broadcast_to(future_calendar[step], (len(X), future_calendar.shape[1]))],
+                                   axis=1)
+            buffer[:, self.lookback + step] = self.model.predict(X) + (0 if noise is None else noise[:, step])
+        return buffer[:, self.lookback:]
+
+    def predict(self, Y, horizon=30, dates=None, quantiles=None, n_paths=100):
+        """
+        Forecast `horizon` steps for every row of Y (the history to continue from).
+
+        With quantiles, returns (point, bands); bands come from n_paths
+        simulated paths per series that resample the training residuals at
+        every step, all paths of a block of series recursing together.
+        """
+        if self.model is None:
+            raise ValueError("Model is not fitted")
+        Y = np.atleast_2d(np.asarray(Y, dtype=float))
+        mean, std = self._scale(Y)
+        Yn = (Y - mean) / std
+        future_calendar = None
+        if self.calendar and dates is not None:
+            future_calendar = calendar_features(future_index(dates, horizon))
+
+        point = self._recurse(Yn, future_calendar, horizon) * std + mean
+        if quantiles is None:
+            return point
+
+        quantiles = check_quantiles(quantiles)
+        rng = np.random.default_rng(self.seed)
+        bands = np.empty((len(quantiles),) + point.shape)
+        block = max(1, MAX_SIM_ROWS // n_paths)
+        for start in range(0, len(Yn), block):
+            rows = slice(start, start + block)
+            paths = np.repeat(Yn[rows, -self.lookback:], n_paths, axis=0)
+            noise = rng.choice(self.residuals, size=(len(paths), horizon))
+            simulated = self._recurse(paths, future_calendar, horizon, noise)
+            simulated = simulated.reshape(-1, n_paths, horizon) * std[rows, :, None] + mean[rows, :, None]
+            bands[:, rows] = np.quantile(simulated, quantiles, axis=1)
+        return point, bands
+
+def forecast_global_panel(Y, horizon=30, quantiles=None, dates=None, **params):
+    """Panel entry point: fit one GlobalModel on Y and forecast every row"""
+    return GlobalModel(**params).fit(Y, dates).predict(Y, horizon, dates, quantiles)
+
+def run_global_gbm(df, target_col='target', horizon=30, quantiles=None, **params):
+    """Single-frame entry point: every numeric column is a series of the panel"""
+    numeric = df.select_dtypes(include=['number'])
+    columns = [target_col] + [c for c in numeric.columns if c != target_col]
+    dates = df.index if isinstance(df.index, pd.DatetimeIndex) else None
+    result = forecast_global_panel(numeric[columns].to_numpy(dtype=float).T, horizon, quantiles, dates, **params)
+    if quantiles is None:
+        return forecast_frame(df.index, result[0])
+    point, bands = result
+    return forecast_frame(df.index, point[0], quantiles, bands[:, 0])
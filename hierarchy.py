@@ -0,0 +1,212 @@
+import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from baselines import RESIDUALS
+from forecasting_engine import MODELS, forecast_many
+from utils import future_index
+
+def _labels(frame, columns, sep='/'):
+    """Node labels such as 'North/Widgets' from key columns, built column-wise"""
+    labels = frame[columns[0]].astype(str)
+    if len(columns) > 1:
+        labels = labels.str.cat([frame[c].astype(str) for c in columns[1:]], sep=sep)
+    return labels.to_numpy()
+
+class Hierarchy:
+    """
+    Sparse summing matrix S for a forecasting hierarchy.
+
+    S has one row per node and one column per leaf: aggregates come first,
+    followed by the leaves themselves (an identity block), so
+    all_nodes = S @ leaves. Coefficients may be signed, which covers
+    accounting identities such as profit = revenue - expenses. S is kept in
+    CSR form and never densified.
+    """
+    def __init__(self, S, nodes, leaves):
+        self.S = sp.csr_matrix(S)
+        self.nodes = list(nodes)
+        self.leaves = list(leaves)
+        self.n_aggregates = self.S.shape[0] - self.S.shape[1]
+        if len(self.nodes) != self.S.shape[0] or len(self.leaves) != self.S.shape[1]:
+            raise ValueError("Node and leaf names must match the summing matrix shape")
+
+    def __repr__(self):
+        return f"Hierarchy({self.n_aggregates} aggregates, {len(self.leaves)} leaves)"
+
+    @property
+    def is_leaf(self):
+        return np.r_[np.zeros(self.n_aggregates, dtype=bool), np.ones(len(self.leaves), dtype=bool)]
+
+    @classmethod
+    def from_levels(cls, keys, levels=None, total='total'):
+        """
+        Cross-sectional roll-up from the key columns of the leaves.
+
+        keys: DataFrame with one row per leaf (e.g. region, product columns)
+        levels: list of column lists to aggregate by; [] is the grand total.
+                Default: total, then each prefix of the key columns
+        """
+        keys = keys.drop_duplicates().reset_index(drop=True)
+        columns = list(keys.columns)
+        levels = [columns[:i] for i in range(len(columns))] if levels is None else levels
+        n_leaves = len(keys)
+        leaf_index = np.arange(n_leaves)
+
+        blocks, nodes = [], []
+        for level in levels:
+            if level:
+                codes, names = pd.factorize(_labels(keys, list(level)))
+            else:
+                codes, names = np.zeros(n_leaves, dtype=int), [total]
+            blocks.append(sp.coo_matrix((np.ones(n_leaves), (codes, leaf_index)),
+                                        shape=(len(names), n_leaves)))
+            nodes.extend(names)
+        leaves = list(_labels(keys, columns))
+        blocks.append(sp.identity(n_leaves, format='coo'))
+        return cls(sp.vstack(blocks, format='csr'), nodes + leaves, leaves)
+
+    @classmethod
+    def from_tree(cls, children):
+        """
+        Signed parent -> children tree, e.g.
+        {'profit': {'revenue': 1, 'expenses': -1}}.
+        Parents may themselves be children of other parents.
+        """
+        leaves = list(dict.fromkeys(c for kids in children.values() for c in kids if c not in children))
+        position = {leaf: i for i, leaf in enumerate(leaves)}
+
+        def expand(node):
+            if node not in children:
+                return {position[node]: 1.0}
+            weights = {}
+            for child, coef in children[node].items():
+                for leaf, value in expand(child).items():
+                    weights[leaf] = weights.get(leaf, 0.0) + coef * value
+            return weights
+
+        rows = sp.lil_matrix((len(children), len(leaves)))
+        for i, parent in enumerate(children):
+            for leaf, value in expand(parent).items():
+                rows[i, leaf] = value
+        S = sp.vstack([rows.tocsr(), sp.identity(len(leaves), format='csr')], format='csr')
+        return cls(S, list(children) + leaves, leaves)
+
+    def cross(self, other, sep='/'):
+        """
+        Product hierarchy: every node of self split by every node of other,
+        e.g. the metric tree crossed with a region/product roll-up. Leaves are
+        named '<self leaf>/<other leaf>'.
+        """
+        S = sp.kron(self.S, other.S, format='csr')
+        nodes = np.array([f"{a}{sep}{b}" for a in self.nodes for b in other.nodes])
+        leaf_rows = np.kron(self.is_leaf, other.is_leaf).astype(bool)
+        order = np.r_[np.flatnonzero(~leaf_rows), np.flatnonzero(leaf_rows)]
+        return Hierarchy(S[order], nodes[order].tolist(), nodes[leaf_rows].tolist())
+
+    def aggregate(self, leaf_values):
+        """Values for every node from leaf values of shape (n_leaves, ...)"""
+        return self.S @ np.asarray(leaf_values, dtype=float)
+
+    def constraints(self):
+        """Zero-constraint matrix C = [I, -S_agg], with C @ coherent_values == 0"""
+        m = self.n_aggregates
+        return sp.hstack([sp.identity(m, format='csr'), -self.S[:m]], format='csr')
+
+# ===== Reconciliation =====
+RECONCILIATION_METHODS = ("bottom_up", "top_down", "ols", "wls", "mint")
+
+def reconcile(base, hierarchy, method='mint', residual_var=None, leaf_history=None, root=0):
+    """
+    Make base forecasts (n_nodes, horizon) add up across the hierarchy.
+
+    bottom_up: aggregate the leaf forecasts
+    top_down: split node `root` by the leaves' historical average shares
+              (needs leaf_history, shape (n_leaves, n_time))
+    ols / wls / mint: minimum-trace projection with a diagonal W of ones,
+              of structural weights (number of leaves under each node), or of
+              the base forecasts' residual variances (needs residual_var).
+
+    The projection uses the zero-constraint form
+        y - W C' (C W C')^-1 C y
+    which only factorises an (n_aggregates x n_aggregates) sparse matrix, so
+    it stays cheap with tens of thousands of leaves.
+    """
+    base = np.asarray(base, dtype=float)
+    S, m = hierarchy.S, hierarchy.n_aggregates
+    if method == "bottom_up":
+        return S @ base[m:]
+    if method == "top_down":
+        if leaf_history is None:
+            raise ValueError("top_down reconciliation needs leaf_history")
+        leaf_means = np.asarray(leaf_history, dtype=float).mean(axis=1)
+        shares = leaf_means / (S[root] @ leaf_means)
+        return S @ (shares[:, None] * base[root])
+    if method not in RECONCILIATION_METHODS:
+        raise ValueError(f"Unknown reconciliation method: {method}")
+
+    if method == "ols":
+        weights = np.ones(S.shape[0])
+    elif method == "wls":
+        weights = np.asarray(abs(S).sum(axis=1)).ravel()
+    else:
+        if residual_var is None:
+            raise ValueError("mint reconciliation needs residual_var")
+        weights = np.asarray(residual_var, dtype=float)
+    weights = np.maximum(weights, 1e-12 * max(weights.max(), 1e-12))
+
+    if m == 0:
+        return base.copy()
+    C = hierarchy.constraints()
+    CW = C.multiply(weights[None, :]).tocsr()
+    lu = splu((CW @ C.T).tocsc())
+    return base - CW.T @ lu.solve(C @ base)
+
+# ===== Hierarchical Forecasting =====
+def forecast_hierarchy(data, hierarchy, key_cols, date_col='date', value_col='value',
+                       model_type='naive', horizon=30, method='mint', n_jobs=None, **params):
+    """
+    Forecast every node of a hierarchy from leaf-level history and reconcile.
+
+    Parameters:
+    data: long-format frame with key_cols, date_col and value_col, one row
+          per leaf and date; leaves are named like Hierarchy.leaves
+    model_type: models with a panel form (baselines, global_gbm) forecast all
+                nodes in one call; other models go through forecast_many(n_jobs)
+    method: see reconcile()
+
+    Returns a DataFrame indexed by node with one column per future date.
+    """
+    leaf = _labels(data, list(key_cols))
+    wide = (data.assign(_leaf=leaf)
+                .pivot(index='_leaf', columns=date_col, values=value_col))
+    missing = set(hierarchy.leaves) - set(wide.index)
+    if missing:
+        raise ValueError(f"No history for {len(missing)} leaves, e.g. {sorted(missing)[:3]}")
+    wide = wide.reindex(hierarchy.leaves)
+    if wide.isna().to_numpy().any():
+        raise ValueError("Leaf histories must share the same dates without gaps")
+    dates = pd.DatetimeIndex(pd.to_datetime(wide.columns), name='date')
+    leaf_history = wide.to_numpy(dtype=float)
+    Y = hierarchy.aggregate(leaf_history)
+
+    if model_type in MODELS and MODELS[model_type].panel is not None:
+        base = MODELS[model_type].load_panel()(Y, horizon, dates=dates, **params)
+        if model_type in RESIDUALS:
+            residuals = RESIDUALS[model_type][0](Y, **params)
+        else:
+            residuals = np.diff(Y, axis=1)  # one-step naive errors as the per-node scale
+    else:
+        frames = {i: pd.DataFrame({'target': row}, index=dates) for i, row in enumerate(Y)}
+        base = np.empty((len(Y), horizon))
+        for i, output, _, error in forecast_many(frames, model_type, n_jobs=n_jobs, horizon=horizon,
+                                                 **params):
+            if error:
+                raise ValueError(f"Base forecast failed for {hierarchy.nodes[i]}: {error}")
+            base[i] = output['forecast'].to_numpy()
+        residuals = np.diff(Y, axis=1)  # one-step naive errors as the per-node scale
+
+    residual_var = np.nanvar(residuals, axis=1) if residuals.shape[1] else None
+    reconciled = reconcile(base, hierarchy, method, residual_var, leaf_history)
+    return pd.DataFrame(reconciled, index=pd.Index(hierarchy.nodes, name='node'),
+                        columns=future_index(dates, horizon))
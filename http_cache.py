@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Seconds a cached page is served without contacting the site. After that
+# it is revalidated with If-None-Match / If-Modified-Since when possible.
+SOURCE_TTLS = {
+    'www.moneycontrol.com': 6 * 3600,
+    'www.motilaloswal.com': 12 * 3600,
+    'trendlyne.com': 3600,
+    'www.icicidirect.com': 3600,
+    'corporatefinanceinstitute.com': 24 * 3600,
+    'www.indiainfoline.com': 1800,
+}
+DEFAULT_TTL = 3600
+
+DEFAULT_PATH = os.environ.get(
+    "FORECAST_HTTP_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "forecasting_ai", "http_cache.sqlite"))
+
+class ResponseCache:
+    """
+    SQLite-backed cache of scraped responses plus a durable ticker -> sc_id memo.
+
+    Entries keep the body, headers and ETag/Last-Modified validators. An entry
+    younger than its host's TTL is fresh; an older one is revalidated with a
+    conditional request and refreshed in place on 304 Not Modified.
+    """
+    def __init__(self, path=DEFAULT_PATH, ttls=None, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttls = SOURCE_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY, status INTEGER, headers TEXT, content BLOB,
+                etag TEXT, last_modified TEXT, fetched_at REAL)""")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS sc_ids (
+                ticker TEXT PRIMARY KEY, sc_id TEXT, updated_at REAL)""")
+
+    def ttl_for(self, url):
+        return self.ttls.get(urlsplit(url).netloc, self.default_ttl)
+
+    def lookup(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, content, etag, last_modified, fetched_at "
+                "FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        status, headers, content, etag, last_modified, fetched_at = row
+        return {"url": url, "status": status, "headers": json.loads(headers), "content": content,
+                "etag": etag, "last_modified": last_modified, "fetched_at": fetched_at}
+
+    def is_fresh(self, entry):
+        return time.time() - entry["fetched_at"] < self.ttl_for(entry["url"])
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, status, headers, content):
+        headers = dict(headers)
+        lowered = {k.lower(): v for k, v in headers.items()}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(headers), content, lowered.get("etag"),
+                 lowered.get("last-modified"), time.time()))
+
+    def touch(self, url):
+        """Mark an entry as just revalidated (304 Not Modified)"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def get_sc_id(self, ticker):
+        with self._lock:
+            row = self._conn.execute("SELECT sc_id FROM sc_ids WHERE ticker = ?",
+                                     (ticker.upper(),)).fetchone()
+        return row[0] if row else None
+
+    def set_sc_id(self, ticker, sc_id):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sc_ids VALUES (?, ?, ?)",
+                               (ticker.upper(), sc_id, time.time()))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM sc_ids")
+
+_default_cache = None
+
+def get_response_cache():
+    """Process-wide cache at FORECAST_HTTP_CACHE (opened on first use)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+from ml_models import fit_arima, fit_exponential_smoothing
+from utils import future_index
+
+INCREMENTAL_MODELS = ("arima", "exponential_smoothing")
+
+def _as_series(data, target_col):
+    if isinstance(data, pd.DataFrame):
+        data = data.set_index('date')[target_col] if 'date' in data.columns else data[target_col]
+    return data.astype(float).rename(target_col)
+
+class IncrementalModel:
+    """
+    ARIMA / Holt-Winters model that absorbs new observations without a full refit.
+
+    update() extends the fitted state with only the new rows: ARIMA goes through
+    statsmodels' results.append(refit=False), Holt-Winters runs its smoothing
+    recursion forward from the last level/trend/season. Parameters are kept, and
+    a full refit happens once refit_every new observations have accumulated or
+    when the one-step errors on a batch exceed drift_threshold times the
+    residual scale seen at the last refit.
+
+    Values are used as given (no normalisation), so feed raw or consistently
+    scaled data.
+    """
+    def __init__(self, model_type, target_col='target', refit_every=None,
+                 drift_threshold=3.0, **model_kwargs):
+        if model_type not in INCREMENTAL_MODELS:
+            raise ValueError(f"Incremental updates not supported for: {model_type}")
+        self.model_type = model_type
+        self.target_col = target_col
+        self.refit_every = refit_every
+        self.drift_threshold = drift_threshold
+        self.model_kwargs = model_kwargs
+        self.history = None
+        self.results = None
+        self.refits = 0
+        self.since_refit = 0
+
+    # ----- full fit -----
+    def fit(self, df):
+        self.history = _as_series(df, self.target_col)
+        self._refit()
+        return self
+
+    def _refit(self):
+        frame = self.history.to_frame(self.target_col)
+        if self.model_type == "arima":
+            self.results = fit_arima(frame, self.target_col, **self.model_kwargs)
+        else:
+            self.results = fit_exponential_smoothing(frame, self.target_col, **self.model_kwargs)
+            self._init_hw_state()
+        resid = np.asarray(self.results.resid, dtype=float)
+        # Skip the burn-in where ARIMA residuals are dominated by initialisation
+        resid = resid[min(len(resid) // 10, 12):]
+        self.residual_scale = float(np.sqrt(np.nanmean(resid**2))) if len(resid) else np.inf
+        self.refits += 1
+        self.since_refit = 0
+
+    def _init_hw_state(self):
+        params = self.results.params
+        m = self.results.model.seasonal_periods
+        self._hw = {
+            "alpha": params['smoothing_level'],
+            "beta": params['smoothing_trend'] if self.results.model.trend else 0.0,
+            "gamma": params['smoothing_seasonal'],
+            "phi": params['damping_trend'] if self.results.model.damped_trend else 1.0,
+            "level": float(self.results.level.iloc[-1]),
+            "trend": float(self.results.trend.iloc[-1]) if self.results.model.trend else 0.0,
+            # Seasonal terms for the next m periods, oldest first
+            "season": np.asarray(self.results.season, dtype=float)[-m:].copy(),
+        }
+
+    # ----- incremental update -----
+    def update(self, new_rows):
+        """Absorb new observations and return their one-step-ahead fitted values"""
+        if self.history is None:
+            raise ValueError("Call fit() before update()")
+        new = _as_series(new_rows, self.target_col)
+        if len(new) == 0:
+            return new
+        if new.index[0] <= self.history.index[-1]:
+            raise ValueError("New rows must come after the last observation already fitted")
+
+        self.history = pd.concat([self.history, new])
+        if self.model_type == "arima":
+            self.results = self.results.append(new, refit=False)
+            fitted = self.results.fittedvalues.iloc[-len(new):]
+        else:
+            fitted = pd.Series(self._hw_step(new.to_numpy()), index=new.index)
+        self.since_refit += len(new)
+
+        errors = new.to_numpy() - fitted.to_numpy()
+        drifted = np.sqrt(np.mean(errors**2)) > self.drift_threshold * self.residual_scale
+        scheduled = self.refit_every is not None and self.since_refit >= self.refit_every
+        if drifted or scheduled:
+            self._refit()
+        return fitted
+
+    def _hw_step(self, values):
+        state = self._hw
+        alpha, beta, gamma, phi = state["alpha"], state["beta"], state["gamma"], state["phi"]
+        level, trend, season = state["level"], state["trend"], state["season"]
+        fitted = np.empty(len(values))
+        for i, y in enumerate(values):
+            s = season[0]
+            base = level + phi * trend
+            fitted[i] = base + s
+            new_level = alpha * (y - s) + (1 - alpha) * base
+            trend = beta * (new_level - level) + (1 - beta) * phi * trend
+            season = np.append(season[1:], gamma * (y - base) + (1 - gamma) * s)
+            level = new_level
+        state.update(level=level, trend=trend, season=season)
+        return fitted
+
+    # ----- forecasting -----
+    def forecast(self, steps=30):
+        """Forecast steps periods past the last observation"""
+        index = future_index(self.history.index, steps)
+        if self.model_type == "arima":
+            values = np.asarray(self.results.forecast(steps), dtype=float)
+        else:
+            state = self._hw
+            h = np.arange(1, steps + 1)
+            damped = np.cumsum(state["phi"] ** h)
+            seasons = state["season"][(h - 1) % len(state["season"])]
+            values = state["level"] + damped * state["trend"] + seasons
+        return pd.Series(values, index=index, name='forecast')
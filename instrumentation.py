@@ -0,0 +1,235 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+PROFILE_MODES = ("cpu", "memory")
+
+class Instrumentation:
+    """
+    Per-stage timers and counters for the forecasting pipeline.
+
+    Stages (e.g. "fit", "clean", "http_request") record call count, total
+    and max seconds per label set (e.g. model="arima"); counters record
+    rows, cache hits, HTTP retries, bytes downloaded and the like.
+
+    Parameters:
+    log: path or writable text stream; every finished stage is written to it
+         as one JSON line
+    profile: "cpu" runs each stage under cProfile and keeps the stats per
+             stage; "memory" records each stage's tracemalloc peak. Only the
+             outermost profiled stage of a thread is profiled (memory: of
+             the process), so nested stages are not counted twice.
+    stages: stage names to profile (default: every stage)
+
+    Metrics are kept in the process that enabled them; forecast_many workers
+    running in other processes are not included.
+    """
+    def __init__(self, log=None, profile=None, stages=None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"profile must be one of {PROFILE_MODES}")
+        self.profile = profile
+        self.stages = None if stages is None else set(stages)
+        self.counters = {}
+        self.timers = {}  # (stage, labels) -> [count, total seconds, max seconds, peak bytes]
+        self.profiles = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tracing_memory = False
+        self._log = open(log, 'a') if isinstance(log, (str, os.PathLike)) else log
+
+    def __repr__(self):
+        return f"Instrumentation({len(self.timers)} stage timers, {len(self.counters)} counters)"
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name, **labels):
+        profiler, memory = self._start_profile(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = self._stop_profile(name, profiler, memory)
+            self._record(name, labels, seconds, peak)
+
+    def _start_profile(self, name):
+        if self.profile is None or (self.stages is not None and name not in self.stages):
+            return None, False
+        if self.profile == "cpu":
+            if getattr(self._local, 'profiling', False):
+                return None, False
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is already running
+                return None, False
+            self._local.profiling = True
+            return profiler, False
+        with self._lock:
+            if self._tracing_memory:
+                return None, False
+            self._tracing_memory = True
+        if tracemalloc.is_tracing():  # someone else is tracing: leave it running afterwards
+            tracemalloc.reset_peak()
+            return None, 'shared'
+        tracemalloc.start()
+        return None, True
+
+    def _stop_profile(self, name, profiler, memory):
+        if profiler is not None:
+            profiler.disable()
+            self._local.profiling = False
+            with self._lock:
+                if name in self.profiles:
+                    self.profiles[name].add(profiler)
+                else:
+                    self.profiles[name] = pstats.Stats(profiler)
+        if not memory:
+            return None
+        peak = tracemalloc.get_traced_memory()[1]
+        if memory is True:
+            tracemalloc.stop()
+        with self._lock:
+            self._tracing_memory = False
+        return peak
+
+    def _record(self, name, labels, seconds, peak):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            timer = self.timers.setdefault(key, [0, 0.0, 0.0, None])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+            if peak is not None:
+                timer[3] = max(timer[3] or 0, peak)
+            if self._log is not None:
+                event = {'ts': time.time(), 'event': 'stage', 'stage': name, 'seconds': seconds, **labels}
+                if peak is not None:
+                    event['peak_bytes'] = peak
+                self._log.write(json.dumps(event, default=str) + '\n')
+                self._log.flush()
+
+    # ----- export -----
+    def snapshot(self):
+        """JSON-ready totals: {'stages': [...], 'counters': [...]}"""
+        with self._lock:
+            timers = {key: list(value) for key, value in self.timers.items()}
+            counters = dict(self.counters)
+        stages = []
+        for (name, labels), (count, total, longest, peak) in timers.items():
+            row = {'stage': name, 'labels': dict(labels), 'count': count, 'seconds': total,
+                   'max_seconds': longest}
+            if peak is not None:
+                row['peak_bytes'] = peak
+            stages.append(row)
+        return {'stages': stages,
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in counters.items()]}
+
+    def log_snapshot(self):
+        """Write the current totals to the log as one JSON line"""
+        if self._log is not None:
+            line = json.dumps({'ts': time.time(), 'event': 'snapshot', **self.snapshot()}, default=str)
+            with self._lock:
+                self._log.write(line + '\n')
+                self._log.flush()
+
+    def prometheus(self, prefix='forecast'):
+        """Totals in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = []
+        for name in sorted({c['name'] for c in snap['counters']}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines += [f"{prefix}_{name}_total{_labels(c['labels'])} {c['value']:g}"
+                      for c in snap['counters'] if c['name'] == name]
+        if snap['stages']:
+            metrics = [('stage_seconds_count', 'count', 'counter'), ('stage_seconds_sum', 'seconds', 'counter'),
+                       ('stage_seconds_max', 'max_seconds', 'gauge'), ('stage_peak_bytes', 'peak_bytes', 'gauge')]
+            for metric, field, kind in metrics:
+                rows = [s for s in snap['stages'] if field in s]
+                if rows:
+                    lines.append(f"# TYPE {prefix}_{metric} {kind}")
+                    lines += [f"{prefix}_{metric}{_labels({'stage': s['stage'], **s['labels']})} {s[field]:g}"
+                              for s in rows]
+        return '\n'.join(lines) + '\n'
+
+    def profile_report(self, stage, sort='cumulative', limit=20):
+        """Text report of the cProfile stats collected for a stage"""
+        if stage not in self.profiles:
+            raise KeyError(f"No profile recorded for stage {stage}")
+        out = io.StringIO()
+        stats = pstats.Stats(stream=out)
+        with self._lock:
+            stats.add(self.profiles[stage])
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+            self.profiles.clear()
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+# ===== Module-level switch =====
+# Instrumented code calls count()/stage()/traced(); while disabled these
+# return immediately (stage() hands back a shared no-op context manager).
+_active = None
+_NULL_STAGE = nullcontext()
+
+def enable(log=None, profile=None, stages=None):
+    """Start collecting into a fresh Instrumentation and return it"""
+    global _active
+    _active = Instrumentation(log, profile, stages)
+    return _active
+
+def disable():
+    global _active
+    _active = None
+
+def current():
+    """The active Instrumentation, or None when disabled"""
+    return _active
+
+def count(name, value=1, **labels):
+    if _active is not None:
+        _active.count(name, value, **labels)
+
+def stage(name, **labels):
+    if _active is None:
+        return _NULL_STAGE
+    return _active.stage(name, **labels)
+
+def traced(name, **labels):
+    """Decorator running the whole function as one stage"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return fn(*args, **kwargs)
+            with _active.stage(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# FORECAST_INSTRUMENT=1 (or cpu / memory) switches collection on at import;
+# FORECAST_INSTRUMENT_LOG names a JSON-lines file to log stages to
+if os.environ.get("FORECAST_INSTRUMENT"):
+    _mode = os.environ["FORECAST_INSTRUMENT"]
+    enable(os.environ.get("FORECAST_INSTRUMENT_LOG"), _mode if _mode in PROFILE_MODES else None)
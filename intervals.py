@@ -0,0 +1,96 @@
+import pandas as pd
+import numpy as np
+from utils import future_index
+
+DEFAULT_PATHS = 1000
+MAX_DRAWS = 5_000_000  # simulated values held in memory at once
+
+def check_quantiles(quantiles):
+    """Quantiles as a sorted float array (empty for None)"""
+    quantiles = np.sort(np.asarray(quantiles if quantiles is not None else [], dtype=float))
+    if np.any((quantiles <= 0) | (quantiles >= 1)):
+        raise ValueError("Quantiles must be between 0 and 1")
+    return quantiles
+
+def quantile_columns(quantiles):
+    return [f"q{q:g}" for q in check_quantiles(quantiles)]
+
+def forecast_frame(index, point, quantiles=None, bands=None):
+    """
+    Standard model output: date, forecast and one q<level> column per quantile.
+
+    index: history index the forecast continues from
+    bands: (len(quantiles), horizon) array of quantile forecasts
+    """
+    frame = pd.DataFrame({'date': future_index(index, len(point)), 'forecast': point})
+    for column, values in zip(quantile_columns(quantiles), bands if bands is not None else []):
+        frame[column] = values
+    return frame
+
+def normal_intervals(mean, std, quantiles):
+    """Analytic quantiles of N(mean, std**2); returns (len(quantiles), *mean.shape)"""
+    from scipy.stats import norm
+    z = norm.ppf(check_quantiles(quantiles))
+    mean = np.asarray(mean, dtype=float)
+    return mean + z.reshape((-1,) + (1,) * mean.ndim) * np.asarray(std, dtype=float)
+
+def psi_matrix(psi, horizon):
+    """
+    Map one-step innovations to h-step forecast errors.
+
+    psi holds the weights c_1, c_2, ... of a linear innovations model, so the
+    error at step i is e_i + sum_j c_(i-j) e_j. Returns the lower-triangular
+    (horizon, horizon) matrix of those weights; None means independent errors.
+    """
+    if psi is None:
+        return np.eye(horizon)
+    psi = np.asarray(psi, dtype=float)
+    weights = np.r_[1.0, np.full(horizon - 1, psi) if psi.ndim == 0 else psi[:horizon - 1]]
+    lags = np.subtract.outer(np.arange(horizon), np.arange(horizon))
+    return np.where(lags >= 0, weights[np.clip(lags, 0, None)], 0.0)
+
+def bootstrap_intervals(point, residuals, quantiles, psi=None, n_paths=DEFAULT_PATHS, seed=0):
+    """
+    Quantile forecasts from resampled in-sample residuals, for one series or a panel.
+
+    point: (horizon,) or (n_series, horizon) point forecasts
+    residuals: one-step errors, (n_resid,) or (n_series, n_resid)
+    psi: innovation weights (see psi_matrix)
+
+    All n_paths innovation paths of a block of series are drawn at once and
+    turned into forecast errors with one matrix product; series are processed
+    in blocks so at most MAX_DRAWS values are simulated at a time.
+    Returns (len(quantiles), *point.shape).
+    """
+    quantiles = check_quantiles(quantiles)
+    point = np.asarray(point, dtype=float)
+    single = point.ndim == 1
+    point = np.atleast_2d(point)
+    residuals = np.atleast_2d(np.asarray(residuals, dtype=float))
+    if single:
+        residuals = residuals[:, ~np.isnan(residuals[0])]
+    if residuals.shape[1] == 0:
+        residuals = np.zeros((len(point), 1))
+    n_series, horizon = point.shape
+    weights = psi_matrix(psi, horizon) if psi is not None else None
+    rng = np.random.default_rng(seed)
+
+    # Linear interpolation between order statistics (np.quantile's default)
+    position = quantiles * (n_paths - 1)
+    low = np.floor(position).astype(int)
+    high = np.minimum(low + 1, n_paths - 1)
+    frac = position - low
+
+    bands = np.empty((len(quantiles), n_series, horizon))
+    block = max(1, MAX_DRAWS // (n_paths * horizon))
+    for start in range(0, n_series, block):
+        rows = slice(start, start + block)
+        # (series, horizon, path): paths last keeps the quantile reduction contiguous
+        picks = rng.integers(0, residuals.shape[1], size=(len(point[rows]), horizon, n_paths))
+        errors = np.take_along_axis(residuals[rows, None, :], picks, axis=2)
+        if weights is not None:
+            errors = weights @ errors
+        errors.sort(axis=2)  # a full sort of short rows beats np.quantile's partitioning
+        lower = errors[..., low]
+        bands[:, rows] = point[None, rows] + np.moveaxis(lower + (errors[..., high] - lower) * frac, 2, 0)
+    return bands[:, 0] if single else bands
@@ -1,39 +1,134 @@
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.arima.model import ARIMA
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from prophet import Prophet
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+from baselines import run_baseline
+from intervals import bootstrap_intervals, forecast_frame, normal_intervals
+from model_cache import warm_starts
+
+# statsmodels, Prophet and sklearn take seconds to import, so each model
+# imports its library on first use (see model_registry)
+#
+# Every run_* function has the same shape:
+#   run_x(df, target_col, horizon=30, quantiles=None, **params)
+# and returns future periods as a forecast_frame (date, forecast and one
+# q<level> column per requested quantile).
 
 # ===== Traditional Models =====
-def run_moving_average(df, target_col='target', window=3):
-    return df[target_col].rolling(window=window).mean()
+def run_moving_average(df, target_col='target', horizon=30, quantiles=None, window=3):
+    return run_baseline(df, target_col, 'moving_average', horizon, quantiles, window=window)
+
+def fit_exponential_smoothing(df, target_col='target', seasonal_periods=12):
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    model = ExponentialSmoothing(df[target_col], seasonal='add', seasonal_periods=seasonal_periods)
+    return model.fit()
 
-def run_exponential_smoothing(df, target_col='target'):
-    model = ExponentialSmoothing(df[target_col], seasonal='add', seasonal_periods=12)
-    model_fit = model.fit()
-    return model_fit.fittedvalues
+def run_exponential_smoothing(df, target_col='target', horizon=30, quantiles=None, seasonal_periods=12):
+    model_fit = fit_exponential_smoothing(df, target_col, seasonal_periods)
+    point = np.asarray(model_fit.forecast(horizon), dtype=float)
+    bands = None
+    if quantiles is not None:
+        # Analytic ETS(A,N,A) variance: sigma^2 * (1 + sum_j c_j^2) with
+        # c_j = alpha + gamma on whole seasons back, alpha otherwise
+        alpha = model_fit.params['smoothing_level']
+        gamma = model_fit.params['smoothing_seasonal']
+        lags = np.arange(1, horizon)
+        c = alpha + gamma * (lags % seasonal_periods == 0)
+        sigma2 = model_fit.sse / len(df)
+        std = np.sqrt(sigma2 * (1 + np.r_[0.0, np.cumsum(c**2)]))
+        bands = normal_intervals(point, std, quantiles)
+    return forecast_frame(df.index, point, quantiles, bands)
 
-def run_linear_regression(df, target_col='target'):
-    X = df.drop(columns=[target_col])
-    y = df[target_col]
+def run_linear_regression(df, target_col='target', horizon=30, quantiles=None):
+    """Regress the target on a time trend plus the other columns (held at their last value)"""
+    from sklearn.linear_model import LinearRegression
+    others = df.drop(columns=[target_col]).select_dtypes(include=['number']).to_numpy(dtype=float)
+    n = len(df)
+    X = np.column_stack([np.arange(n), others])
+    X_future = np.column_stack([np.arange(n, n + horizon), np.repeat(others[-1:], horizon, axis=0)])
+    y = df[target_col].to_numpy(dtype=float)
     model = LinearRegression()
     model.fit(X, y)
-    return model.predict(X)
+    point = model.predict(X_future)
+    bands = None
+    if quantiles is not None:
+        bands = bootstrap_intervals(point, y - model.predict(X), quantiles)
+    return forecast_frame(df.index, point, quantiles, bands)
 
 # ===== Time Series Models =====
-def run_arima(df, target_col='target', order=(5,1,0)):
+def fit_arima(df, target_col='target', order=(5,1,0)):
+    from statsmodels.tsa.arima.model import ARIMA
     model = ARIMA(df[target_col], order=order)
-    results = model.fit()
-    return results.fittedvalues
+    return model.fit()
+
+def run_arima(df, target_col='target', horizon=30, quantiles=None, order=(5,1,0)):
+    results = fit_arima(df, target_col, order)
+    prediction = results.get_forecast(horizon)
+    point = np.asarray(prediction.predicted_mean, dtype=float)
+    bands = None
+    if quantiles is not None:
+        bands = normal_intervals(point, np.sqrt(np.asarray(prediction.var_pred_mean)), quantiles)
+    return forecast_frame(df.index, point, quantiles, bands)
+
+# Prophet profiles. Fits are MAP estimates either way (no MCMC); most of a
+# fit's time is cmdstan reading the changepoint and Fourier feature matrices,
+# so "fast" trims both: 10 instead of 25 changepoints and a yearly Fourier
+# order of 5 instead of 10, and draws fewer samples when intervals are
+# requested. See benchmarks.prophet_tradeoff for speed against accuracy.
+PROPHET_PROFILES = {
+    'full': {'n_changepoints': 25, 'yearly_order': 10, 'uncertainty_samples': 1000},
+    'fast': {'n_changepoints': 10, 'yearly_order': 5, 'uncertainty_samples': 200},
+}
 
-def run_prophet(df, target_col='target'):
+def _prophet_init(model):
+    """A fitted Prophet's parameters in the form fit(init=...) takes"""
+    init = {name: float(model.params[name][0][0]) for name in ('k', 'm', 'sigma_obs')}
+    init.update({name: model.params[name][0].copy() for name in ('delta', 'beta')})
+    return init
+
+def run_prophet(df, target_col='target', horizon=30, quantiles=None, profile='full', warm_start=None):
+    """
+    Parameters:
+    profile: a PROPHET_PROFILES name
+    warm_start: a key for the series (e.g. its id); the fitted parameters are
+                kept in model_cache.warm_starts under it and initialise the
+                optimiser the next time the same series is refit
+    """
+    from prophet import Prophet
+    if profile not in PROPHET_PROFILES:
+        raise ValueError(f"Unknown Prophet profile: {profile}")
+    settings = PROPHET_PROFILES[profile]
     prophet_df = df.reset_index()[['date', target_col]].rename(columns={'date': 'ds', target_col: 'y'})
-    model = Prophet()
-    model.fit(prophet_df)
-    forecast = model.predict(prophet_df)
-    return forecast['yhat']
+    # Same rule as Prophet's yearly_seasonality='auto', with the profile's order
+    span = prophet_df['ds'].iloc[-1] - prophet_df['ds'].iloc[0]
+    yearly = settings['yearly_order'] if span >= pd.Timedelta(days=730) else False
+
+    def fit(init=None):
+        # Posterior samples are only drawn when intervals are requested
+        model = Prophet(n_changepoints=settings['n_changepoints'],
+                        yearly_seasonality=yearly,
+                        uncertainty_samples=settings['uncertainty_samples'] if quantiles is not None else 0)
+        return model.fit(prophet_df, init=init) if init is not None else model.fit(prophet_df)
+
+    # Parameters only fit a model with the same changepoints and seasonal terms;
+    # cmdstan rejects mismatched ones and Prophet then quietly fits twice
+    layout = (profile, yearly)
+    key = None if warm_start is None else ('prophet', warm_start)
+    previous = None if key is None else warm_starts.get(key)
+    init = previous['init'] if previous is not None and previous['layout'] == layout else None
+    try:
+        model = fit(init)
+    except Exception:
+        if init is None:
+            raise
+        model = fit()  # unusable parameters: fit cold
+    if key is not None:
+        warm_starts.put(key, {'layout': layout, 'init': _prophet_init(model)})
+    future = forecast_frame(df.index, np.zeros(horizon))[['date']].rename(columns={'date': 'ds'})
+    point = model.predict(future)['yhat'].to_numpy()
+    bands = None
+    if quantiles is not None:
+        samples = model.predictive_samples(future)['yhat']  # (horizon, n_samples)
+        bands = np.quantile(samples, sorted(quantiles), axis=1)
+    return forecast_frame(df.index, point, quantiles, bands)
 
 # ===== Advanced Models =====
 def scenario_based_forecast(data_dict):
@@ -43,4 +138,3 @@ def scenario_based_forecast(data_dict):
     future_dates = [today + datetime.timedelta(days=i) for i in range(30)]
     forecast = [100 + i*2 for i in range(30)]  # Dummy values
     return pd.DataFrame({'date': future_dates, 'forecast': forecast})
-
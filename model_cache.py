@@ -0,0 +1,167 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+def fingerprint(data):
+    """Stable content hash of a Series/DataFrame (values, index and column names)"""
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([str(c) for c in data.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def make_key(data_fingerprint, model_type, target_col='target', params=None):
+    """Build a cache key from the data fingerprint, model type and hyperparameters"""
+    params = sorted((params or {}).items())
+    return f"{model_type}|{target_col}|{data_fingerprint}|{params!r}"
+
+class ModelCache:
+    """
+    Two-tier cache for fitted model output.
+
+    The memory tier is an LRU of at most max_items entries. When disk_dir is set,
+    entries are also pickled there and the oldest files are evicted once the
+    directory grows beyond max_disk_bytes.
+    """
+    def __init__(self, max_items=128, disk_dir=None, max_disk_bytes=512 * 1024**2):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __contains__(self, key):
+        return key in self._memory or (self.disk_dir and os.path.exists(self._path(key)))
+
+    def __len__(self):
+        return len(self._memory)
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits,
+                "misses": self.misses, "size": len(self._memory)}
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        value = self._read_disk(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, value)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def get_or_fit(self, key, fit_fn):
+        """Return the cached value for key, calling fit_fn() to fill it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = fit_fn()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.disk_dir:
+            for path in self._disk_files():
+                _remove(path)
+
+    # ----- internals -----
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.pkl")
+
+    def _disk_files(self):
+        return [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir)
+                if f.endswith('.pkl')]
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)  # mtime doubles as last-access time for eviction
+            return value
+        except FileNotFoundError:  # never written, or evicted by another process mid-read
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable cache entry {path}: {e}")
+            _remove(path)
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Could not write cache entry {path}: {e}")
+            _remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        # Other processes share the directory and may evict the same files concurrently
+        files = []
+        for path in self._disk_files():
+            try:
+                files.append((os.stat(path), path))
+            except OSError:
+                pass
+        total = sum(st.st_size for st, _ in files)
+        for st, path in sorted(files, key=lambda item: item[0].st_mtime):
+            if total <= self.max_disk_bytes:
+                break
+            _remove(path)
+            total -= st.st_size
+
+def _remove(path):
+    """Delete a cache file; one already removed (e.g. by another process) is fine"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# Shared by forecast() so repeated runs (e.g. Streamlit reruns) skip refitting.
+# Set FORECAST_CACHE_DIR to also keep fitted output on disk between processes.
+default_cache = ModelCache(disk_dir=os.environ.get("FORECAST_CACHE_DIR"))
+
+# Fitted parameters per series, keyed (model_type, ..., series key), used to
+# initialise the next fit of the same series (see run_prophet's warm_start)
+warm_starts = ModelCache(max_items=4096)
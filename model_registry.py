@@ -0,0 +1,164 @@
+import importlib
+import importlib.util
+from collections.abc import Mapping
+from functools import partial
+from importlib.metadata import entry_points
+
+ENTRY_POINT_GROUP = "forecasting_ai.models"
+
+def _resolve(path):
+    module_name, _, attr = path.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+class ModelSpec:
+    """
+    A forecasting model and what it can do.
+
+    target is either a callable (df, target_col, horizon=30, quantiles=None,
+    **params) returning a forecast_frame of future periods, or a
+    "module:function" string that is imported on first use, so registering
+    a model costs nothing until it is run.
+
+    panel optionally forecasts a whole (n_series, n_time) array in one call:
+    panel(Y, horizon=30, quantiles=None, dates=None, **params) returning the
+    (n_series, horizon) point forecasts, or (point, bands) with quantiles.
+
+    Capabilities:
+    requires: importable packages the model needs (checked by available())
+    multivariate: uses columns besides the target
+    needs_date_index: expects a DatetimeIndex (or 'date' column)
+    incremental: supported by incremental.IncrementalModel
+    batched: has a panel form (set automatically when panel is given)
+    """
+    def __init__(self, name, target, requires=(), multivariate=False, needs_date_index=False,
+                 incremental=False, batched=False, panel=None, description=""):
+        self.name = name
+        self.target = target
+        self.requires = tuple(requires)
+        self.multivariate = multivariate
+        self.needs_date_index = needs_date_index
+        self.incremental = incremental
+        self.batched = batched or panel is not None
+        self.panel = panel
+        self.description = description
+        self._fn = None if isinstance(target, str) else target
+        self._panel_fn = None if isinstance(panel, str) else panel
+
+    def __repr__(self):
+        return f"ModelSpec({self.name!r}, {self.target!r})"
+
+    def __getstate__(self):
+        # Ship the import path, not the loaded function, to worker processes
+        state = self.__dict__.copy()
+        if isinstance(self.target, str):
+            state['_fn'] = None
+        if isinstance(self.panel, str):
+            state['_panel_fn'] = None
+        return state
+
+    def load(self):
+        """Import (once) and return the model function"""
+        if self._fn is None:
+            self._fn = _resolve(self.target)
+        return self._fn
+
+    def load_panel(self):
+        """Import (once) and return the panel function, or None"""
+        if self._panel_fn is None and self.panel is not None:
+            self._panel_fn = _resolve(self.panel)
+        return self._panel_fn
+
+    def available(self):
+        """True when every required package can be imported"""
+        return all(importlib.util.find_spec(package) is not None for package in self.requires)
+
+    def __call__(self, df, target_col='target', **params):
+        return self.load()(df, target_col, **params)
+
+class ModelRegistry(Mapping):
+    """
+    name -> ModelSpec lookup used by forecast().
+
+    Third-party packages add models through the "forecasting_ai.models" entry
+    point group; each entry point should resolve to a ModelSpec (or a plain
+    model function). Plugins are only discovered the first time a name is
+    not found among the registered models, or when all models are listed.
+    """
+    def __init__(self, group=ENTRY_POINT_GROUP):
+        self.group = group
+        self._specs = {}
+        self._plugins_loaded = False
+
+    def register(self, name, target, **capabilities):
+        spec = target if isinstance(target, ModelSpec) else ModelSpec(name, target, **capabilities)
+        self._specs[name] = spec
+        return spec
+
+    def load_plugins(self):
+        if self._plugins_loaded:
+            return
+        self._plugins_loaded = True
+        for ep in entry_points(group=self.group):
+            if ep.name in self._specs:
+                continue
+            try:
+                self.register(ep.name, ep.load())
+            except Exception as e:
+                print(f"Could not load model plugin {ep.name}: {e}")
+
+    def __getitem__(self, name):
+        if name not in self._specs:
+            self.load_plugins()
+        return self._specs[name]
+
+    def __contains__(self, name):
+        if name not in self._specs:
+            self.load_plugins()
+        return name in self._specs
+
+    def __iter__(self):
+        self.load_plugins()
+        return iter(self._specs)
+
+    def __len__(self):
+        self.load_plugins()
+        return len(self._specs)
+
+    def names(self, **capabilities):
+        """Registered model names whose capabilities match, e.g. names(batched=True)"""
+        return [name for name, spec in self.items()
+                if all(getattr(spec, key) == value for key, value in capabilities.items())]
+
+# ===== Built-in Models =====
+def _baseline_panel(Y, horizon=30, quantiles=None, dates=None, model_type='naive', **params):
+    from baselines import forecast_panel
+    return forecast_panel(Y, model_type, horizon, quantiles, **params)
+
+def _qualitative_placeholder(df, target_col='target', horizon=30, quantiles=None):
+    from ml_models import scenario_based_forecast
+    return scenario_based_forecast({})
+
+def _builtin_registry():
+    from baselines import BASELINES, run_baseline
+
+    registry = ModelRegistry()
+    registry.register("linear_regression", "ml_models:run_linear_regression",
+                      requires=("sklearn",), multivariate=True)
+    registry.register("arima", "ml_models:run_arima", requires=("statsmodels",), incremental=True)
+    registry.register("prophet", "ml_models:run_prophet", requires=("prophet",), needs_date_index=True)
+    registry.register("auto_arima", "auto_arima:run_auto_arima", requires=("statsmodels",),
+                      description="ARIMA with a stepwise (p,d,q)(P,D,Q,m) order search")
+    registry.register("exponential_smoothing", "ml_models:run_exponential_smoothing",
+                      requires=("statsmodels",), incremental=True)
+    global_gbm = registry.register("global_gbm", "global_model:run_global_gbm", requires=("sklearn",),
+                                   multivariate=True, panel="global_model:forecast_global_panel",
+                                   description="Gradient boosting on lag features, shared across series")
+    registry.register("lstm", global_gbm)  # the old "lstm" stub now runs the global model
+    registry.register("qualitative", _qualitative_placeholder, description="Placeholder scenario")
+    # Vectorized baselines
+    for name in BASELINES:
+        registry.register(name, partial(run_baseline, model_type=name),
+                          panel=partial(_baseline_panel, model_type=name))
+    return registry
+
+REGISTRY = _builtin_registry()
@@ -0,0 +1,91 @@
+import pandas as pd
+import numpy as np
+from model_cache import ModelCache, fingerprint
+
+ACF_LAGS = 40
+ACF_PEAK_THRESHOLD = 0.5
+TREND_THRESHOLD = 0.01
+
+_profile_cache = ModelCache(max_items=4096)
+
+def _acf(Y, nlags):
+    """Autocorrelation of every row of Y up to nlags, via one batched FFT"""
+    n = Y.shape[1]
+    centered = Y - Y.mean(axis=1, keepdims=True)
+    size = 1 << (2 * n - 1).bit_length()  # zero-pad so the correlation isn't circular
+    spectrum = np.fft.rfft(centered, n=size, axis=1)
+    acov = np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=1)[:, :nlags + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return acov / acov[:, :1]
+
+def profile_panel(Y, nlags=ACF_LAGS):
+    """
+    Profile every row of a (n_series, n_time) array in one vectorized pass.
+
+    Columns: length, trend_slope, has_trend, acf_peaks, has_seasonality,
+    seasonal_period, seasonal_strength, intermittency.
+    acf_peaks counts lags (0..nlags) with autocorrelation above 0.5, and a
+    series is seasonal when more than two lags clear it.
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    n_series, n_time = Y.shape
+    if n_time < 2:
+        return pd.DataFrame({
+            'length': np.full(n_series, n_time), 'trend_slope': 0.0, 'has_trend': False,
+            'acf_peaks': n_time, 'has_seasonality': False, 'seasonal_period': 0,
+            'seasonal_strength': 0.0, 'intermittency': np.mean(Y == 0, axis=1)})
+
+    # OLS slope against the time index, closed form for all rows at once
+    t = np.arange(n_time) - (n_time - 1) / 2
+    slope = (Y - Y.mean(axis=1, keepdims=True)) @ t / (t @ t)
+
+    acf = _acf(Y, min(nlags, n_time - 1))
+    acf_peaks = np.sum(acf > ACF_PEAK_THRESHOLD, axis=1)
+    later = np.nan_to_num(acf[:, 2:], nan=0.0)
+    has_later = later.shape[1] > 0
+    seasonal_period = np.argmax(later, axis=1) + 2 if has_later else np.zeros(n_series, dtype=int)
+    seasonal_strength = later.max(axis=1) if has_later else np.zeros(n_series)
+
+    return pd.DataFrame({
+        'length': np.full(n_series, n_time),
+        'trend_slope': slope,
+        'has_trend': np.abs(slope) > TREND_THRESHOLD,
+        'acf_peaks': acf_peaks,
+        'has_seasonality': acf_peaks > 2,
+        'seasonal_period': seasonal_period,
+        'seasonal_strength': seasonal_strength,
+        'intermittency': np.mean(Y == 0, axis=1),
+    })
+
+def profile_series(series):
+    """Profile of a single series, cached by its content fingerprint"""
+    series = pd.Series(series).dropna()
+    key = fingerprint(series)
+    profile = _profile_cache.get(key)
+    if profile is None:
+        profile = profile_panel(series.to_numpy()[None, :]).iloc[0].to_dict()
+        _profile_cache.put(key, profile)
+    return profile
+
+def profile_frame(df):
+    """Profiles of every numeric column of a frame, as one panel"""
+    numeric = df.select_dtypes(include=['number']).dropna()
+    profiles = profile_panel(numeric.to_numpy().T)
+    profiles.index = numeric.columns
+    return profiles
+
+def select_models(profiles, multivariate=False):
+    """
+    Vectorized auto-selection over a profile table (same rules as
+    forecasting_engine.auto_select_model).
+    """
+    n = profiles['length'].to_numpy()
+    seasonal = profiles['has_seasonality'].to_numpy(dtype=bool)
+    trend = profiles['has_trend'].to_numpy(dtype=bool)
+    choice = np.select(
+        [n == 0, n < 30, seasonal & trend, seasonal, trend & (n > 365), multivariate],
+        ["qualitative", "moving_average", "prophet", "exponential_smoothing", "arima",
+         np.where(n > 100, "global_gbm", "linear_regression")],
+        default=np.where(n > 100, "prophet", "exponential_smoothing"),
+    )
+    return pd.Series(choice, index=profiles.index, name='model')
@@ -1,69 +1,107 @@
 import pandas as pd
-import streamlit as st
+import numpy as np
+from delphi import DelphiStore
+from scenarios import ScenarioEngine
 
 class QualitativeForecaster:
-    def __init__(self):
-        self.experts = {}
+    """
+    Expert (Delphi) forecasts and scenario multipliers.
+
+    Submissions are kept in a headless DelphiStore, so any client can feed
+    it; run_delphi_process is the Streamlit one.
+    """
+    def __init__(self, store=None):
+        self.store = DelphiStore() if store is None else store
         self.scenarios = {
             'Best-case': 1.0,
             'Most-likely': 1.0,
             'Worst-case': 1.0
         }
-        self.confidence_scores = {}
-    
-    def delphi_round(self, expert_name, forecast_value, confidence):
-        """Record expert input with confidence scoring"""
-        self.experts[expert_name] = forecast_value
-        self.confidence_scores[expert_name] = confidence
-        
-        # Calculate weighted average
-        weights = [self.confidence_scores[e] for e in self.experts]
-        values = [self.experts[e] for e in self.experts]
-        weighted_avg = np.average(values, weights=weights)
-        
-        return weighted_avg
-    
-    def scenario_forecast(self, base_value):
-        """Generate scenario-based forecasts"""
+
+    @property
+    def experts(self):
+        data = self._latest_round()
+        return {} if data is None else {e: float(data.values[i]) for e, i in data.slots.items()}
+
+    @property
+    def confidence_scores(self):
+        data = self._latest_round()
+        return {} if data is None else {e: float(data.weights[i]) for e, i in data.slots.items()}
+
+    def _latest_round(self, metric='forecast'):
+        try:
+            return self.store.round(metric)
+        except KeyError:
+            return None
+
+    def delphi_round(self, expert_name, forecast_value, confidence, metric='forecast', round_num=None):
+        """Record expert input with confidence scoring; returns the running weighted average"""
+        return self.store.submit(expert_name, forecast_value, confidence, metric, round_num)
+
+    def scenario_forecast(self, base_value, n_paths=10000):
+        """
+        Generate scenario-based forecasts for a value or a forecast trajectory.
+
+        The multipliers set the spread of simulated scenario paths (see
+        ScenarioEngine.from_multipliers); the cases are their 90th, 50th and
+        10th percentiles at every period.
+        """
+        trajectory = np.atleast_1d(np.asarray(base_value, dtype=float))
+        engine = ScenarioEngine.from_multipliers(self.scenarios['Best-case'], self.scenarios['Most-likely'],
+                                                 self.scenarios['Worst-case'], horizon=len(trajectory),
+                                                 n_paths=n_paths)
+        worst, likely, best = engine.bands(trajectory, quantiles=(0.1, 0.5, 0.9))
+        if np.ndim(base_value) == 0:
+            worst, likely, best = float(worst[-1]), float(likely[-1]), float(best[-1])
         return {
-            'Best-case': base_value * self.scenarios['Best-case'],
-            'Most-likely': base_value * self.scenarios['Most-likely'],
-            'Worst-case': base_value * self.scenarios['Worst-case']
+            'Best-case': best,
+            'Most-likely': likely,
+            'Worst-case': worst
         }
     
-    def run_delphi_process(self, rounds=3):
-        """Simulate multi-round Delphi method"""
+    def run_delphi_process(self, rounds=3, metric='forecast', max_experts=500):
+        """Multi-round Delphi method in Streamlit, backed by self.store"""
+        import streamlit as st
         st.sidebar.header("Delphi Method Configuration")
-        num_experts = st.sidebar.number_input("Number of Experts", 3, 10, 5)
-        
+        num_experts = st.sidebar.number_input("Number of Experts", 3, max_experts, 5)
+        uploaded = st.sidebar.file_uploader("Or import submissions (CSV: expert, value, confidence, round)")
+        if uploaded is not None:
+            try:
+                self.store.submit_many(pd.read_csv(uploaded).assign(metric=metric))
+            except ValueError as e:
+                st.sidebar.error(f"Invalid submissions file: {e}")
+
         results = []
         for round_num in range(1, rounds+1):
             st.subheader(f"Round {round_num}/{rounds}")
             round_results = {}
-            
+
             for i in range(num_experts):
                 col1, col2 = st.columns(2)
                 with col1:
-                    forecast = st.number_input(f"Expert {i+1} Forecast", 
+                    forecast = st.number_input(f"Expert {i+1} Forecast",
                                              key=f"expert_{i}_round_{round_num}")
                 with col2:
                     confidence = st.slider(f"Confidence (0-100)", 0, 100, 75,
                                           key=f"conf_{i}_round_{round_num}")
                 round_results[f"Expert {i+1}"] = (forecast, confidence/100)
-            
+                self.store.submit(f"Expert {i+1}", forecast, confidence/100, metric, round_num)
+
             # Store results
             results.append(round_results)
-            
+
             # Show summary
-            values = [v[0] for v in round_results.values()]
-            confidences = [v[1] for v in round_results.values()]
-            weighted_avg = np.average(values, weights=confidences)
-            
-            st.metric(f"Round {round_num} Weighted Average", f"{weighted_avg:.2f}")
-        
+            stats = self.store.round(metric, round_num).stats()
+            st.metric(f"Round {round_num} Weighted Average", f"{stats['weighted_mean']:.2f}")
+            st.caption(f"{stats['experts']} experts, median {stats['median']:.2f}, "
+                       f"trimmed mean {stats['trimmed_mean']:.2f}, std {stats['std']:.2f}")
+
+        if self.store.converged(metric):
+            st.success("Consensus reached: the last round barely moved the median")
         return results
 
 def scenario_based_forecast(base_value):
+    import streamlit as st
     forecaster = QualitativeForecaster()
     
     st.sidebar.header("Scenario Parameters")
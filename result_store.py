@@ -0,0 +1,286 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from timeseries_store import _safe_key
+
+DEFAULT_ROOT = os.environ.get("FORECAST_RESULTS_DIR", os.path.join("data", "results"))
+ROW_GROUP_ROWS = 16 * 1024
+KEY_COLUMNS = ('series', 'model', 'step', 'date')
+
+def _dates(values):
+    """Forecast dates as tz-naive datetime64 (UTC for tz-aware input), or int64 positions"""
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind == 'M':
+        return values.to_numpy()
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.int64)
+    dates = pd.to_datetime(values)
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    return dates.to_numpy(dtype='datetime64[ns]')
+
+def _as_results(results):
+    """(series, frame, model, error) tuples from forecast_many() output, {series: frame} or one frame"""
+    if isinstance(results, pd.DataFrame):
+        return [('series', results, None, None)]
+    if isinstance(results, dict):
+        return [(series, frame, None, None) for series, frame in results.items()]
+    return results
+
+def _metrics_table(metrics):
+    if isinstance(metrics, dict):
+        metrics = pd.DataFrame.from_dict(metrics, orient='index').rename_axis('series').reset_index()
+    frame = metrics.copy()
+    if 'series' not in frame.columns:
+        raise ValueError("Metrics need a 'series' column (or a {series: {metric: value}} dict)")
+    for column in frame.columns:
+        if column in ('series', 'model', 'error'):
+            frame[column] = frame[column].astype(str)
+        elif pd.api.types.is_numeric_dtype(frame[column]) or frame[column].isna().all():
+            frame[column] = frame[column].astype(np.float32)
+    return pa.Table.from_pandas(frame.sort_values('series', kind='stable'), preserve_index=False)
+
+def _dates_only(column):
+    """True when every timestamp in column falls on midnight"""
+    return pa.types.is_timestamp(column.type) and \
+        pc.all(pc.equal(pc.floor_temporal(column, unit='day'), column)).as_py() is not False
+
+def _csv_ready(table, dates_only):
+    """Strings for dictionary columns; timestamps as plain dates when the run's dates have no time part"""
+    columns = []
+    for column in table.columns:
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(pa.string())
+        elif pa.types.is_timestamp(column.type):
+            column = column.cast(pa.date32()) if dates_only else column.cast(pa.timestamp('s'), safe=False)
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+class ForecastResultStore:
+    """
+    Persistent, columnar store of forecast runs.
+
+    Layout: <root>/<run_id>/forecasts.parquet, metrics.parquet and run.json.
+    Forecast rows are (series, model, step, date, forecast, q<level>...),
+    with values and intervals as float32. Rows are sorted by series, so the
+    series min/max statistics of each row group tell which groups can hold
+    the series asked for: reading a few series opens only those groups,
+    memory-mapped, and only the requested columns. series and model come
+    back categorical. A saved run reloads without refitting anything.
+    """
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self):
+        return f"ForecastResultStore({self.root!r}, {len(self.runs())} runs)"
+
+    def __contains__(self, run_id):
+        return os.path.exists(os.path.join(self._run_dir(run_id), "run.json"))
+
+    def _run_dir(self, run_id):
+        return os.path.join(self.root, _safe_key(run_id))
+
+    # ----- writing -----
+    def write(self, results, run_id=None, metrics=None, model=None, **metadata):
+        """
+        Save a forecast run and return its run_id.
+
+        results: forecast_many() output (series, frame, model, error) tuples,
+                 a {series: frame} dict or a single forecast frame
+        metrics: optional DataFrame with a 'series' column (and 'model') plus
+                 metric columns, or a {series: {metric: value}} dict
+        model: model name for results that don't carry one
+        metadata: extra JSON-serialisable fields kept in run.json
+
+        Series ids are stored as strings; failed series are listed under
+        'errors' in run.json. An existing run_id is replaced.
+        """
+        run_id = _safe_key(run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}")
+        series_ids, models, frames, errors = [], [], [], {}
+        for series_id, frame, model_type, error in _as_results(results):
+            if error is not None or frame is None:
+                errors[str(series_id)] = error or "no forecast"
+                continue
+            series_ids.append(str(series_id))
+            models.append(str(model_type or model or ''))
+            frames.append(frame)
+        table = self._forecast_table(series_ids, models, frames)
+
+        with self._lock:
+            tmp_dir = tempfile.mkdtemp(prefix=f".{run_id}.", dir=self.root)
+            try:
+                pq.write_table(table, os.path.join(tmp_dir, "forecasts.parquet"), row_group_size=ROW_GROUP_ROWS)
+                if metrics is not None:
+                    pq.write_table(_metrics_table(metrics), os.path.join(tmp_dir, "metrics.parquet"))
+                info = {'run_id': run_id, 'created': time.time(), 'series': len(set(series_ids)),
+                        'rows': table.num_rows, 'models': sorted(set(models)),
+                        'columns': [c for c in table.column_names if c not in KEY_COLUMNS],
+                        'dates_only': bool(_dates_only(table['date'])), 'errors': errors, **metadata}
+                with open(os.path.join(tmp_dir, "run.json"), 'w') as f:
+                    json.dump(info, f, indent=1, default=str)
+                run_dir = self._run_dir(run_id)
+                if os.path.isdir(run_dir):
+                    shutil.rmtree(run_dir)
+                os.replace(tmp_dir, run_dir)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+        return run_id
+
+    @staticmethod
+    def _forecast_table(series_ids, models, frames):
+        """One Arrow table for all frames, built from concatenated column arrays"""
+        lengths = np.array([len(frame) for frame in frames], dtype=np.int64)
+        # One concat; pulling columns out of each of 20k small frames costs far more
+        stacked = pd.concat(frames, ignore_index=True, copy=False) if frames else pd.DataFrame({'date': []})
+        value_columns = ['forecast'] + [c for c in stacked.columns if c not in ('date', 'forecast')]
+
+        # np.unique sorts the ids, so grouping rows by code sorts them by series
+        series_names, series_codes = np.unique(np.array(series_ids, dtype=object), return_inverse=True)
+        series_codes = np.repeat(series_codes, lengths)
+        order = np.argsort(series_codes, kind='stable')
+        offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        columns = {
+            'series': pa.array(series_names[series_codes[order]] if len(order) else [], pa.string()),
+            'model': pa.array(np.repeat(np.array(models, dtype=object), lengths)[order], pa.string()),
+            'step': (np.arange(lengths.sum()) - offsets + 1).astype(np.int16)[order],
+            'date': _dates(stacked['date'])[order] if frames else np.empty(0, 'datetime64[ns]'),
+        }
+        for column in value_columns:
+            values = stacked[column] if column in stacked.columns else pd.Series(np.nan, index=stacked.index)
+            columns[column] = values.to_numpy(dtype=np.float32)[order]
+        return pa.table(columns)
+
+    # ----- reading -----
+    def runs(self):
+        """run.json of every stored run, newest first"""
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, "run.json")
+            if not name.startswith('.') and os.path.exists(path):
+                with open(path) as f:
+                    found.append(json.load(f))
+        return sorted(found, key=lambda info: info['created'], reverse=True)
+
+    def info(self, run_id):
+        path = os.path.join(self._run_dir(run_id), "run.json")
+        if not os.path.exists(path):
+            raise KeyError(f"No stored run {run_id}")
+        with open(path) as f:
+            return json.load(f)
+
+    def _open(self, run_id, name, series=None):
+        """(ParquetFile, row groups that may hold `series`) for one of a run's files"""
+        path = os.path.join(self._run_dir(run_id), name)
+        if not os.path.exists(path):
+            raise KeyError(f"No {name} for run {run_id}")
+        names = pq.read_schema(path, memory_map=True).names
+        parquet = pq.ParquetFile(path, memory_map=True,
+                                 read_dictionary=[c for c in ('series', 'model') if c in names])
+        groups = list(range(parquet.metadata.num_row_groups))
+        if series is not None:
+            wanted = sorted({str(s) for s in np.atleast_1d(series)})
+            position = names.index('series')
+            groups = [g for g in groups if self._may_hold(parquet.metadata.row_group(g).column(position), wanted)]
+        return parquet, groups
+
+    @staticmethod
+    def _may_hold(chunk, wanted):
+        stats = chunk.statistics
+        if stats is None or not stats.has_min_max:
+            return True
+        i = bisect_left(wanted, stats.min)
+        return i < len(wanted) and wanted[i] <= stats.max
+
+    @staticmethod
+    def _select(table, series=None, models=None, max_step=None):
+        mask = None
+        conditions = []
+        if series is not None:
+            conditions.append(pc.is_in(table['series'], pa.array([str(s) for s in np.atleast_1d(series)])))
+        if models is not None and 'model' in table.column_names:
+            conditions.append(pc.is_in(table['model'], pa.array([str(m) for m in np.atleast_1d(models)])))
+        if max_step is not None:
+            conditions.append(pc.less_equal(table['step'], max_step))
+        for condition in conditions:
+            mask = condition if mask is None else pc.and_(mask, condition)
+        return table if mask is None else table.filter(mask)
+
+    @staticmethod
+    def _columns(parquet, columns):
+        if columns is None:
+            return None
+        keys = [c for c in KEY_COLUMNS if c in parquet.schema_arrow.names]
+        return keys + [c for c in columns if c not in keys]
+
+    def read(self, run_id, series=None, models=None, columns=None, max_step=None):
+        """
+        Stored forecast rows as a DataFrame.
+
+        series, models: only these series ids / model names
+        columns: value columns to load (e.g. ['forecast']); key columns are
+                 always included
+        max_step: only the first max_step periods of each forecast
+        """
+        parquet, groups = self._open(run_id, "forecasts.parquet", series)
+        table = parquet.read_row_groups(groups, columns=self._columns(parquet, columns))
+        return self._select(table, series, models, max_step).to_pandas()
+
+    def read_frame(self, run_id, series, model=None, columns=None):
+        """One series' forecast frame (date, forecast, q<level>...), as forecast() returns it"""
+        frame = self.read(run_id, series=[series], models=None if model is None else [model], columns=columns)
+        return frame.drop(columns=['series', 'model', 'step']).reset_index(drop=True)
+
+    def metrics(self, run_id, series=None, models=None):
+        """Stored metrics rows, optionally for some series / models only"""
+        parquet, groups = self._open(run_id, "metrics.parquet", series)
+        return self._select(parquet.read_row_groups(groups), series, models).to_pandas()
+
+    # ----- downloads -----
+    def iter_csv(self, run_id, series=None, models=None, columns=None, max_step=None):
+        """
+        The stored rows as CSV, yielded as encoded chunks of one row group
+        each, so a download never holds the whole file in memory. Dates are
+        written in one format for the whole run (see run.json 'dates_only').
+        """
+        parquet, groups = self._open(run_id, "forecasts.parquet", series)
+        columns = self._columns(parquet, columns)
+        dates_only = self.info(run_id).get('dates_only', False)
+        header = True
+        for group in groups:
+            table = self._select(parquet.read_row_group(group, columns=columns), series, models, max_step)
+            if table.num_rows:
+                out = pa.BufferOutputStream()
+                pacsv.write_csv(_csv_ready(table, dates_only), out,
+                                pacsv.WriteOptions(include_header=header))
+                yield out.getvalue().to_pybytes()
+                header = False
+        if header:  # nothing matched: still send the header line
+            yield (",".join(columns or parquet.schema_arrow.names) + "\n").encode()
+
+    def csv_file(self, run_id, **filters):
+        """
+        The CSV in a rewound temporary file (kept in memory up to 8 MB, on
+        disk beyond), e.g. for Streamlit's deferred st.download_button.
+        """
+        out = tempfile.SpooledTemporaryFile(max_size=8 * 2**20)
+        for chunk in self.iter_csv(run_id, **filters):
+            out.write(chunk)
+        out.seek(0)
+        return out
+
+    def delete(self, run_id):
+        with self._lock:
+            shutil.rmtree(self._run_dir(run_id), ignore_errors=True)
@@ -0,0 +1,180 @@
+import copy
+import numpy as np
+from statistics import NormalDist
+from intervals import check_quantiles, forecast_frame
+
+SHOCK_FACTORS = ("growth", "cost_inflation", "demand")
+# Growth moves with demand; cost inflation mildly with growth and against demand
+DEFAULT_CORRELATION = np.array([[1.0, 0.3, 0.6],
+                                [0.3, 1.0, -0.2],
+                                [0.6, -0.2, 1.0]])
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+class ScenarioEngine:
+    """
+    Monte Carlo scenarios built from correlated shock paths.
+
+    Every factor's log level is a random walk with a per-period drift and
+    volatility, correlated across factors. A metric's simulated path is its
+    forecast trajectory times exp(loadings @ factor log levels), so one set
+    of paths moves revenue, costs and volumes consistently.
+
+    The standard normal draws are correlated and cumulated once, when the
+    engine is built. Changing drift, volatility or loadings afterwards only
+    rescales those draws: re-evaluating is one matrix product and a partial
+    sort, quick enough to rerun on every slider move.
+
+    Parameters:
+    horizon: number of periods simulated
+    n_paths: number of scenario paths
+    factors: shock factor names
+    correlation: factor correlation matrix (DEFAULT_CORRELATION for the
+                 default factors, independent factors otherwise)
+    drift, volatility: per-period log drift and volatility; a scalar for
+                 every factor, a sequence, or a {factor: value} dict
+    """
+    def __init__(self, horizon=36, n_paths=10000, factors=SHOCK_FACTORS, correlation=None,
+                 drift=0.0, volatility=0.02, seed=0):
+        self.horizon = horizon
+        self.n_paths = n_paths
+        self.factors = tuple(factors)
+        if correlation is None:
+            correlation = DEFAULT_CORRELATION if self.factors == SHOCK_FACTORS else np.eye(len(self.factors))
+        try:
+            chol = np.linalg.cholesky(np.asarray(correlation, dtype=float))
+        except np.linalg.LinAlgError:
+            raise ValueError("Factor correlation matrix must be positive definite")
+        self.drift = drift
+        self.volatility = volatility
+
+        # (factor, horizon * path) cumulative shocks, paths contiguous for the quantile sort
+        draws = np.random.default_rng(seed).standard_normal((len(self.factors), horizon, n_paths))
+        shocks = np.einsum('fg,ghp->fhp', chol, draws).cumsum(axis=1)
+        self._levels = shocks.reshape(len(self.factors), -1)
+        self._steps = np.arange(1, horizon + 1, dtype=float)
+
+    def __repr__(self):
+        return f"ScenarioEngine({len(self.factors)} factors, {self.n_paths} paths x {self.horizon} periods)"
+
+    @classmethod
+    def from_multipliers(cls, optimistic=1.2, base=1.0, pessimistic=0.8, horizon=36, coverage=0.8, **kwargs):
+        """
+        Engine whose end-of-horizon multiplier has median `base` and its
+        (1 +/- coverage)/2 quantiles at `optimistic` and `pessimistic`, for a
+        metric loaded 1.0 on one factor. This is how the dashboard's
+        Optimistic/Base/Pessimistic sliders are read.
+        """
+        drift, volatility = _multiplier_params(optimistic, base, pessimistic, horizon, coverage)
+        kwargs.setdefault('drift', drift)
+        kwargs.setdefault('volatility', volatility)
+        return cls(horizon=horizon, **kwargs)
+
+    def with_multipliers(self, optimistic=1.2, base=1.0, pessimistic=0.8, coverage=0.8):
+        """
+        Copy of this engine read from the multipliers as in from_multipliers().
+        The copy shares the simulated draws, so this costs no new simulation
+        and leaves the engine itself (e.g. a cached one) unchanged.
+        """
+        engine = copy.copy(self)
+        engine.drift, engine.volatility = _multiplier_params(optimistic, base, pessimistic, self.horizon, coverage)
+        return engine
+
+    def _per_factor(self, value):
+        if isinstance(value, dict):
+            unknown = set(value) - set(self.factors)
+            if unknown:
+                raise ValueError(f"Unknown shock factors: {sorted(unknown)}")
+            return np.array([value.get(f, 0.0) for f in self.factors], dtype=float)
+        return np.broadcast_to(np.asarray(value, dtype=float), (len(self.factors),))
+
+    def loading_matrix(self, loadings, n_metrics, names=None):
+        """
+        (n_metrics, n_factors) loadings. None loads every metric 1.0 on the
+        first factor; a dict maps metric name (or position) to {factor: weight}.
+        """
+        if loadings is None:
+            matrix = np.zeros((n_metrics, len(self.factors)))
+            matrix[:, 0] = 1.0
+            return matrix
+        if isinstance(loadings, dict):
+            names = list(range(n_metrics)) if names is None else list(names)
+            return np.vstack([self._per_factor(loadings.get(name, {self.factors[0]: 1.0}))
+                              for name in names])
+        matrix = np.atleast_2d(np.asarray(loadings, dtype=float))
+        if matrix.shape != (n_metrics, len(self.factors)):
+            raise ValueError(f"Loadings must have shape ({n_metrics}, {len(self.factors)})")
+        return matrix
+
+    def log_multipliers(self, loadings=None, n_metrics=1, names=None, horizon=None):
+        """Simulated log multipliers, shape (n_metrics, horizon, n_paths)"""
+        horizon = self.horizon if horizon is None else horizon
+        if horizon > self.horizon:
+            raise ValueError(f"Engine only simulates {self.horizon} periods")
+        weights = self.loading_matrix(loadings, n_metrics, names)
+        levels = self._levels[:, :horizon * self.n_paths]
+        paths = (weights * self._per_factor(self.volatility)) @ levels
+        paths = paths.reshape(n_metrics, horizon, self.n_paths)
+        paths += (weights @ self._per_factor(self.drift))[:, None, None] * self._steps[None, :horizon, None]
+        return paths
+
+    def simulate(self, trajectories, loadings=None, names=None):
+        """Scenario paths (n_metrics, horizon, n_paths) around (n_metrics, horizon) trajectories"""
+        trajectories = np.atleast_2d(np.asarray(trajectories, dtype=float))
+        paths = self.log_multipliers(loadings, len(trajectories), names, trajectories.shape[1])
+        return trajectories[..., None] * np.exp(paths)
+
+    def bands(self, trajectories, loadings=None, quantiles=DEFAULT_QUANTILES, names=None):
+        """
+        Percentile bands (len(quantiles), n_metrics, horizon) of the scenario paths.
+
+        Only the order statistics the quantiles need are partitioned out of the
+        log multipliers and exponentiated; since exp is increasing (and a
+        negative trajectory just mirrors the quantiles) this equals
+        np.quantile of the full simulated paths.
+        """
+        quantiles = check_quantiles(quantiles)
+        point = np.asarray(trajectories, dtype=float)
+        single = point.ndim == 1
+        point = np.atleast_2d(point)
+        paths = self.log_multipliers(loadings, len(point), names, point.shape[1])
+
+        levels = np.r_[quantiles, 1 - quantiles]
+        position = levels * (self.n_paths - 1)
+        low = np.floor(position).astype(int)
+        high = np.minimum(low + 1, self.n_paths - 1)
+        paths.partition(np.unique(np.r_[low, high]), axis=2)
+        lower = np.exp(paths[..., low])
+        multipliers = lower + (np.exp(paths[..., high]) - lower) * (position - low)
+        n = len(quantiles)
+        picked = np.where(point[..., None] >= 0, multipliers[..., :n], multipliers[..., n:])
+        bands = np.moveaxis(point[..., None] * picked, 2, 0)
+        return bands[:, 0] if single else bands
+
+def _multiplier_params(optimistic, base, pessimistic, horizon, coverage):
+    """(drift, volatility) putting the end-of-horizon multipliers at the given quantiles"""
+    if not 0 < pessimistic <= base <= optimistic:
+        raise ValueError("Multipliers must satisfy 0 < pessimistic <= base <= optimistic")
+    z = NormalDist().inv_cdf((1 + coverage) / 2)
+    spread = np.log(optimistic) - np.log(pessimistic)
+    return np.log(base) / horizon, spread / (2 * z * np.sqrt(horizon))
+
+def scenario_frames(frames, engine, loadings=None, quantiles=DEFAULT_QUANTILES):
+    """
+    Scenario bands for several forecasts at once.
+
+    frames: {metric: forecast frame with 'date' and 'forecast'}, e.g. forecast()
+            outputs for revenue, costs and volume
+    loadings: see ScenarioEngine.loading_matrix, keyed by metric name
+    Returns {metric: frame of date, forecast and one q<level> column per quantile},
+    the same layout as the models' interval forecasts.
+    """
+    names = list(frames)
+    horizon = min(len(frames[name]) for name in names)
+    trajectories = np.vstack([frames[name]['forecast'].to_numpy(dtype=float)[:horizon] for name in names])
+    bands = engine.bands(trajectories, loadings, quantiles, names)
+    result = {}
+    for i, name in enumerate(names):
+        frame = forecast_frame(np.empty(0), trajectories[i], quantiles, bands[:, i])
+        frame['date'] = frames[name]['date'].to_numpy()[:horizon]
+        result[name] = frame
+    return result
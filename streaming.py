@@ -0,0 +1,301 @@
+import time
+import pandas as pd
+import numpy as np
+import instrumentation
+from statistics import NormalDist
+from intervals import check_quantiles, quantile_columns
+
+class RingBuffer:
+    """Fixed-size window of (timestamp, value) observations; append is O(1), memory is constant"""
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)  # ns since epoch
+        self.values = np.zeros(capacity)
+        self.count = 0  # observations ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp_ns, value):
+        slot = self.count % self.capacity
+        self.times[slot] = timestamp_ns
+        self.values[slot] = value
+        self.count += 1
+
+    def last(self, n=1):
+        """The newest n (timestamps, values), oldest first"""
+        n = min(n, len(self))
+        slots = (self.count - n + np.arange(n)) % self.capacity
+        return self.times[slots], self.values[slots]
+
+    def ordered(self):
+        return self.last(len(self))
+
+# ===== Online Models =====
+# Each model takes one observation at a time in O(1) and can forecast
+# (point, std) for any horizon from its current state.
+
+class _ErrorScale:
+    """Bias-corrected exponentially weighted mean of squared one-step errors"""
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.weight = 0.0
+
+    def update(self, squared_error):
+        self.mean = (1 - self.alpha) * self.mean + self.alpha * squared_error
+        self.weight = (1 - self.alpha) * self.weight + self.alpha
+
+    @property
+    def variance(self):
+        return self.mean / self.weight if self.weight else np.nan
+
+class EWMA:
+    """Exponentially weighted level (simple exponential smoothing)"""
+    def __init__(self, alpha=0.2, error_alpha=0.05):
+        self.alpha = alpha
+        self.level = None
+        self.errors = _ErrorScale(error_alpha)
+
+    def update(self, y):
+        """Absorb y; returns the one-step forecast that was made for it"""
+        if self.level is None:
+            self.level = y
+            return np.nan
+        predicted = self.level
+        error = y - predicted
+        self.errors.update(error**2)
+        self.level += self.alpha * error
+        return predicted
+
+    def forecast(self, horizon):
+        steps = np.arange(horizon)
+        std = np.sqrt(self.errors.variance * (1 + steps * self.alpha**2))
+        return np.full(horizon, np.nan if self.level is None else self.level), std
+
+class RecursiveLeastSquares:
+    """
+    AR(n_lags) model with intercept, re-estimated by recursive least squares.
+
+    forgetting < 1 discounts old observations so the coefficients track
+    regime changes. With difference=True (the default, suited to prices) the
+    model is fitted to period-on-period changes and forecasts are cumulated.
+    """
+    def __init__(self, n_lags=3, forgetting=0.995, delta=1000.0, difference=True, error_alpha=0.05):
+        self.n_lags = n_lags
+        self.forgetting = forgetting
+        self.difference = difference
+        self.theta = np.zeros(n_lags + 1)
+        self.P = np.eye(n_lags + 1) * delta
+        self.x = np.zeros(n_lags + 1)  # regressors: 1, then lagged values newest first
+        self.x[0] = 1.0
+        self.seen = 0
+        self.last = None
+        self.errors = _ErrorScale(error_alpha)
+
+    def update(self, y):
+        """Absorb y; returns the one-step forecast that was made for it (NaN while warming up)"""
+        if self.difference:
+            if self.last is None:
+                self.last = y
+                return np.nan
+            target, base, self.last = y - self.last, self.last, y
+        else:
+            target, base = y, 0.0
+
+        predicted = np.nan
+        if self.seen >= self.n_lags:
+            x = self.x
+            estimate = x @ self.theta
+            error = target - estimate
+            Px = self.P @ x
+            denominator = self.forgetting + x @ Px
+            self.theta += Px / denominator * error
+            P = (self.P - np.outer(Px, Px) / denominator) / self.forgetting
+            self.P = (P + P.T) / 2  # rounding would otherwise break symmetry and blow up
+            self.errors.update(error**2)
+            predicted = base + estimate
+        self.x[2:] = self.x[1:-1]
+        self.x[1] = target
+        self.seen += 1
+        return predicted
+
+    def forecast(self, horizon):
+        intercept, phi = self.theta[0], self.theta[1:]
+        lags = self.x[1:].copy()
+        path = np.empty(horizon)
+        psi = np.zeros(horizon)  # MA(infinity) weights of the fitted AR
+        for h in range(horizon):
+            path[h] = intercept + phi @ lags
+            lags = np.r_[path[h], lags[:-1]]
+            psi[h] = 1.0 if h == 0 else phi[:min(h, self.n_lags)] @ psi[h - 1::-1][:self.n_lags]
+        if self.difference:
+            path = self.last + np.cumsum(path)
+            psi = np.cumsum(psi)
+        std = np.sqrt(self.errors.variance * np.cumsum(psi**2))
+        return path, std
+
+class KalmanTrend:
+    """
+    Local level (trend=False) or local linear trend model, Kalman-filtered.
+
+    level_noise and trend_noise are the state noise variances relative to
+    the observation noise, which sets how fast level and slope adapt; the
+    noise scale itself is estimated online from the standardised innovations.
+    """
+    def __init__(self, trend=True, level_noise=0.1, trend_noise=0.001, error_alpha=0.05):
+        k = 2 if trend else 1
+        self.F = np.array([[1.0, 1.0], [0.0, 1.0]])[:k, :k]
+        self.Q = np.diag([level_noise, trend_noise][:k])
+        self.x = None
+        self.P = None
+        self.errors = _ErrorScale(error_alpha)
+
+    def update(self, y):
+        """Absorb y; returns the one-step forecast that was made for it"""
+        if self.x is None:
+            self.x = np.zeros(len(self.F))
+            self.x[0] = y
+            self.P = np.eye(len(self.F)) * 1e6  # diffuse start
+            return np.nan
+        x = self.F @ self.x
+        P = self.F @ self.P @ self.F.T + self.Q
+        innovation = y - x[0]
+        S = P[0, 0] + 1.0
+        gain = P[:, 0] / S
+        self.x = x + gain * innovation
+        P = P - np.outer(gain, P[0])
+        self.P = (P + P.T) / 2
+        self.errors.update(innovation**2 / S)
+        return x[0]
+
+    def forecast(self, horizon):
+        if self.x is None:
+            return np.full(horizon, np.nan), np.full(horizon, np.nan)
+        x, P = self.x, self.P
+        path, variance = np.empty(horizon), np.empty(horizon)
+        for h in range(horizon):
+            x = self.F @ x
+            P = self.F @ P @ self.F.T + self.Q
+            path[h], variance[h] = x[0], P[0, 0] + 1.0
+        return path, np.sqrt(self.errors.variance * variance)
+
+def default_models():
+    return {'ewma': EWMA(), 'rls': RecursiveLeastSquares(), 'kalman': KalmanTrend()}
+
+# ===== Streaming Pipeline =====
+class OnlineForecaster:
+    """
+    Forecasts that update with every observation of a stream.
+
+    Each observation goes into a fixed-size RingBuffer (the recent window,
+    e.g. for charts) and into every online model, all in O(1), so memory
+    stays constant however long the stream runs.
+
+    Parameters:
+    models: {name: online model}; default EWMA, recursive least squares
+            and a Kalman local linear trend
+    window: observations kept in the ring buffer
+    """
+    def __init__(self, models=None, window=1000, horizon=5, quantiles=None):
+        self.models = default_models() if models is None else models
+        self.buffer = RingBuffer(window)
+        self.horizon = horizon
+        self.quantiles = quantiles
+        self.tz = None
+        self.last_time = None
+        self.errors = {name: _ErrorScale() for name in self.models}
+
+    def update(self, timestamp, value):
+        """Absorb one observation; returns each model's one-step forecast for it"""
+        timestamp = pd.Timestamp(timestamp)
+        self.tz = timestamp.tz
+        value = float(value)
+        if self.last_time is not None and timestamp.value <= self.last_time:
+            raise ValueError("Observations must arrive in time order")
+        self.last_time = timestamp.value
+        self.buffer.append(timestamp.value, value)
+        instrumentation.count('stream_observations')
+        predictions = {}
+        for name, model in self.models.items():
+            predictions[name] = model.update(value)
+            if not np.isnan(predictions[name]):
+                self.errors[name].update((value - predictions[name])**2)
+        return predictions
+
+    def _step(self):
+        """Bar spacing: the smallest recent gap, so session breaks don't stretch it"""
+        times = self.buffer.last(6)[0]
+        gaps = np.diff(times)
+        gaps = gaps[gaps > 0]
+        return int(gaps.min()) if len(gaps) else pd.Timedelta('1min').value
+
+    def forecast(self, horizon=None, quantiles=None):
+        """{model: frame of date, forecast and q<level> columns} from the current state"""
+        horizon = self.horizon if horizon is None else horizon
+        quantiles = self.quantiles if quantiles is None else quantiles
+        if self.last_time is None:
+            raise ValueError("No observations yet")
+        dates = pd.to_datetime(self.last_time + self._step() * np.arange(1, horizon + 1), utc=self.tz is not None)
+        if self.tz is not None:
+            dates = dates.tz_convert(self.tz)
+        columns = quantile_columns(quantiles)
+        z = np.array([NormalDist().inv_cdf(q) for q in check_quantiles(quantiles)])
+        frames = {}
+        for name, model in self.models.items():
+            point, std = model.forecast(horizon)
+            # One constructor call per frame; adding columns one by one costs more than the models
+            data = {'date': dates, 'forecast': point}
+            data.update(zip(columns, point + z[:, None] * std))
+            frames[name] = pd.DataFrame(data)
+        return frames
+
+    def recent(self):
+        """The ring buffer's window as a Series, oldest first"""
+        times, values = self.buffer.ordered()
+        index = pd.to_datetime(times, utc=self.tz is not None)
+        return pd.Series(values, index=index if self.tz is None else index.tz_convert(self.tz))
+
+    def rmse(self):
+        """Exponentially weighted one-step RMSE per model"""
+        return {name: float(np.sqrt(e.variance)) for name, e in self.errors.items()}
+
+    def run(self, bars, emit_every=1):
+        """
+        Consume (timestamp, value) bars and yield, every emit_every bars,
+        {'timestamp', 'value', 'forecasts': {model: frame}}.
+        """
+        check_quantiles(self.quantiles)
+        for i, (timestamp, value) in enumerate(bars, 1):
+            self.update(timestamp, value)
+            if i % emit_every == 0:
+                yield {'timestamp': pd.Timestamp(timestamp), 'value': float(value),
+                       'forecasts': self.forecast()}
+
+# ===== Sources =====
+def bars_from_frame(df, column='Close'):
+    """Replay a price history frame (e.g. yfinance history) as (timestamp, value) bars"""
+    yield from zip(df.index, df[column].to_numpy(dtype=float))
+
+def yahoo_bars(ticker, interval='1m', column='Close', period='1d', poll_seconds=60, max_polls=None):
+    """
+    Poll Yahoo Finance and yield each new (timestamp, value) bar once.
+
+    Every poll fetches only the short `period` window and keeps nothing but
+    the newest timestamp seen, so the generator runs indefinitely in
+    constant memory.
+    """
+    import yfinance as yf
+    stock = yf.Ticker(ticker)
+    newest = None
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        history = stock.history(period=period, interval=interval)
+        polls += 1
+        if history is not None and len(history):
+            fresh = history if newest is None else history[history.index > newest]
+            if len(fresh):
+                newest = fresh.index[-1]
+                yield from bars_from_frame(fresh, column)
+        if max_polls is None or polls < max_polls:
+            time.sleep(poll_seconds)
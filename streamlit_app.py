@@ -1,8 +1,10 @@
 # streamlit_app.py
 
 import streamlit as st
-import pandas as pd
 from forecasting_engine import run_forecasting_model  # Your function from forecasting_engine.py
+from data_ingestion import load_file_streaming
+from model_cache import fingerprint
+from result_store import ForecastResultStore
 
 st.set_page_config(page_title="Forecasting AI", layout="wide")
 
@@ -11,12 +13,12 @@ st.title("📊 AI-Powered Forecasting Dashboard")
 uploaded_file = st.file_uploader("Upload your CSV file", type=["csv", "xlsx", "json"])
 
 if uploaded_file:
-    if uploaded_file.name.endswith('.csv'):
-        df = pd.read_csv(uploaded_file)
-    elif uploaded_file.name.endswith('.xlsx'):
-        df = pd.read_excel(uploaded_file)
-    elif uploaded_file.name.endswith('.json'):
-        df = pd.read_json(uploaded_file)
+    # Stream the upload in chunks with narrow dtypes instead of one big read
+    try:
+        df = load_file_streaming(uploaded_file)
+    except ValueError as e:
+        st.error(f"Invalid data file: {e}")
+        st.stop()
     
     st.write("📁 Uploaded Data Preview:")
     st.dataframe(df.head())
@@ -24,10 +26,16 @@ if uploaded_file:
     st.markdown("---")
     st.write("🔮 Forecasting Results:")
     
-    # Forecast and show results
-    forecast_df, model_used, metrics = run_forecasting_model(df, target_col='sales')
+    # Forecast once per uploaded dataset; reruns and later sessions reload the stored run
+    store = ForecastResultStore()
+    run_id = f"app-{fingerprint(df)}"
+    if run_id not in store:
+        forecast_df, model_used, metrics = run_forecasting_model(df, target_col='sales')
+        store.write({'sales': forecast_df}, run_id, metrics={'sales': metrics}, model=model_used)
+    forecast_df = store.read_frame(run_id, 'sales')
+    model_used = store.info(run_id)['models'][0]
+    metrics = store.metrics(run_id).drop(columns='series').iloc[0].to_dict()
 
-    
     st.success(f"Model Used: {model_used}")
     st.dataframe(forecast_df.tail())
 
@@ -36,6 +44,8 @@ if uploaded_file:
 
     st.markdown("📏 Evaluation Metrics:")
     st.write(metrics)
+    st.download_button("Download Forecast", lambda: store.csv_file(run_id), "forecast_results.csv",
+                       mime="text/csv")
 
 else:
     st.info("Please upload a data file to begin.")
@@ -1,6 +1,39 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from forecasting_engine import forecast
+from forecasting_engine import forecast, forecast_many, evaluate_models
+from data_cleaning import clean_data
+from model_cache import ModelCache
+from incremental import IncrementalModel
+from backtesting import backtest, score_backtest
+from profiling import profile_panel, select_models
 import pandas as pd
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import data_ingestion
+from http_cache import ResponseCache
+from timeseries_store import TimeSeriesStore
+from forecast_service import ForecastService, make_handler
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import model_registry
+from model_registry import REGISTRY, ModelRegistry, ModelSpec
+from hierarchy import Hierarchy, forecast_hierarchy
+from global_model import lag_features
+from scenarios import ScenarioEngine, scenario_frames
+from delphi import DelphiStore
+from benchmarks import synthetic_panel, run_benchmarks, compare_results
+import instrumentation
+import io
+from streaming import OnlineForecaster, RecursiveLeastSquares, bars_from_frame, yahoo_bars
+from result_store import ForecastResultStore
 
 class TestForecasting(unittest.TestCase):
     def test_arima_forecast(self):
@@ -8,9 +41,650 @@ class TestForecasting(unittest.TestCase):
             'date': pd.date_range(start='2020-01-01', periods=100),
             'target': range(100)
         })
-        result = forecast(test_data, model_type='arima')
+        result, model_type = forecast(test_data, model_type='arima', quantiles=(0.1, 0.9))
         self.assertEqual(len(result), 30)
+        self.assertEqual(model_type, 'arima')
+        self.assertEqual(result['date'].iloc[0], pd.Timestamp('2020-04-10'))
+        self.assertTrue((result['q0.1'] < result['forecast']).all())
+        self.assertTrue((result['forecast'] < result['q0.9']).all())
     
+    def test_forecast_many_isolates_failures(self):
+        dates = pd.date_range(start='2020-01-01', periods=40)
+        long_df = pd.DataFrame({
+            'series_id': ['a'] * 40 + ['b'] * 40,
+            'date': list(dates) * 2,
+            'value': list(range(40)) + list(range(40, 0, -1))
+        })
+        results = list(forecast_many(long_df, model_type='moving_average', n_jobs=2))
+        self.assertEqual([r[0] for r in results], ['a', 'b'])
+        self.assertTrue(all(r[3] is None for r in results))
+
+        broken = {'ok': long_df.iloc[:40].set_index('date')[['value']].rename(columns={'value': 'target'}),
+                  'bad': pd.DataFrame({'other': [1.0, 2.0]})}
+        results = dict((r[0], r) for r in forecast_many(broken, model_type='moving_average', n_jobs=1))
+        self.assertIsNone(results['ok'][3])
+        self.assertIsNotNone(results['bad'][3])
+
+    def test_model_cache_reuses_fits(self):
+        data = pd.DataFrame({'target': [float(i % 7) for i in range(60)]},
+                            index=pd.date_range('2020-01-01', periods=60, name='date'))
+        cache = ModelCache(max_items=1)
+        first, _ = forecast(data, model_type='moving_average', cache=cache)
+        second, _ = forecast(data, model_type='moving_average', cache=cache)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        forecast(data, model_type='moving_average', cache=cache, window=5)
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(len(cache), 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = ModelCache(max_items=1, disk_dir=tmp, max_disk_bytes=1)
+            disk.put('a', 'x' * 10)
+            self.assertEqual(os.listdir(tmp), [])
+
+            # Files evicted by another process between listing and stat/remove are skipped
+            shared = ModelCache(disk_dir=tmp, max_disk_bytes=1)
+            with mock.patch('model_cache.os.stat', side_effect=FileNotFoundError):
+                shared.put('b', 'y')
+            with mock.patch('model_cache.os.remove', side_effect=FileNotFoundError):
+                shared.put('c', 'z' * 10)
+            with mock.patch('model_cache.pickle.load', side_effect=FileNotFoundError):
+                self.assertIsNone(ModelCache(disk_dir=tmp).get('c'))
+
+    def test_incremental_update_extends_without_refit(self):
+        idx = pd.date_range('2015-01-01', periods=120, freq='MS')
+        values = 10 + 3 * np.sin(np.arange(120) * 2 * np.pi / 12) + np.linspace(0, 2, 120)
+        data = pd.DataFrame({'target': values}, index=idx)
+
+        model = IncrementalModel('exponential_smoothing', refit_every=24).fit(data.iloc[:96])
+        fitted = model.update(data.iloc[96:108])
+        self.assertEqual(len(fitted), 12)
+        self.assertEqual(model.refits, 1)
+        self.assertEqual(len(model.forecast(6)), 6)
+
+        model.update(data.iloc[108:])
+        self.assertEqual(model.refits, 2)
+        with self.assertRaises(ValueError):
+            model.update(data.iloc[-1:])
+
+    def test_tournament_prunes_losing_models(self):
+        data = pd.DataFrame({'target': np.sin(np.arange(400) / 5) + np.arange(400) * 0.01},
+                            index=pd.date_range('2020-01-01', periods=400, name='date'))
+        results = evaluate_models(data, tournament=True, n_jobs=2,
+                                  candidates=['moving_average', 'arima'], prune_margin=-0.99)
+        self.assertEqual(list(results.index), ['moving_average', 'arima'])
+        self.assertEqual(results.loc['moving_average', 'status'], 'ok')
+        self.assertEqual(results.loc['arima', 'status'], 'pruned')
+
+    def test_tournament_budget_starts_per_job(self):
+        from intervals import forecast_frame
+
+        def sleepy(seconds):
+            def run(df, target_col='target', horizon=30, quantiles=None):
+                time.sleep(seconds)
+                return forecast_frame(df.index, np.full(horizon, df[target_col].iloc[-1]))
+            return run
+
+        data = pd.DataFrame({'target': np.arange(100.0)}, index=pd.date_range('2020-01-01', periods=100, name='date'))
+        specs = {'stuck': ModelSpec('stuck', sleepy(60)), 'queued': ModelSpec('queued', sleepy(0.2))}
+        start = time.monotonic()
+        with mock.patch.dict(REGISTRY._specs, specs):
+            # One worker: 'queued' waits behind 'stuck' and still gets its own full budget
+            results = evaluate_models(data, tournament=True, n_jobs=1, time_budget=2,
+                                      candidates=['moving_average', 'stuck', 'queued'])
+        self.assertEqual(results['status'].tolist(), ['ok', 'timeout', 'ok'])
+        self.assertLess(time.monotonic() - start, 30)  # the stuck fit was killed, not waited for
+
+    def test_backtest_returns_tidy_fold_horizon_frame(self):
+        data = pd.DataFrame({'date': pd.date_range('2020-01-01', periods=100),
+                             'target': np.arange(100, dtype=float) + 1})
+        results = backtest(data, models=('moving_average',), horizon=5, n_folds=3, n_jobs=1)
+        self.assertEqual(len(results), 3 * 5)
+        self.assertEqual(sorted(results['fold'].unique()), [0, 1, 2])
+
+        # A 3-point moving average on a unit-slope line lags by 2 at step 1
+        scores = score_backtest(results, by=('model', 'horizon'))
+        self.assertAlmostEqual(scores.loc[('moving_average', 1), 'MAE'], 2.0)
+        self.assertAlmostEqual(scores.loc[('moving_average', 5), 'RMSE'], 6.0)
+
+        with self.assertRaises(ValueError):
+            backtest(data, models=('arima',), horizon=5, window='sliding', train_size=50, incremental=True)
+
+    def test_baseline_panel_matches_single_series(self):
+        dates = pd.date_range('2020-01-01', periods=24, freq='MS')
+        long_df = pd.DataFrame({'series_id': np.repeat(['a', 'b'], 24),
+                                'date': np.tile(dates, 2),
+                                'value': np.r_[np.arange(24.0), np.arange(24.0) ** 2]})
+        batched = list(forecast_many(long_df, model_type='drift'))
+        single, _ = forecast(long_df.iloc[24:].set_index('date')[['value']].rename(columns={'value': 'target'}),
+                             model_type='drift', cache=False)
+        self.assertEqual(batched[1][0], 'b')
+        np.testing.assert_allclose(batched[1][1]['forecast'], single['forecast'])
+        self.assertEqual(single['date'].iloc[0], pd.Timestamp('2022-01-01'))
+
+        # A failing panel call falls back to per-series forecasts, each reporting its own error
+        short = {k: pd.DataFrame({'target': np.arange(6.0)}, index=pd.date_range('2020-01-01', periods=6, name='date'))
+                 for k in ('x', 'y')}
+        results = list(forecast_many(short, model_type='seasonal_naive', n_jobs=1))
+        self.assertEqual([r[0] for r in results], ['x', 'y'])
+        self.assertTrue(all('shorter than one season' in r[3] for r in results))
+
+    def test_profile_panel_drives_model_selection(self):
+        t = np.arange(200)
+        Y = np.vstack([np.sin(t * 2 * np.pi / 12),           # seasonal
+                       np.sin(t * 2 * np.pi / 12) + t * 0.05,  # seasonal + trend
+                       np.zeros(200)])                        # flat, intermittent
+        profiles = profile_panel(Y)
+        self.assertEqual(profiles.loc[0, 'seasonal_period'], 12)
+        self.assertEqual(profiles.loc[2, 'intermittency'], 1.0)
+        self.assertEqual(list(select_models(profiles)),
+                         ['exponential_smoothing', 'prophet', 'prophet'])
+
+    def _start_stub_server(self, hits):
+        """Local HTTP server serving a Trendlyne-like page with an ETag"""
+        class StubHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                hits[self.path] = hits.get(self.path, 0) + 1
+                if 'FLAKY' in self.path and hits[self.path] == 1:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                if self.headers.get('If-None-Match') == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = b'<div class="card-body"><p class="card-title">PE</p><p class="card-text">21</p></div>'
+                self.send_response(200)
+                self.send_header('ETag', '"v1"')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        original_url = data_ingestion.TRENDLYNE_URL
+        data_ingestion.TRENDLYNE_URL = f"http://127.0.0.1:{server.server_port}/equity/{{ticker}}/"
+        self.addCleanup(setattr, data_ingestion, 'TRENDLYNE_URL', original_url)
+
+    def test_load_data_many_against_stub_server(self):
+        hits = {}
+        self._start_stub_server(hits)
+        results = data_ingestion.load_data_many('trendlyne', ['TCS', 'INFY', 'FLAKY'], rate_per_host=50,
+                                                cache=ResponseCache(':memory:'))
+        self.assertEqual(list(results), ['TCS', 'INFY', 'FLAKY'])
+        self.assertEqual(results['FLAKY'].iloc[0].to_dict(), {'metric': 'PE', 'value': '21'})
+        self.assertEqual(hits['/equity/FLAKY/'], 2)
+
+    def test_response_cache_revalidates_with_etag(self):
+        hits = {}
+        self._start_stub_server(hits)
+        cache = ResponseCache(':memory:', ttls={}, default_ttl=3600)
+        url = data_ingestion.TRENDLYNE_URL.format(ticker='TCS')
+        first = data_ingestion.safe_request(url, cache=cache)
+        data_ingestion.safe_request(url, cache=cache)
+        self.assertEqual(hits['/equity/TCS/'], 1)  # second call served fresh from cache
+
+        cache.default_ttl = 0
+        revalidated = data_ingestion.safe_request(url, cache=cache)
+        self.assertEqual(hits['/equity/TCS/'], 2)
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertEqual(revalidated.content, first.content)
+
+    def test_timeseries_store_ingests_once_and_reads_slices(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = TimeSeriesStore(os.path.join(tmp, 'store'))
+            csv_path = os.path.join(tmp, 'financials.csv')
+            data_ingestion.generate_sample_data().to_csv(csv_path, index=False)
+
+            first = data_ingestion.load_data('csv', file_path=csv_path, store=store)
+            self.assertEqual(len(store.manifest()), 1)
+            second = data_ingestion.load_data('csv', file_path=csv_path, store=store)
+            pd.testing.assert_frame_equal(first, second, check_dtype=False)
+
+            prices = pd.DataFrame({'Close': np.arange(800.0), 'Open': np.arange(800.0)},
+                                  index=pd.date_range('2020-01-01', periods=800, name='Date'))
+            store.write(prices, 'yahoo', 'TCS')
+            store.write(prices.iloc[-1:] * 0, 'yahoo', 'TCS')  # merge replaces the last day
+            window = store.read_series('yahoo', 'TCS', 'Close', start='2021-01-01', end='2021-01-31')
+            self.assertEqual(list(window.columns), ['Close'])
+            self.assertEqual(len(window), 31)
+            self.assertEqual(store.read('yahoo', 'TCS')['Close'].iloc[-1], 0)
+
+            # Undated snapshots share the ingestion day; a re-ingest replaces that day's rows as a whole
+            news = pd.DataFrame({'headline': ['a', 'b', 'c'], 'score': [1.0, 2.0, 3.0]})
+            store.write(news, 'news', 'TCS')
+            store.write(news, 'news', 'TCS')
+            self.assertEqual(store.read('news', 'TCS')['headline'].tolist(), ['a', 'b', 'c'])
+
+    def test_streaming_loader_aggregates_chunks(self):
+        rows = pd.DataFrame({'date': pd.date_range('2023-01-01', periods=1000, freq='h'),
+                             'store': np.tile(['north', 'south'], 500),
+                             'sales': np.arange(1000.0)})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sales.csv')
+            rows.to_csv(path, index=False)
+            daily = data_ingestion.load_file_streaming(path, chunksize=77, id_col='store', freq='D')
+            raw = data_ingestion.load_file_streaming(path, chunksize=77, id_col='store')
+
+            pd.DataFrame({'date': ['2023-01-01'], 'other': [1]}).to_csv(path, index=False)
+            with self.assertRaises(ValueError):
+                data_ingestion.load_file_streaming(path)
+
+        expected = rows.groupby(['store', pd.Grouper(key='date', freq='D')])['sales'].sum()
+        np.testing.assert_allclose(daily['sales'], expected.to_numpy(), rtol=1e-6)
+        self.assertEqual(raw['sales'].dtype, np.float32)
+        self.assertEqual(raw['store'].dtype, 'category')
+        self.assertEqual(len(raw), 1000)
+
+    def test_clean_data_scaler_round_trip_and_updates(self):
+        df = pd.DataFrame({'date': pd.to_datetime(['2023-01-01', '2023-01-02', '2023-01-04', '2023-01-05']),
+                           'target': [10.0, np.nan, 40.0, np.nan]})
+        cleaned, scaler = clean_data(df, return_scaler=True)
+        self.assertIsInstance(cleaned.index, pd.DatetimeIndex)
+        # time-weighted fill: one day of a three-day gap; trailing gap takes the last value
+        np.testing.assert_allclose(scaler.inverse_transform(cleaned['target'], 'target'), [10, 20, 40, 40])
+        self.assertTrue(df['target'].isna().any())  # input left untouched
+
+        scaler.partial_fit(pd.DataFrame({'target': [50.0, 60.0]}))
+        full = pd.Series([10.0, 20, 40, 40, 50, 60])
+        self.assertAlmostEqual(scaler.mean['target'], full.mean())
+        self.assertAlmostEqual(scaler.std('target'), full.std())
+
+        output, _ = forecast(df, model_type='naive', cache=False)
+        self.assertEqual(output['forecast'].iloc[0], 40.0)
+
+    def test_forecast_service_batches_concurrent_requests(self):
+        service = ForecastService(cache=ModelCache(), max_wait=0.05)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(service))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(service.close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}"
+
+        def post(body):
+            request = urllib.request.Request(f"{url}/forecast", json.dumps(body).encode(),
+                                             {'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+
+        dates = pd.date_range('2023-01-01', periods=40).astype(str).tolist()
+        bodies = [{'model_type': 'drift', 'data': {'date': dates, 'target': list(np.arange(40.0) * k)}}
+                  for k in range(1, 9)]
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(post, bodies))
+        self.assertEqual([r['forecast'][0] for r in results], [40.0 * k for k in range(1, 9)])
+        self.assertEqual(results[0]['dates'][0], '2023-02-10')
+
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            post({'model_type': 'nope', 'data': {'target': [1.0]}})
+        self.assertEqual(ctx.exception.code, 400)
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            post([1, 2, 3])
+        self.assertEqual(ctx.exception.code, 400)
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            post({**bodies[0], 'quantiles': [1.5]})
+        self.assertEqual(ctx.exception.code, 400)
+
+        with urllib.request.urlopen(f"{url}/stats") as response:
+            stats = json.loads(response.read())
+        self.assertEqual(stats['latency']['drift']['count'], 8)
+        self.assertLess(stats['batches'], 8)
+
+        # Cross-series models are never batched: one client's forecast ignores other clients' series
+        idx = pd.date_range('2023-01-01', periods=80, name='date')
+        a = pd.DataFrame({'target': 50 + 10 * np.sin(np.arange(80) / 4)}, index=idx)
+        b = pd.DataFrame({'target': np.arange(80.0) ** 1.5}, index=idx)
+        futures = [service.submit(a, 'global_gbm', horizon=5), service.submit(b, 'global_gbm', horizon=5)]
+        alone, _ = forecast(a, 'global_gbm', cache=False, horizon=5)
+        np.testing.assert_allclose(futures[0].result(timeout=60)[0]['forecast'], alone['forecast'])
+
+        # A batch that fails as a whole answers every caller at once
+        with mock.patch('forecast_service.forecast_many', side_effect=ValueError("panel failed")):
+            future = service.submit(pd.DataFrame({'target': np.arange(40.0)}), 'drift')
+            with self.assertRaises(ValueError):
+                future.result(timeout=5)
+
+    def test_model_registry_is_lazy_and_pluggable(self):
+        check = "import sys, forecasting_engine; print('statsmodels' in sys.modules, 'prophet' in sys.modules)"
+        imported = subprocess.run([sys.executable, '-c', check], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(imported.stdout.split(), ['False', 'False'])
+
+        self.assertIn('drift', REGISTRY.names(batched=True))
+        self.assertNotIn('arima', REGISTRY.names(batched=True))
+        self.assertTrue(REGISTRY['arima'].incremental)
+
+        plugin = mock.Mock()
+        plugin.name = 'last_value'
+        plugin.load.return_value = ModelSpec('last_value', 'baselines:run_baseline', batched=True)
+        registry = ModelRegistry()
+        with mock.patch.object(model_registry, 'entry_points', return_value=[plugin]):
+            self.assertIn('last_value', registry)
+        df = pd.DataFrame({'target': [1.0, 2.0, 3.0]})
+        self.assertEqual(registry['last_value'](df, 'target', horizon=2)['forecast'].tolist(), [3.0, 3.0])
+
+    def test_panel_intervals_match_single_series_and_widen(self):
+        rng = np.random.default_rng(3)
+        dates = pd.date_range('2021-01-01', periods=60)
+        values = rng.normal(size=(3, 60)).cumsum(axis=1) + 50
+        long_df = pd.DataFrame({'series_id': np.repeat(['a', 'b', 'c'], 60),
+                                'date': np.tile(dates, 3), 'value': values.ravel()})
+        batched = {r[0]: r[1] for r in forecast_many(long_df, model_type='naive', horizon=10,
+                                                    quantiles=(0.1, 0.9))}
+        single, _ = forecast(pd.DataFrame({'target': values[1]}, index=dates.rename('date')),
+                             model_type='naive', horizon=10, quantiles=(0.1, 0.9), cache=False)
+        self.assertEqual(list(batched['b'].columns), ['date', 'forecast', 'q0.1', 'q0.9'])
+        self.assertAlmostEqual(batched['b']['forecast'].iloc[0], values[1, -1])
+        width = (batched['b']['q0.9'] - batched['b']['q0.1']).to_numpy()
+        self.assertGreater(width[-1], 2 * width[0])  # random-walk errors accumulate
+        np.testing.assert_allclose(single['q0.9'], batched['b']['q0.9'], rtol=0.1)
+
+    def test_hierarchy_reconciliation_is_coherent(self):
+        keys = pd.DataFrame({'region': ['North', 'North', 'South'], 'product': ['a', 'b', 'a']})
+        tree = Hierarchy.from_tree({'profit': {'revenue': 1, 'expenses': -1}})
+        hierarchy = tree.cross(Hierarchy.from_levels(keys))
+        self.assertEqual(hierarchy.nodes[0], 'profit/total')
+        self.assertEqual(len(hierarchy.leaves), 6)
+
+        rng = np.random.default_rng(0)
+        dates = pd.date_range('2023-01-01', periods=24, freq='MS')
+        rows = [{'metric': metric, 'region': r, 'product': p, 'date': d, 'value': v}
+                for metric, scale in [('revenue', 100), ('expenses', 60)]
+                for r, p in keys.itertuples(index=False)
+                for d, v in zip(dates, scale + rng.normal(0, 5, 24).cumsum())]
+        data = pd.DataFrame(rows)
+        for method in ['bottom_up', 'top_down', 'ols', 'wls', 'mint']:
+            result = forecast_hierarchy(data, hierarchy, ['metric', 'region', 'product'],
+                                        model_type='drift', horizon=6, method=method)
+            leaves = result.loc[hierarchy.leaves].to_numpy()
+            np.testing.assert_allclose(hierarchy.aggregate(leaves), result.to_numpy(), atol=1e-8)
+        np.testing.assert_allclose(result.loc['profit/North'],
+                                   result.loc['revenue/North'] - result.loc['expenses/North'])
+
+        # Models without a panel form get the caller's parameters too
+        with mock.patch('hierarchy.forecast_many', wraps=forecast_many) as many:
+            forecast_hierarchy(data, hierarchy, ['metric', 'region', 'product'], model_type='exponential_smoothing',
+                               horizon=6, method='ols', n_jobs=1, seasonal_periods=4)
+        self.assertEqual(many.call_args.kwargs['seasonal_periods'], 4)
+
+    def test_global_model_features_and_panel_forecast(self):
+        series = pd.Series(np.arange(40.0) ** 1.5)
+        features = lag_features(series.to_numpy(), lags=(1, 7), windows=(3,))
+        expected = pd.DataFrame({'lag1': series.shift(1), 'lag7': series.shift(7),
+                                 'mean3': series.shift(1).rolling(3).mean(),
+                                 'std3': series.shift(1).rolling(3).std(ddof=0)}).iloc[7:]
+        np.testing.assert_allclose(features[0, :-1], expected.to_numpy())
+
+        rng = np.random.default_rng(0)
+        t = np.arange(150)
+        panel = {f"s{i}": pd.DataFrame({'target': 20 + i + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 0.1, 150)},
+                                       index=pd.date_range('2022-01-01', periods=150, name='date'))
+                 for i in range(12)}
+        history = {k: v.iloc[:-14] for k, v in panel.items()}
+        results = {r[0]: r for r in forecast_many(history, model_type='global_gbm', horizon=14,
+                                                  quantiles=(0.1, 0.9))}
+        self.assertTrue(all(r[3] is None for r in results.values()))
+        errors = [np.abs(results[k][1]['forecast'].to_numpy() - panel[k]['target'].iloc[-14:].to_numpy()).mean()
+                  for k in panel]
+        self.assertLess(np.mean(errors), 0.5)  # tracks the weekly cycle (amplitude 3)
+        self.assertTrue((results['s0'][1]['q0.9'] > results['s0'][1]['q0.1']).all())
+
+    def test_scenario_engine_bands_match_simulated_paths(self):
+        engine = ScenarioEngine.from_multipliers(1.3, 1.05, 0.85, horizon=24, n_paths=4000)
+        trajectories = np.vstack([np.linspace(100, 130, 24), -np.linspace(50, 60, 24)])
+        loadings = {0: {'growth': 1, 'demand': 0.5}, 1: {'cost_inflation': 1}}
+        bands = engine.bands(trajectories, loadings, (0.1, 0.5, 0.9))
+        paths = engine.simulate(trajectories, loadings)
+        np.testing.assert_allclose(bands, np.quantile(paths, (0.1, 0.5, 0.9), axis=2))
+
+        single = engine.bands(np.full(24, 100.0), quantiles=(0.1, 0.5, 0.9))[:, -1]
+        np.testing.assert_allclose(single, [85, 105, 130], rtol=0.03)
+
+        frames = {'revenue': pd.DataFrame({'date': pd.date_range('2024-01-31', periods=24, freq='ME'),
+                                           'forecast': trajectories[0]})}
+        result = scenario_frames(frames, engine)['revenue']
+        self.assertEqual(list(result.columns), ['date', 'forecast', 'q0.1', 'q0.5', 'q0.9'])
+        self.assertTrue((result['date'] == frames['revenue']['date']).all())
+        with self.assertRaises(ValueError):
+            ScenarioEngine.from_multipliers(0.9, 1.0, 1.1)
+
+        # Re-reading the sliders reuses the draws and leaves the original engine untouched
+        moved = engine.with_multipliers(1.5, 1.1, 0.9)
+        self.assertIs(moved._levels, engine._levels)
+        self.assertEqual(engine.drift, np.log(1.05) / 24)
+        rebuilt = ScenarioEngine.from_multipliers(1.5, 1.1, 0.9, horizon=24, n_paths=4000)
+        np.testing.assert_allclose(moved.bands(trajectories[0]), rebuilt.bands(trajectories[0]))
+
+    def test_delphi_store_running_stats_and_convergence(self):
+        rng = np.random.default_rng(0)
+        values, weights = rng.normal(100, 10, 300), rng.uniform(0.2, 1, 300)
+        store = DelphiStore()
+        for i in range(300):
+            store.submit(f"analyst{i}", values[i], weights[i], metric='revenue')
+        values[:100] = rng.normal(100, 2, 100)
+        for i in range(100):  # revised submissions replace the old ones
+            store.submit(f"analyst{i}", values[i], weights[i], metric='revenue')
+        stats = store.round('revenue').stats()
+        self.assertEqual(stats['experts'], 300)
+        self.assertAlmostEqual(stats['weighted_mean'], np.average(values, weights=weights))
+        self.assertAlmostEqual(stats['std'], np.sqrt(np.cov(values, aweights=weights, ddof=0)))
+        self.assertAlmostEqual(stats['median'], np.median(values))
+        self.assertFalse(store.converged('revenue'))
+
+        store.next_round()
+        store.submit_many(pd.DataFrame({'expert': [f"analyst{i}" for i in range(300)],
+                                        'value': rng.normal(100, 1, 300), 'metric': 'revenue'}))
+        self.assertEqual(store.rounds('revenue'), [1, 2])
+        self.assertTrue(store.converged('revenue'))
+        self.assertEqual(len(store.summary()), 2)
+
+    def test_benchmark_harness_flags_regressions(self):
+        panel = synthetic_panel(4, 56, freq='W', season_length=4, noise=0, missing=0.1, seed=1)
+        self.assertEqual(panel.shape, (56, 4))
+        self.assertEqual(pd.infer_freq(panel.index), 'W-SUN')
+        self.assertAlmostEqual(panel.isna().to_numpy().mean(), 0.1, delta=0.05)
+        long = synthetic_panel(4, 56, long=True)
+        self.assertEqual(list(long.columns), ['id', 'date', 'value'])
+        self.assertEqual(len(long), 4 * 56)
+
+        scale = {'rows': 2000, 'model_rows': 60, 'series': 5}
+        run = run_benchmarks(['clean_data', 'forecast_many'], [scale], repeat=1)
+        json.dumps(run)
+        for result in run['results'].values():
+            self.assertNotIn('error', result)
+            self.assertGreater(result['seconds'], 0)
+            self.assertGreater(result['peak_mb'], 0)
+
+        slower = json.loads(json.dumps(run))
+        slower['results']['clean_data[custom]']['min_seconds'] += 1.0
+        flags = compare_results(run, slower)['regression']
+        self.assertTrue(flags['clean_data[custom]'])
+        self.assertFalse(flags['forecast_many[custom]'])
+
+    def test_instrumentation_records_stages_and_cache_hits(self):
+        df = pd.DataFrame({'target': np.linspace(10, 20, 60)},
+                          index=pd.date_range('2023-01-01', periods=60, name='date'))
+        forecast(df, 'holt', cache=ModelCache())
+        self.assertIsNone(instrumentation.current())  # disabled by default: nothing collected
+
+        log = io.StringIO()
+        metrics = instrumentation.enable(log=log)
+        try:
+            cache = ModelCache()
+            forecast(df, 'holt', cache=cache)
+            forecast(df, 'holt', cache=cache)
+        finally:
+            instrumentation.disable()
+        snapshot = metrics.snapshot()
+        counters = {(c['name'], tuple(c['labels'].items())): c['value'] for c in snapshot['counters']}
+        self.assertEqual(counters[('model_cache_misses', (('model', 'holt'),))], 1)
+        self.assertEqual(counters[('model_cache_hits', (('model', 'holt'),))], 1)
+        self.assertEqual(counters[('rows_cleaned', ())], 120)
+        stages = {(s['stage'], tuple(s['labels'].items())): s['count'] for s in snapshot['stages']}
+        self.assertEqual(stages[('clean', ())], 2)
+        self.assertEqual(stages[('fit', (('model', 'holt'),))], 1)
+
+        events = [json.loads(line) for line in log.getvalue().splitlines()]
+        self.assertEqual([e['stage'] for e in events], ['clean', 'fit', 'clean'])
+        text = metrics.prometheus()
+        self.assertIn('forecast_model_cache_hits_total{model="holt"} 1', text)
+        self.assertIn('forecast_stage_seconds_count{stage="fit",model="holt"} 1', text)
+
+    def test_online_forecaster_streams_in_constant_memory(self):
+        rng = np.random.default_rng(0)
+        returns = np.zeros(6000)
+        for t in range(1, len(returns)):
+            returns[t] = 0.3 * returns[t - 1] + rng.normal(0, 0.1)
+        bars = pd.DataFrame({'Close': 100 + np.cumsum(returns)},
+                            index=pd.date_range('2024-01-02 09:30', periods=len(returns), freq='min',
+                                                tz='America/New_York'))
+        forecaster = OnlineForecaster(window=200, horizon=3, quantiles=(0.1, 0.9))
+        hits, emitted = 0, 0
+        for event in forecaster.run(bars_from_frame(bars.iloc[:5000]), emit_every=100):
+            emitted += 1
+        for timestamp, value in bars_from_frame(bars.iloc[5000:]):
+            frame = forecaster.forecast(1)['rls']
+            hits += frame['q0.1'].iloc[0] <= value <= frame['q0.9'].iloc[0]
+            forecaster.update(timestamp, value)
+        self.assertEqual(emitted, 50)
+        self.assertEqual(len(forecaster.recent()), 200)
+        self.assertEqual(forecaster.recent().index[-1], bars.index[-1])
+        self.assertAlmostEqual(forecaster.models['rls'].theta[1], 0.3, delta=0.15)
+        self.assertAlmostEqual(hits / 1000, 0.8, delta=0.06)
+        self.assertEqual(list(event['forecasts']['kalman'].columns), ['date', 'forecast', 'q0.1', 'q0.9'])
+        self.assertEqual(event['forecasts']['ewma']['date'].iloc[0], bars.index[4999] + pd.Timedelta('1min'))
+
+        # Without forgetting, recursive least squares converges to the batch least-squares fit
+        rls = RecursiveLeastSquares(n_lags=2, forgetting=1.0, delta=1e8, difference=False)
+        y = returns[:500]
+        for value in y:
+            rls.update(value)
+        X = np.column_stack([np.ones(498), y[1:-1], y[:-2]])
+        np.testing.assert_allclose(rls.theta, np.linalg.lstsq(X, y[2:], rcond=None)[0], atol=1e-5)
+
+        # Each poll refetches the day's bars; only new ones are yielded
+        day = bars.iloc[:5]
+        ticker = mock.Mock()
+        ticker.history.side_effect = [day.iloc[:3], day.iloc[:3], day]
+        with mock.patch('yfinance.Ticker', return_value=ticker), mock.patch('time.sleep'):
+            streamed = list(yahoo_bars('SPY', max_polls=3))
+        self.assertEqual([t for t, _ in streamed], list(day.index))
+
+    def test_prophet_fast_profile_and_warm_start(self):
+        from prophet import Prophet
+        history = synthetic_panel(3, 160, long=True)
+        store = ModelCache()
+        with mock.patch('ml_models.warm_starts', store), mock.patch('forecasting_engine.warm_starts', store):
+            results = list(forecast_many(history, 'prophet', n_jobs=2, id_col='id', horizon=7,
+                                         profile='fast', warm_start=True))
+            self.assertEqual([r[3] for r in results], [None] * 3)
+            self.assertEqual(len(results[0][1]), 7)
+            # The workers' fitted parameters come back to this process
+            fitted = store.get(('prophet', 's1'))
+            self.assertEqual(len(fitted['init']['delta']), 10)
+
+            # Refitting the series starts from them
+            s1 = history[history['id'] == 's1'].set_index('date')[['value']]
+            with mock.patch.object(Prophet, 'fit', autospec=True, side_effect=Prophet.fit) as fit:
+                forecast(s1, 'prophet', 'value', cache=False, horizon=7, profile='fast', warm_start='s1')
+            self.assertIs(fit.call_args.kwargs['init'], fitted['init'])
+        with self.assertRaises(ValueError):
+            forecast(s1, 'prophet', 'value', profile='turbo')
+
+    def test_auto_arima_search(self):
+        from auto_arima import differencing_orders, infer_season_length, search_orders
+        rng = np.random.default_rng(3)
+        noise = rng.normal(0, 1, 200)
+        ar = np.zeros(200)
+        for t in range(1, 200):
+            ar[t] = 0.7 * ar[t - 1] + noise[t]
+        walk = 50 + np.cumsum(ar)
+        self.assertEqual(differencing_orders(walk), (1, 0))
+        self.assertEqual(infer_season_length(pd.date_range('2020-01-01', periods=24, freq='MS')), 12)
+
+        with mock.patch('auto_arima._aic_cache', ModelCache()):
+            chosen = search_orders(walk, n_jobs=2)
+            self.assertEqual(chosen['order'][:2], (1, 1))
+            self.assertEqual(chosen['stopped'], 'converged')
+            # A repeated search is answered from the memoized fits
+            self.assertEqual(search_orders(walk)['fits'], 0)
+        with mock.patch('auto_arima._aic_cache', ModelCache(max_items=0)):
+            self.assertEqual(search_orders(walk, time_budget=0)['stopped'], 'time_budget')
+
+        panel = {'a': pd.DataFrame({'target': walk}, index=pd.date_range('2020-01-01', periods=200, name='date')),
+                 'b': pd.DataFrame({'target': walk[::-1]}, index=pd.date_range('2020-01-01', periods=200, name='date'))}
+        results = list(forecast_many(panel, 'auto_arima', n_jobs=1, horizon=5, quantiles=(0.1, 0.9),
+                                     time_budget=20, max_order=2))
+        self.assertEqual([r[3] for r in results], [None, None])
+        self.assertEqual(list(results[0][1].columns), ['date', 'forecast', 'q0.1', 'q0.9'])
+
+    def test_result_store_partial_reads_and_streamed_csv(self):
+        panel = {f"s{i:02d}": pd.DataFrame({'target': np.arange(40.0) * (i + 1)},
+                                           index=pd.date_range('2023-01-01', periods=40, name='date'))
+                 for i in range(12)}
+        results = list(forecast_many(panel, 'drift', n_jobs=1, horizon=6, quantiles=(0.1, 0.9)))
+        results.append(('bad', None, 'drift', "ValueError: too short"))
+        metrics = {s: {'rmse': float(i)} for i, s in enumerate(panel)}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ForecastResultStore(tmp)
+            with mock.patch('result_store.ROW_GROUP_ROWS', 12):
+                run_id = store.write(results, 'run/1', metrics=metrics, note='test')
+            self.assertIn(run_id, store)
+            info = store.info(run_id)
+            self.assertEqual((info['series'], info['rows'], info['models'], info['note']), (12, 72, ['drift'], 'test'))
+            self.assertIn('bad', info['errors'])
+
+            expected = dict((s, f) for s, f, _, e in results if e is None)['s03']
+            frame = store.read_frame(run_id, 's03')
+            self.assertEqual(frame['forecast'].dtype, np.float32)
+            np.testing.assert_allclose(frame['forecast'], expected['forecast'], rtol=1e-6)
+            self.assertEqual(list(frame['date']), list(expected['date']))
+
+            part = store.read(run_id, series=['s01', 's10'], columns=['forecast'], max_step=2)
+            self.assertEqual(list(part.columns), ['series', 'model', 'step', 'date', 'forecast'])
+            self.assertEqual(sorted(part['series'].astype(str).unique()), ['s01', 's10'])
+            self.assertEqual(part['step'].max(), 2)
+            self.assertEqual(store.metrics(run_id, series='s05')['rmse'].tolist(), [5.0])
+
+            chunks = list(store.iter_csv(run_id, series=['s00', 's11'], columns=['forecast']))
+            lines = b"".join(chunks).decode().splitlines()
+            self.assertEqual(lines[0], '"series","model","step","date","forecast"')
+            self.assertEqual(len(lines), 13)
+
+            # The service streams the same CSV, unknown runs are a 404
+            server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(None, results=store))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            url = f"http://127.0.0.1:{server.server_port}/results"
+            with urllib.request.urlopen(f"{url}/{run_id}.csv?series=s00,s11&columns=forecast") as response:
+                self.assertEqual(response.read().decode().splitlines(), lines)
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                urllib.request.urlopen(f"{url}/nope.csv")
+            self.assertEqual(ctx.exception.code, 404)
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                urllib.request.urlopen(f"{url}/{run_id}.csv?max_step=two")
+            self.assertEqual(ctx.exception.code, 400)
+
+            # The date format is chosen for the run, not per row group
+            daily = pd.DataFrame({'date': pd.date_range('2024-01-01', periods=3), 'forecast': 1.0})
+            hourly = daily.assign(date=daily['date'] + pd.Timedelta(hours=9))
+            with mock.patch('result_store.ROW_GROUP_ROWS', 3):
+                mixed = store.write({'a': daily, 'b': hourly}, 'mixed')
+            chunks = list(store.iter_csv(mixed))
+            self.assertEqual(len(chunks), 2)
+            self.assertEqual(b"".join(chunks).decode().splitlines()[1].split(',')[3], '2024-01-01 00:00:00')
+
+            store.delete(run_id)
+            store.delete(mixed)
+            self.assertEqual(store.runs(), [])
+
     # Add tests for other models
 
 if __name__ == '__main__':
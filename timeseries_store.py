@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+DEFAULT_ROOT = os.environ.get("FORECAST_STORE_DIR", os.path.join("data", "store"))
+
+def _safe_key(value):
+    """Partition-safe version of a ticker/source name"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(value)) or '_'
+
+def _normalise(df, date_col='date'):
+    """Flat frame with a tz-naive `date` column and string column names"""
+    df = df.copy()
+    if date_col in df.columns:
+        df = df.rename(columns={date_col: 'date'})
+    elif isinstance(df.index, pd.DatetimeIndex):
+        df = df.rename_axis('date').reset_index()
+    else:
+        # Snapshots without dates (insights, news lists) are keyed by ingestion day
+        df = df.reset_index(drop=isinstance(df.index, pd.RangeIndex))
+        df['date'] = pd.Timestamp.today().normalize()
+    df.columns = [str(c) for c in df.columns]
+    dates = pd.to_datetime(df['date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    df['date'] = dates.astype('datetime64[ns]')
+    return df
+
+class TimeSeriesStore:
+    """
+    Local Parquet store for ingested data.
+
+    Layout: <root>/<source>/ticker=<ticker>/year=<yyyy>/part-0.parquet
+    Each source is its own dataset, so sources with different columns don't
+    have to share a schema. Reads push column selection and ticker/date
+    filters down to Parquet, skip whole partitions that can't match, and
+    memory-map the files.
+    """
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self._fs = pafs.LocalFileSystem(use_mmap=True)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _source_dir(self, source):
+        return os.path.join(self.root, _safe_key(source))
+
+    def _dataset(self, source, ticker=None):
+        path = self._source_dir(source)
+        if ticker is not None:
+            path = os.path.join(path, f"ticker={_safe_key(ticker)}")
+        if not os.path.isdir(path):
+            return None
+        # Tickers of one source may still differ slightly in columns; unify them
+        files = [os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs if f.endswith('.parquet')]
+        if not files:
+            return None
+        partitioning = ds.partitioning(pa.schema([('ticker', pa.string()), ('year', pa.int32())]),
+                                       flavor='hive')
+        dataset = ds.dataset(files, format='parquet', filesystem=self._fs,
+                             partitioning=partitioning, partition_base_dir=self._source_dir(source))
+        schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+        schema = pa.unify_schemas(schemas + [dataset.partitioning.schema], promote_options='permissive')
+        return ds.dataset(files, schema=schema, format='parquet', filesystem=self._fs,
+                          partitioning=partitioning, partition_base_dir=self._source_dir(source))
+
+    # ----- writing -----
+    def write(self, df, source, ticker='', date_col='date', mode='merge'):
+        """
+        Persist df under source/ticker, partitioned by year.
+
+        mode='merge' keeps rows already stored for other dates and replaces
+        every stored row of a date df contains, so multi-row snapshots
+        (stamped with the ingestion day) replace that day's snapshot as a
+        whole; mode='overwrite' replaces the whole ticker.
+        """
+        frame = _normalise(df, date_col)
+        frame = frame.drop(columns=[c for c in ('ticker', 'year') if c in frame.columns])
+        ticker_key = _safe_key(ticker)
+        ticker_dir = os.path.join(self._source_dir(source), f"ticker={ticker_key}")
+
+        with self._lock:
+            if mode == 'merge':
+                years = frame['date'].dt.year.unique().tolist()
+                existing = self.read(source, ticker, years=years)
+                if existing is not None and len(existing):
+                    existing = existing.drop(columns=['ticker', 'year'], errors='ignore')
+                    existing = existing[~existing['date'].isin(frame['date'])]
+                    frame = pd.concat([existing, frame], ignore_index=True)
+            elif mode != 'overwrite':
+                raise ValueError(f"Unknown write mode: {mode}")
+            elif os.path.isdir(ticker_dir):
+                for d, _, fs in os.walk(ticker_dir):
+                    for f in fs:
+                        os.remove(os.path.join(d, f))
+
+            frame = frame.sort_values('date')
+            for year, part in frame.groupby(frame['date'].dt.year):
+                year_dir = os.path.join(ticker_dir, f"year={int(year)}")
+                os.makedirs(year_dir, exist_ok=True)
+                tmp_path = os.path.join(year_dir, f"part-0.parquet.{os.getpid()}.tmp")
+                pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp_path)
+                os.replace(tmp_path, os.path.join(year_dir, "part-0.parquet"))
+        return len(frame)
+
+    # ----- reading -----
+    def read(self, source, ticker=None, columns=None, start=None, end=None, years=None):
+        """
+        Read stored rows as a DataFrame (None if nothing is stored).
+
+        columns: subset of columns to load ('date' is always included)
+        start/end: inclusive date bounds, pushed down to the Parquet scan
+        """
+        dataset = self._dataset(source, ticker)
+        if dataset is None:
+            return None
+        # Conditions on the partition fields prune whole directories before any
+        # file is opened; the date conditions are checked against row-group stats
+        conditions = []
+        if ticker is not None:
+            conditions.append(ds.field('ticker') == _safe_key(ticker))
+        if start is not None:
+            start = pd.Timestamp(start)
+            conditions += [ds.field('year') >= start.year, ds.field('date') >= start]
+        if end is not None:
+            end = pd.Timestamp(end)
+            conditions += [ds.field('year') <= end.year, ds.field('date') <= end]
+        if years is not None:
+            conditions.append(ds.field('year').isin(list(years)))
+        condition = None
+        for expr in conditions:
+            condition = expr if condition is None else condition & expr
+        if columns is not None:
+            columns = ['date'] + [c for c in columns if c != 'date']
+        table = dataset.to_table(columns=columns, filter=condition)
+        return table.to_pandas().sort_values('date', ignore_index=True)
+
+    def read_series(self, source, ticker, target_col, start=None, end=None):
+        """Date-indexed single-column frame, ready for forecast()"""
+        df = self.read(source, ticker, columns=[target_col], start=start, end=end)
+        if df is None:
+            return None
+        return df.set_index('date')
+
+    # ----- ingestion bookkeeping -----
+    def _manifest_path(self):
+        return os.path.join(self.root, "_manifest.json")
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def record_ingest(self, key, fingerprint):
+        with self._lock:
+            manifest = self.manifest()
+            manifest[key] = fingerprint
+            tmp_path = f"{self._manifest_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(tmp_path, self._manifest_path())
@@ -1,8 +1,11 @@
-from sklearn.metrics import mean_absolute_error, mean_squared_error
 import numpy as np
+import pandas as pd
+from instrumentation import traced
 
+@traced('score')
 def calculate_metrics(actual, predicted):
     """Calculate MAE and RMSE with alignment handling"""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
     # Align series
     actual, predicted = align_series(actual, predicted)
     
@@ -13,6 +16,26 @@ def calculate_metrics(actual, predicted):
     rmse = np.sqrt(mean_squared_error(actual, predicted))
     return {'MAE': mae, 'RMSE': rmse}
 
+def error_terms(actual, predicted):
+    """Per-point error terms that score_backtest averages per group"""
+    actual = np.asarray(actual, dtype=float)
+    predicted = np.asarray(predicted, dtype=float)
+    err = predicted - actual
+    abs_err = np.abs(err)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(actual != 0, abs_err / np.abs(actual), np.nan)
+        denom = np.abs(actual) + np.abs(predicted)
+        sape = np.where(denom != 0, 2 * abs_err / denom, 0.0)
+    sape[np.isnan(err)] = np.nan
+    return {'abs_error': abs_err, 'squared_error': err**2, 'ape': ape, 'sape': sape}
+
+def future_index(index, horizon):
+    """Index for the `horizon` periods after `index` (dates if it is a DatetimeIndex)"""
+    if isinstance(index, pd.DatetimeIndex) and len(index):
+        freq = index.freq or (pd.infer_freq(index) if len(index) >= 3 else None) or 'D'
+        return pd.date_range(index[-1], periods=horizon + 1, freq=freq, name='date')[1:]
+    return pd.RangeIndex(len(index), len(index) + horizon)
+
 def align_series(actual, predicted):
     """Align two series by index"""
     if isinstance(actual, pd.Series) and isinstance(predicted, pd.Series):